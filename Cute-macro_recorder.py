@@ -5,12 +5,39 @@ Interface moderne, claire et lisible avec thèmes clair/sombre
 Auteur: Assistant IA - Ingénieur logiciel
 """
 
+import os
 import sys
 import json
+import asyncio
+import argparse
+import ast
+import subprocess
+import multiprocessing
+import tempfile
 import time
+import bisect
+import hashlib
+import heapq
+import io
+import itertools
+import queue
+import math
+import random
+import select
+import shlex
+import shutil
+import struct
 import threading
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any
+import zipfile
+from array import array
+from multiprocessing import shared_memory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict, deque
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+from operator import attrgetter
 from pathlib import Path
 
 # Imports pour l'interface
@@ -41,6 +68,29 @@ except ImportError as e:
     print(f"⚠️ Modules manquants: {e}")
     MODULES_AVAILABLE = False
 
+# Optionnel: calculs vectorisés (analyse des macros)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Optionnel: vignettes de contexte (Pillow, déjà requis par les captures d'écran de pyautogui)
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Optionnel: saisie de texte rapide par XTest, géométrie des fenêtres et capture d'autres écrans (Linux/X11)
+try:
+    from Xlib import X, XK, display as xdisplay
+    from Xlib.ext import record, xtest
+    from Xlib.protocol import rq
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
+
 # Constantes pour les thèmes
 class Theme:
     LIGHT = {
@@ -122,25 +172,2402 @@ class MacroAction:
         elif self.action_type == "scroll":
             direction = "bas" if self.data['dy'] < 0 else "haut"
             return f"🖱️ Scroll vers le {direction} ({self.data['x']}, {self.data['y']})"
+        elif self.action_type == "text_input":
+            text = self.data['text']
+            preview = text if len(text) <= 40 else text[:40] + "…"
+            return f"🔤 Texte ({len(text)} car.): « {preview} »"
+        elif self.action_type == "marker":
+            return f"📍 Marqueur: {self.data['label']}"
         else:
             return f"⏱️ Action: {self.action_type}"
 
+# Champs obligatoires de `data` pour chaque type d'action
+ACTION_SCHEMAS = {
+    "mouse_move": ("x", "y"),
+    "mouse_click": ("x", "y"),
+    "scroll": ("x", "y", "dy"),
+    "key_press": ("key",),
+    "key_release": ("key",),
+    "text_input": ("text",),
+    "marker": ("label",),
+}
+
+MACRO_FORMATS = ("json", "jsonl", "mseg")
+
+def macro_format_for(file_path) -> str:
+    """Déduit le format d'un fichier macro de son extension (.json, .jsonl ou .mseg)"""
+    suffix = Path(file_path).suffix.lower().lstrip(".")
+    return suffix if suffix in MACRO_FORMATS else "json"
+
+def _segment_manifest(file_path) -> tuple:
+    """Manifeste .mseg et magasin de segments qu'il référence"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest, SegmentStore(Path(file_path).resolve().parent / manifest['store'])
+
+def read_macro_document(file_path) -> Dict[str, Any]:
+    """Lit un fichier macro (JSON ou JSON-lines) et retourne le document avec ses actions brutes
+
+    Le format JSON-lines contient une ligne d'en-tête (métadonnées) suivie d'une action par ligne ;
+    un manifeste .mseg référence des segments partagés (voir SegmentStore).
+    """
+    if macro_format_for(file_path) == "mseg":
+        manifest, store = _segment_manifest(file_path)
+        manifest['actions'] = [action.to_dict() for action in store.load(manifest.pop('segments'))]
+        return manifest
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if macro_format_for(file_path) == "json":
+            return json.load(f)
+
+        header = json.loads(f.readline() or "{}")
+        header['actions'] = [json.loads(line) for line in f if line.strip()]
+        return header
+
+def load_macro_file(file_path) -> List[MacroAction]:
+    """Charge les actions d'un fichier macro (JSON, JSON-lines ou manifeste de segments)"""
+    if macro_format_for(file_path) == "mseg":
+        manifest, store = _segment_manifest(file_path)
+        return store.load(manifest['segments'])
+
+    data = read_macro_document(file_path)
+    return [MacroAction.from_dict(action_data) for action_data in data['actions']]
+
+def save_macro_file(file_path, actions: List[MacroAction], theme: str = 'light', fmt: Optional[str] = None):
+    """Sauvegarde les actions dans un fichier macro (format déduit de l'extension par défaut)"""
+    fmt = fmt or macro_format_for(file_path)
+    header = {
+        'version': '2.1',
+        'created_at': time.time(),
+        'action_count': len(actions),
+        'theme': theme,
+    }
+
+    if fmt == "mseg":
+        store = SegmentStore.for_file(file_path)
+        header['store'] = os.path.relpath(store.root, Path(file_path).resolve().parent)
+        header['segments'] = store.put(actions)['segments']
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        if fmt == "mseg":
+            json.dump(header, f, ensure_ascii=False)
+        elif fmt == "jsonl":
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for action in actions:
+                f.write(json.dumps(action.to_dict(), ensure_ascii=False) + "\n")
+        else:
+            header['actions'] = [action.to_dict() for action in actions]
+            json.dump(header, f, indent=2, ensure_ascii=False)
+
+def validate_macro_data(data: Dict[str, Any], check_order: bool = True) -> List[str]:
+    """Vérifie le schéma d'un document macro et retourne la liste des erreurs (vide si valide)"""
+    if not isinstance(data, dict) or not isinstance(data.get('actions'), list):
+        return ["document sans liste 'actions'"]
+
+    errors = []
+    previous_timestamp = 0.0
+    for i, record in enumerate(data['actions']):
+        if not isinstance(record, dict) or set(record) != {"action_type", "timestamp", "data"}:
+            errors.append(f"action {i}: champs attendus action_type/timestamp/data")
+            continue
+
+        action_type, timestamp, action_data = record["action_type"], record["timestamp"], record["data"]
+        if action_type not in ACTION_SCHEMAS:
+            errors.append(f"action {i}: type inconnu '{action_type}'")
+        elif not isinstance(action_data, dict):
+            errors.append(f"action {i}: 'data' doit être un objet")
+        else:
+            missing = [field for field in ACTION_SCHEMAS[action_type] if field not in action_data]
+            if missing:
+                errors.append(f"action {i}: champs manquants {', '.join(missing)}")
+            elif "x" in action_data and not (isinstance(action_data["x"], int) and isinstance(action_data["y"], int)):
+                errors.append(f"action {i}: coordonnées non entières")
+
+        if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or timestamp < 0:
+            errors.append(f"action {i}: timestamp invalide {timestamp!r}")
+        else:
+            if check_order and timestamp < previous_timestamp:
+                errors.append(f"action {i}: timestamps non croissants")
+            previous_timestamp = timestamp
+
+    return errors
+
+def optimize_actions(actions: List[MacroAction], min_move_interval: float = 0.05) -> List[MacroAction]:
+    """Optimise la chronologie d'une macro sans changer son effet
+
+    - remet les actions dans l'ordre chronologique (les deux listeners pynput peuvent s'entrelacer)
+    - supprime les mouvements souris vers la position déjà atteinte
+    - dans une rafale de mouvements, ne garde qu'un point tous les `min_move_interval`
+      ainsi que le dernier mouvement avant une autre action
+    """
+    ordered = sorted(actions, key=lambda action: action.timestamp)
+    optimized = []
+    position = None
+    last_kept_move = None
+
+    for i, action in enumerate(ordered):
+        if action.action_type != "mouse_move":
+            optimized.append(action)
+            if "x" in action.data:
+                position = (action.data["x"], action.data["y"])
+            last_kept_move = None
+            continue
+
+        target = (action.data["x"], action.data["y"])
+        if target == position:
+            continue
+
+        next_action = ordered[i + 1] if i + 1 < len(ordered) else None
+        ends_run = next_action is None or next_action.action_type != "mouse_move"
+        if not ends_run and last_kept_move is not None and \
+                action.timestamp - last_kept_move.timestamp < min_move_interval:
+            continue
+
+        optimized.append(action)
+        position = target
+        last_kept_move = action
+
+    return optimized
+
+def key_char(key: str) -> Optional[str]:
+    """Caractère imprimable produit par une touche enregistrée par pynput ("'a'", "Key.space"...)"""
+    if key == "Key.space":
+        return " "
+    if len(key) >= 3 and key[0] in "'\"" and key[-1] == key[0]:
+        try:
+            char = ast.literal_eval(key)
+        except (ValueError, SyntaxError):
+            return None
+        if isinstance(char, str) and len(char) == 1 and char.isprintable():
+            return char
+    return None
+
+def group_text_runs(actions: List[MacroAction], max_gap: float = 1.0, min_length: int = 2) -> List[MacroAction]:
+    """Regroupe les suites de frappes de caractères imprimables en actions "text_input"
+
+    Les relâchements et les touches Maj à l'intérieur d'une suite sont absorbés ;
+    une suite s'arrête sur toute autre action ou après une pause de plus de `max_gap`.
+    Les frappes faites pendant que Ctrl, Alt ou Cmd est maintenu sont des raccourcis :
+    elles restent des actions clavier brutes, ainsi que leur relâchement.
+    """
+    grouped: List[MacroAction] = []
+    run: List[MacroAction] = []
+    chars: List[str] = []
+    held = set()       # modificateurs de raccourci enfoncés
+    shortcuts = set()  # touches enfoncées pendant un raccourci (relâchement gardé brut)
+
+    def flush():
+        if len(chars) >= min_length:
+            first = next(a for a in run if a.action_type == "key_press" and key_char(a.data["key"]))
+            data = {"text": "".join(chars)}
+            thumb = next((a.data["thumb"] for a in run if "thumb" in a.data), None)
+            if thumb:
+                data["thumb"] = thumb
+            grouped.append(MacroAction("text_input", first.timestamp, data))
+        else:
+            grouped.extend(run)
+        run.clear()
+        chars.clear()
+
+    for action in actions:
+        key = action.data.get("key") if action.action_type in ("key_press", "key_release") else None
+        pressed = action.action_type == "key_press"
+        if key and key != "Key.alt_gr" and key.startswith(("Key.ctrl", "Key.alt", "Key.cmd")):
+            (held.add if pressed else held.discard)(key)
+        char = key_char(key) if key else None
+        absorbable = char is not None or key in ("Key.shift", "Key.shift_r")
+        if absorbable and (held or key in shortcuts):
+            absorbable = False
+            (shortcuts.add if pressed else shortcuts.discard)(key)
+
+        if run and (not absorbable or action.timestamp - run[-1].timestamp > max_gap):
+            flush()
+        if not absorbable:
+            grouped.append(action)
+            continue
+
+        run.append(action)
+        if char is not None and action.action_type == "key_press":
+            chars.append(char)
+    flush()
+    return grouped
+
+SEGMENT_STORE_DIR = ".macro_segments"
+
+class SegmentStore:
+    """Stockage dédupliqué des macros par découpage défini par le contenu
+
+    Le flux d'actions est découpé en segments par un hachage roulant (type « gear ») sur
+    l'empreinte de chaque action et de son délai depuis la précédente : les frontières ne
+    dépendent que du contenu local, donc une même séquence (connexion, navigation...) donne
+    les mêmes segments quelle que soit sa position ou son instant dans la macro. Chaque
+    segment unique est écrit une seule fois (nom = empreinte du contenu) et une macro
+    devient un manifeste .mseg listant (segment, instant de début).
+
+    Les segments décodés sont gardés dans un cache LRU partagé par le processus : rejouer
+    une macro dont les segments sont déjà chargés ne relit ni ne parse aucun fichier.
+    Les horodatages sont conservés à la microseconde près.
+    """
+
+    MIN_ACTIONS = 16
+    MAX_ACTIONS = 512
+    BOUNDARY_BITS = 6  # taille moyenne ~ MIN_ACTIONS + 2**6 actions
+    CACHE_ACTIONS = 500_000
+
+    # Cache des segments décodés : id -> tuple de (type, instant relatif en µs, data)
+    cache: "OrderedDict[str, tuple]" = OrderedDict()
+    cache_size = 0
+    cache_lock = threading.Lock()
+    cache_stats = {"hits": 0, "misses": 0}
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @classmethod
+    def for_file(cls, file_path) -> "SegmentStore":
+        """Magasin le plus proche en remontant depuis le dossier du fichier (créé à côté sinon)"""
+        directory = Path(file_path).resolve().parent
+        for candidate in (directory, *directory.parents):
+            if (candidate / SEGMENT_STORE_DIR).is_dir():
+                return cls(candidate / SEGMENT_STORE_DIR)
+        return cls(directory / SEGMENT_STORE_DIR)
+
+    def segment_path(self, segment_id: str) -> Path:
+        return self.root / segment_id[:2] / f"{segment_id}.seg"
+
+    @classmethod
+    def split(cls, actions: List[MacroAction]) -> List[tuple]:
+        """Découpe les actions en segments : [(instant de début en µs, [lignes encodées]), ...]"""
+        threshold_shift = 64 - cls.BOUNDARY_BITS
+        segments = []
+        lines: List[str] = []
+        start_us = previous_us = h = 0
+        for action in actions:
+            t_us = round(action.timestamp * 1_000_000)
+            if not lines:
+                start_us = t_us
+            data = json.dumps(action.data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+            fingerprint = hashlib.blake2b(f"{action.action_type}|{t_us - previous_us}|{data}".encode("utf-8"),
+                                          digest_size=8).digest()
+            h = ((h << 1) + int.from_bytes(fingerprint, "little")) & 0xFFFFFFFFFFFFFFFF
+            previous_us = t_us
+            lines.append(f'["{action.action_type}",{t_us - start_us},{data}]')
+
+            if len(lines) >= cls.MAX_ACTIONS or (len(lines) >= cls.MIN_ACTIONS and h >> threshold_shift == 0):
+                segments.append((start_us, lines))
+                lines = []
+        if lines:
+            segments.append((start_us, lines))
+        return segments
+
+    def put(self, actions: List[MacroAction]) -> Dict[str, Any]:
+        """Écrit les segments manquants et retourne la liste des références (id, début µs)"""
+        refs, written, written_bytes = [], 0, 0
+        for start_us, lines in self.split(actions):
+            content = ("\n".join(lines) + "\n").encode("utf-8")
+            segment_id = hashlib.blake2b(content, digest_size=16).hexdigest()
+            refs.append([segment_id, start_us])
+            path = self.segment_path(segment_id)
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Écriture atomique : plusieurs processus (traitement par lots) peuvent écrire le même segment
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            written += 1
+            written_bytes += len(content)
+        return {"segments": refs, "written": written, "written_bytes": written_bytes}
+
+    def get(self, segment_id: str, cache: bool = True) -> tuple:
+        """Segment décodé (depuis le cache si possible ; cache=False : lu sans y être ajouté)"""
+        with SegmentStore.cache_lock:
+            records = SegmentStore.cache.get(segment_id)
+            if records is not None:
+                SegmentStore.cache.move_to_end(segment_id)
+                SegmentStore.cache_stats["hits"] += 1
+                return records
+
+        with open(self.segment_path(segment_id), "r", encoding="utf-8") as f:
+            records = tuple(tuple(json.loads(line)) for line in f if line.strip())
+        if not cache:
+            return records
+
+        entries = SegmentStore.cache
+        with SegmentStore.cache_lock:
+            SegmentStore.cache_stats["misses"] += 1
+            if segment_id not in entries:
+                entries[segment_id] = records
+                SegmentStore.cache_size += len(records)
+            while SegmentStore.cache_size > self.CACHE_ACTIONS and len(entries) > 1:
+                _, evicted = entries.popitem(last=False)
+                SegmentStore.cache_size -= len(evicted)
+        return records
+
+    def load(self, refs: List[list]) -> List[MacroAction]:
+        """Reconstitue les actions d'une liste de références
+
+        Chaque action reçoit sa propre copie de `data` : le cache partagé n'est jamais modifié
+        par les traitements qui complètent les actions en place (vignettes, coordonnées relatives...).
+        """
+        actions = []
+        for segment_id, start_us in refs:
+            actions.extend(MacroAction(action_type, (start_us + rel_us) / 1_000_000, dict(data))
+                           for action_type, rel_us, data in self.get(segment_id))
+        return actions
+
+    def usage(self) -> Dict[str, int]:
+        """Nombre de segments et octets occupés sur disque"""
+        count = size = 0
+        for path in self.root.glob("*/*.seg"):
+            count += 1
+            size += path.stat().st_size
+        return {"segments": count, "bytes": size}
+
+    @classmethod
+    def clear_cache(cls):
+        with cls.cache_lock:
+            cls.cache.clear()
+            cls.cache_size = 0
+            cls.cache_stats.update(hits=0, misses=0)
+
+def prefetch(produce, depth: int, name: str, stats: Optional[Dict[str, Any]] = None):
+    """Parcourt produce() exécuté dans un thread dédié, à travers une file bornée à `depth` éléments
+
+    Sous-débit (underrun) : un élément, hors premier, absent quand le consommateur le
+    demande ; compté dans stats["underruns"] avec la durée d'attente (stats["underrun_ms"]).
+    Fermer le parcours arrête le thread et l'attend ; une exception du producteur est
+    relevée côté consommateur.
+    """
+    buffer: "queue.Queue" = queue.Queue(depth)
+    stop = threading.Event()
+    end = object()
+    stats = stats if stats is not None else {"underruns": 0, "underrun_ms": 0.0, "max_buffered": 0}
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in produce():
+                if not put((True, item)):
+                    return
+            put((True, end))
+        except Exception as e:
+            put((False, e))
+
+    worker = threading.Thread(target=run, name=name, daemon=True)
+    worker.start()
+    try:
+        ok, item = buffer.get()
+        while item is not end:
+            if not ok:
+                raise item
+            yield item
+            stats["max_buffered"] = max(stats["max_buffered"], buffer.qsize())
+            try:
+                ok, item = buffer.get_nowait()
+            except queue.Empty:
+                stats["underruns"] += 1
+                waited = time.perf_counter()
+                ok, item = buffer.get()
+                stats["underrun_ms"] += (time.perf_counter() - waited) * 1000.0
+    finally:
+        stop.set()
+        worker.join()
+
+class ActionStream:
+    """Source de lecture en continu d'un fichier macro (JSON-lines ou manifeste de segments)
+
+    Chaque parcours démarre un thread de préchargement qui lit le fichier par blocs
+    (CHUNK lignes JSON-lines, ou un segment .mseg) et les dépose dans une file bornée à
+    `read_ahead` blocs : la lecture commence dès le premier bloc et la mémoire reste
+    constante quelle que soit la longueur de la macro. Les segments lus ne sont pas
+    ajoutés au cache partagé de SegmentStore (lecture à usage unique).
+
+    Sous-débit (underrun) : le player trouve la file vide avant la fin du fichier et doit
+    attendre le lecteur ; le nombre et la durée de ces attentes sont comptés.
+    """
+
+    CHUNK = 256
+
+    def __init__(self, file_path, read_ahead: int = 16):
+        self.file_path = str(file_path)
+        self.format = macro_format_for(file_path)
+        if self.format == "json":
+            raise ValueError("Lecture en continu: formats .jsonl ou .mseg uniquement")
+        self.read_ahead = read_ahead
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            self.header = json.loads(f.readline() or "{}") if self.format == "jsonl" else json.load(f)
+        self.action_count: Optional[int] = self.header.get('action_count')
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"actions": 0, "chunks": 0, "underruns": 0, "underrun_ms": 0.0,
+                      "first_chunk_ms": 0.0, "max_buffered": 0}
+
+    def __len__(self):
+        return self.action_count or 0
+
+    def _chunks(self):
+        if self.format == "mseg":
+            store = SegmentStore(Path(self.file_path).resolve().parent / self.header['store'])
+            for segment_id, start_us in self.header['segments']:
+                yield [MacroAction(action_type, (start_us + rel_us) / 1_000_000, data)
+                       for action_type, rel_us, data in store.get(segment_id, cache=False)]
+            return
+
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            f.readline()  # en-tête
+            chunk = []
+            for line in f:
+                if line.strip():
+                    chunk.append(MacroAction.from_dict(json.loads(line)))
+                    if len(chunk) >= self.CHUNK:
+                        yield chunk
+                        chunk = []
+            if chunk:
+                yield chunk
+
+    def __iter__(self):
+        stats = self.stats
+        start = time.perf_counter()
+        with closing(prefetch(self._chunks, self.read_ahead, "macro-prefetch", stats)) as chunks:
+            for chunk in chunks:
+                if not stats["chunks"]:
+                    stats["first_chunk_ms"] = (time.perf_counter() - start) * 1000.0
+                stats["chunks"] += 1
+                stats["actions"] += len(chunk)
+                yield from chunk
+
+    def summary(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["underrun_ms"] = round(stats["underrun_ms"], 3)
+        stats["first_chunk_ms"] = round(stats["first_chunk_ms"], 3)
+        return stats
+
+class PerfTracer:
+    """Traceur de performance à faible surcoût, exportable au format Chrome Trace / Perfetto
+
+    Désactivé par défaut : les boucles chaudes ne testent que `enabled` une fois
+    par lecture/callback. Les spans sont stockés en tuples bruts et convertis
+    en événements JSON uniquement à l'export. Tous les instants viennent de
+    `clock` (ns entières), injectable comme l'horloge du player.
+    """
+
+    # Catégories utilisées par le recorder et le player
+    CAT_SCHEDULE = "planification"
+    CAT_INJECT = "injection"
+    CAT_SIGNAL = "signal"
+    CAT_CONDITION = "condition"
+    CAT_RECORD = "enregistrement"
+
+    def __init__(self, max_events: int = 2_000_000, clock=time.perf_counter_ns):
+        self.now = clock
+        self.enabled = False
+        self.max_events = max_events
+        self.events: List[tuple] = []
+        self.dropped = 0
+        self._thread_names: Dict[int, str] = {}
+        self._origin_ns = self.now()
+
+    def enable(self):
+        """Active la collecte (en repartant d'une trace vide)"""
+        self.clear()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.events = []
+        self.dropped = 0
+        self._thread_names = {}
+        self._origin_ns = self.now()
+
+    def add_span(self, name: str, cat: str, start_ns: int, end_ns: int, args: Optional[Dict[str, Any]] = None):
+        """Ajoute un span complet (phase 'X') mesuré avec `now()`"""
+        self._append(name, cat, start_ns, end_ns - start_ns, args)
+
+    def add_instant(self, name: str, cat: str, args: Optional[Dict[str, Any]] = None):
+        """Ajoute un événement ponctuel (phase 'i')"""
+        self._append(name, cat, self.now(), None, args)
+
+    def _append(self, name, cat, start_ns, dur_ns, args):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self.events.append((name, cat, start_ns, dur_ns, tid, args))
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        """Context manager pour les chemins non critiques"""
+        if not self.enabled:
+            yield
+            return
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add_span(name, cat, start, self.now(), args or None)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Convertit la trace au format JSON Trace Event (Chrome / Perfetto)"""
+        pid = os.getpid()
+        origin = self._origin_ns
+        trace_events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+             "args": {"name": "Macro Recorder Pro"}}
+        ]
+        for tid, thread_name in self._thread_names.items():
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                 "args": {"name": thread_name}})
+
+        for name, cat, start_ns, dur_ns, tid, args in self.events:
+            event = {"name": name, "cat": cat, "pid": pid, "tid": tid,
+                     "ts": (start_ns - origin) / 1000.0}
+            if dur_ns is None:
+                event["ph"] = "i"
+                event["s"] = "t"
+            else:
+                event["ph"] = "X"
+                event["dur"] = dur_ns / 1000.0
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+
+        return {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped_events": self.dropped}
+        }
+
+    def export(self, file_path: str):
+        """Écrit la trace dans un fichier ouvrable dans chrome://tracing ou ui.perfetto.dev"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+
+class _Metric:
+    """Base des métriques : valeur sans étiquette ou enfants par valeurs d'étiquettes
+
+    Mises à jour sans verrou : chaque série n'est écrite que par un thread
+    (listener pynput, thread de lecture ou thread de l'interface). Les players qui
+    partagent un registre écrivent donc chacun sous leur propre étiquette `player`.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.children: Dict[tuple, "_Metric"] = {}
+
+    def labels(self, *values) -> "_Metric":
+        """Enfant pour ces valeurs ; avec moins de valeurs que d'étiquettes, l'enfant garde
+        les étiquettes restantes (ex. labels(player) puis labels(type))"""
+        child = self.children.get(values)
+        if child is None:
+            child = type(self)(self.name, self.help, self.label_names[len(values):])
+            child._copy_config(self)
+            child = self.children.setdefault(values, child)  # atomique : un seul enfant par étiquettes
+        return child
+
+    def _copy_config(self, parent: "_Metric"):
+        pass
+
+    def _series(self) -> List[tuple]:
+        """Séries (nom, étiquettes, valeur) à exporter"""
+        if not self.label_names:
+            return self._samples({})
+        series = []
+        for values, child in list(self.children.items()):  # labels() peut ajouter un enfant pendant l'export
+            prefix = dict(zip(self.label_names, values))
+            series.extend((name, {**prefix, **labels}, value) for name, labels, value in child._series())
+        return series
+
+    def _samples(self, labels: Dict[str, str]) -> List[tuple]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        super().__init__(name, help_text, label_names)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def total(self) -> float:
+        return sum(child.total() for child in list(self.children.values())) if self.label_names else self.value
+
+    def _samples(self, labels):
+        return [(self.name, labels, self.value)]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), function=None):
+        super().__init__(name, help_text, label_names)
+        self.value = 0.0
+        self.function = function  # valeur calculée à la lecture (taille d'un tampon, mémoire...)
+
+    def set(self, value: float):
+        self.value = value
+
+    def get(self) -> float:
+        return float(self.function()) if self.function else self.value
+
+    def _samples(self, labels):
+        return [(self.name, labels, self.get())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # dernier = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def _copy_config(self, parent):
+        self.buckets = parent.buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile estimé par interpolation linéaire dans le compartiment (comme histogram_quantile)"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for k, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if k == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[k - 1] if k else 0.0
+                return lower + (self.buckets[k] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def _samples(self, labels):
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            samples.append((self.name + "_bucket", {**labels, "le": "+Inf" if bound == float("inf") else repr(bound)},
+                            cumulative))
+        samples.append((self.name + "_sum", labels, self.sum))
+        samples.append((self.name + "_count", labels, self.count))
+        return samples
+
+def process_memory_bytes() -> int:
+    """Mémoire résidente du processus (Linux : /proc, sinon pic via resource)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class MetricsRegistry:
+    """Registre de métriques exportables au format texte Prometheus
+
+    La création est idempotente : le recorder et le player d'une même interface
+    partagent un registre et retrouvent leurs métriques par nom.
+    """
+
+    def __init__(self):
+        self.metrics: "OrderedDict[str, _Metric]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.gauge("process_resident_memory_bytes", "Mémoire résidente du processus", function=process_memory_bytes)
+
+    def _register(self, cls, name: str, help_text: str, **options) -> _Metric:
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, **options)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrique {name} déjà déclarée comme {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter, name, help_text, label_names=labels)
+
+    def gauge(self, name: str, help_text: str, labels: tuple = (), function=None) -> Gauge:
+        return self._register(Gauge, name, help_text, label_names=labels, function=function)
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (),
+                  buckets: tuple = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, label_names=labels, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self.metrics.get(name)
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus 0.0.4"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            help_text = metric.help.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric._series():
+                if labels:
+                    pairs = ",".join('{}="{}"'.format(key, str(val).replace("\\", "\\\\").replace('"', '\\"')
+                                                      .replace("\n", "\\n")) for key, val in labels.items())
+                    name = f"{name}{{{pairs}}}"
+                lines.append(f"{name} {self._format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, file_path):
+        """Écriture atomique (collecteur textfile de node_exporter : fichier *.prom)"""
+        path = Path(file_path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+class MetricsExporter:
+    """Publie un registre : fichier texte réécrit périodiquement et/ou point HTTP /metrics local"""
+
+    def __init__(self, registry: MetricsRegistry, textfile: Optional[str] = None,
+                 port: Optional[int] = None, host: str = "127.0.0.1", interval: float = 5.0):
+        self.registry = registry
+        self.textfile = textfile
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        if self.port is not None:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            self._spawn(self.server.serve_forever, "metrics-http")
+
+        if self.textfile:
+            self._spawn(self._write_loop, "metrics-textfile")
+        return self
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_loop(self):
+        while True:
+            self._write_textfile()
+            if self._stop.wait(self.interval):
+                break
+        self._write_textfile()
+
+    def _write_textfile(self):
+        # Une erreur d'export ne doit jamais arrêter le thread ni remonter à l'appelant
+        try:
+            self.registry.write_textfile(self.textfile)
+        except Exception as e:
+            print(f"⚠️ Export des métriques impossible: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads.clear()
+
+class ActionSnapshot:
+    """Vue figée (immuable) d'une génération du magasin d'actions
+
+    La vue référence la liste de la génération et sa longueur au moment de sa création :
+    aucune copie n'est faite, et les ajouts ultérieurs (au-delà de cette longueur) ou
+    le passage à une nouvelle génération ne la modifient pas.
+    """
+
+    __slots__ = ("_items", "_length", "version", "generation", "max_timestamp")
+
+    def __init__(self, items: List[MacroAction], length: int, version: int, generation: int, max_timestamp: float):
+        self._items = items
+        self._length = length
+        self.version = version
+        self.generation = generation
+        self.max_timestamp = max_timestamp
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("index hors de l'instantané")
+        return self._items[index]
+
+    def __iter__(self):
+        items = self._items
+        for i in range(self._length):
+            yield items[i]
+
+    def copy(self) -> List[MacroAction]:
+        return self._items[:self._length]
+
+    @property
+    def base(self) -> List[MacroAction]:
+        """Liste de la génération (partagée, jamais modifiée en deçà de la longueur de l'instantané)"""
+        return self._items
+
+class ActionStore:
+    """Magasin d'actions versionné : ajouts concurrents, lectures par instantanés sans copie
+
+    Une génération est une liste qui ne fait que croître (les éléments existants ne
+    sont jamais modifiés ni déplacés) : un instantané est donc un simple couple
+    (liste, longueur). Vider ou remplacer le contenu ouvre une nouvelle génération,
+    les instantanés existants restent valides sur l'ancienne.
+    """
+
+    def __init__(self, actions: Optional[List[MacroAction]] = None):
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.version = 0
+        self._reset(actions if actions is not None else [])
+
+    def _reset(self, items: List[MacroAction]):
+        self._items = items
+        self._max_timestamp = max((a.timestamp for a in items), default=0.0)
+        self.generation += 1
+        self.version += 1
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, action: MacroAction):
+        with self._lock:
+            self._items.append(action)
+            if action.timestamp > self._max_timestamp:
+                self._max_timestamp = action.timestamp
+            self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._reset([])
+
+    def replace(self, actions: List[MacroAction]):
+        """Ouvre une nouvelle génération ; la liste fournie est adoptée telle quelle (sans copie)"""
+        if isinstance(actions, ActionSnapshot):
+            actions = actions.copy()
+        with self._lock:
+            self._reset(actions)
+
+    def snapshot(self) -> ActionSnapshot:
+        with self._lock:
+            return ActionSnapshot(self._items, len(self._items), self.version, self.generation, self._max_timestamp)
+
+class ActionRingBuffer:
+    """Tampon circulaire préalloué pour l'enregistreur de vol
+
+    Les événements sont stockés dans des tableaux de taille fixe (aucun objet
+    MacroAction n'est créé pendant la capture) : la mémoire reste constante
+    quel que soit le temps d'enregistrement. Les plus anciens événements sont
+    écrasés une fois la capacité atteinte.
+    """
+
+    MOVE, CLICK, SCROLL, KEY_PRESS, KEY_RELEASE = range(5)
+
+    def __init__(self, capacity: int = 50_000, window: Optional[float] = None):
+        self.capacity = max(1, capacity)
+        self.window = window
+        self.types = array('b', bytes(self.capacity))
+        self.times = array('d', [0.0]) * self.capacity
+        self.xs = array('i', [0]) * self.capacity
+        self.ys = array('i', [0]) * self.capacity
+        self.a = array('i', [0]) * self.capacity
+        self.b = array('i', [0]) * self.capacity
+        self.keys: List[Optional[str]] = [None] * self.capacity
+        self.head = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+    def push(self, code: int, t: float, x: int = 0, y: int = 0, a: int = 0, b: int = 0, key: Optional[str] = None):
+        with self._lock:
+            i = self.head % self.capacity
+            self.types[i] = code
+            self.times[i] = t
+            self.xs[i] = x
+            self.ys[i] = y
+            self.a[i] = a
+            self.b[i] = b
+            self.keys[i] = key
+            self.head += 1
+
+    def clear(self):
+        with self._lock:
+            self.head = 0
+
+    def snapshot(self, seconds: Optional[float] = None, now: Optional[float] = None) -> List[MacroAction]:
+        """Convertit les `seconds` dernières secondes du tampon en macro normale (timestamps à partir de 0)"""
+        with self._lock:
+            count = len(self)
+            split = self.head % self.capacity if self.head > self.capacity else 0
+            columns = [
+                column[split:count] + column[:split]
+                for column in (self.types, self.times, self.xs, self.ys, self.a, self.b)
+            ]
+            keys = self.keys[split:count] + self.keys[:split]
+
+        types, times, xs, ys, a, b = columns
+        seconds = seconds if seconds is not None else self.window
+        first = 0
+        if seconds is not None and count:
+            cutoff = (now if now is not None else time.monotonic()) - seconds
+            first = bisect.bisect_left(times, cutoff)
+        if first >= count:
+            return []
+
+        t0 = times[first]
+        return [self.to_action(types[k], times[k] - t0, xs[k], ys[k], a[k], b[k], keys[k]) for k in range(first, count)]
+
+    @classmethod
+    def to_action(cls, code: int, t: float, x: int, y: int, a: int, b: int, key: Optional[str]) -> MacroAction:
+        """Reconstruit une action à partir d'un enregistrement compact (code, coordonnées, drapeaux, touche)"""
+        if code == cls.MOVE:
+            action_type, data = "mouse_move", {"x": x, "y": y}
+        elif code == cls.CLICK:
+            action_type = "mouse_click"
+            data = {"x": x, "y": y, "button": "droit" if a & 2 else "gauche", "pressed": bool(a & 1)}
+        elif code == cls.SCROLL:
+            action_type, data = "scroll", {"x": x, "y": y, "dx": a, "dy": b}
+        elif code == cls.KEY_PRESS:
+            action_type, data = "key_press", {"key": key}
+        else:
+            action_type, data = "key_release", {"key": key}
+        return MacroAction(action_type, round(t, 6), data)
+
+class SharedEventRing:
+    """Tampon circulaire d'événements de taille fixe en mémoire partagée (un processus écrit, un autre lit)
+
+    Chaque enregistrement porte son numéro de séquence, mis à 0 pendant que l'écrivain
+    remplit l'emplacement puis écrit en dernier. Le lecteur ne garde un enregistrement
+    que si la séquence attendue est lue avant et après sa copie : les enregistrements
+    écrasés avant d'avoir été lus, ou en cours de réécriture, sont comptés dans `dropped`.
+    """
+
+    HEADER = struct.Struct("<Q")                  # nombre total d'événements écrits
+    RECORD = struct.Struct("<QB3xdiiii32s")       # séquence, code, t, x, y, a, b, touche
+    SEQ = struct.Struct("<Q")                     # séquence seule (début de l'enregistrement)
+    KEY_SIZE = 32
+
+    def __init__(self, capacity: int = 65536, name: Optional[str] = None):
+        self.capacity = max(1, capacity)
+        self.owner = name is None
+        size = self.HEADER.size + self.capacity * self.RECORD.size
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.buf = self.shm.buf
+        if self.owner:
+            self.HEADER.pack_into(self.buf, 0, 0)
+        self.read_index = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def written(self) -> int:
+        return self.HEADER.unpack_from(self.buf, 0)[0]
+
+    def push(self, code: int, t: float, x: int = 0, y: int = 0, a: int = 0, b: int = 0, key: Optional[str] = None):
+        with self._lock:
+            index = self.HEADER.unpack_from(self.buf, 0)[0]
+            offset = self.HEADER.size + (index % self.capacity) * self.RECORD.size
+            self.SEQ.pack_into(self.buf, offset, 0)  # emplacement en cours d'écriture
+            self.RECORD.pack_into(self.buf, offset, 0, code, t, x, y, a, b,
+                                  (key or "").encode("utf-8")[:self.KEY_SIZE])
+            self.SEQ.pack_into(self.buf, offset, index + 1)
+            self.HEADER.pack_into(self.buf, 0, index + 1)
+
+    def read_batch(self, max_events: int = 4096) -> List[tuple]:
+        """Lit les événements non encore lus : liste de (code, t, x, y, a, b, touche)"""
+        written = self.written()
+        if written - self.read_index > self.capacity:
+            self.dropped += written - self.capacity - self.read_index
+            self.read_index = written - self.capacity
+
+        end = min(written, self.read_index + max_events)
+        records = []
+        for index in range(self.read_index, end):
+            offset = self.HEADER.size + (index % self.capacity) * self.RECORD.size
+            seq, code, t, x, y, a, b, key = self.RECORD.unpack_from(self.buf, offset)
+            records.append((index, seq, code, t, x, y, a, b, key))
+
+        # Un enregistrement a pu être réécrit pendant la copie : sa séquence est relue après coup
+        events = []
+        for index, seq, code, t, x, y, a, b, key in records:
+            offset = self.HEADER.size + (index % self.capacity) * self.RECORD.size
+            if seq != index + 1 or self.SEQ.unpack_from(self.buf, offset)[0] != seq:
+                self.dropped += 1
+                continue
+            events.append((code, t, x, y, a, b, key.rstrip(b"\0").decode("utf-8", "replace") or None))
+        self.read_index = end
+        return events
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+def _capture_worker_main(shm_name: str, capacity: int, conn):
+    """Processus de capture : listeners pynput écrivant dans un SharedEventRing, piloté par un Pipe"""
+    ring = SharedEventRing(capacity, shm_name)
+    listeners = []
+
+    def stop_listeners():
+        for listener in listeners:
+            listener.stop()
+        listeners.clear()
+
+    def on_click(x, y, button, pressed):
+        flags = (1 if pressed else 0) | (0 if button == MouseButton.left else 2)
+        ring.push(ActionRingBuffer.CLICK, time.monotonic(), int(x), int(y), flags)
+
+    try:
+        while True:
+            cmd, args = conn.recv()
+            try:
+                if cmd == "start":
+                    if not MODULES_AVAILABLE:
+                        raise RuntimeError("Modules pynput/pyautogui non disponibles")
+                    if not listeners:
+                        listeners.append(mouse.Listener(
+                            on_move=lambda x, y: ring.push(ActionRingBuffer.MOVE, time.monotonic(), int(x), int(y)),
+                            on_click=on_click,
+                            on_scroll=lambda x, y, dx, dy: ring.push(
+                                ActionRingBuffer.SCROLL, time.monotonic(), int(x), int(y), int(dx), int(dy))))
+                        listeners.append(keyboard.Listener(
+                            on_press=lambda key: ring.push(ActionRingBuffer.KEY_PRESS, time.monotonic(), key=str(key)),
+                            on_release=lambda key: ring.push(ActionRingBuffer.KEY_RELEASE, time.monotonic(), key=str(key))))
+                        for listener in listeners:
+                            listener.start()
+                elif cmd == "stop":
+                    stop_listeners()
+                elif cmd == "synthetic":
+                    # Flux cadencé de mouvements (benchmarks) : x = numéro de l'événement
+                    count, rate, t0 = args
+                    for k in range(count):
+                        delay = t0 + k / rate - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        ring.push(ActionRingBuffer.MOVE, time.monotonic(), k, 0)
+                elif cmd == "quit":
+                    conn.send(("ok", None))
+                    break
+                conn.send(("ok", None))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        stop_listeners()
+        ring.close()
+
+class CaptureProcess:
+    """Capture des entrées hors du processus de l'interface
+
+    Les listeners tournent dans un processus dédié (avec son propre GIL) et écrivent des
+    enregistrements de taille fixe dans un SharedEventRing ; l'interface les lit par lots
+    (QTimer du recorder). Un Pipe sert de canal de contrôle (start/stop/quit).
+    """
+
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self.ring: Optional[SharedEventRing] = None
+        self.process = None
+        self.conn = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def launch(self):
+        if self.is_alive:
+            return
+        self.close()
+        self.ring = SharedEventRing(self.capacity)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_capture_worker_main,
+                                               args=(self.ring.name, self.capacity, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def send(self, cmd: str, *args):
+        self.conn.send((cmd, args))
+
+    def reply(self, timeout: float = 5.0):
+        if not self.conn.poll(timeout):
+            raise RuntimeError("Le processus de capture ne répond pas")
+        status, value = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(value)
+        return value
+
+    def command(self, cmd: str, *args, timeout: float = 5.0):
+        self.send(cmd, *args)
+        return self.reply(timeout)
+
+    def start(self):
+        self.launch()
+        self.ring.read_index = self.ring.written()
+        self.command("start")
+
+    def stop(self):
+        if self.is_alive:
+            self.command("stop")
+
+    def read_batch(self, max_events: int = 4096) -> List[tuple]:
+        return self.ring.read_batch(max_events) if self.ring else []
+
+    def close(self):
+        if self.is_alive:
+            try:
+                self.command("quit", timeout=1.0)
+            except Exception:
+                pass
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.conn is not None:
+            self.conn.close()
+        if self.ring is not None:
+            self.ring.close()
+        self.process = self.conn = self.ring = None
+
+class _RopeNode:
+    """Nœud immuable de la corde d'actions (feuille = tuple d'actions, branche = deux sous-arbres)
+
+    `shift` est un décalage de timestamp appliqué paresseusement à tout le sous-arbre :
+    retimer une plage revient à envelopper un sous-arbre, sans toucher aux actions.
+    """
+
+    __slots__ = ("left", "right", "items", "size", "height", "shift", "max_ts")
+
+    def __init__(self, left=None, right=None, items=None, shift=0.0):
+        self.left = left
+        self.right = right
+        self.items = items
+        self.shift = shift
+        if items is not None:
+            self.size = len(items)
+            self.height = 0
+            self.max_ts = max((a.timestamp for a in items), default=float("-inf")) + shift
+        else:
+            self.size = left.size + right.size
+            self.height = max(left.height, right.height) + 1
+            self.max_ts = max(left.max_ts, right.max_ts) + shift
+
+class ActionRope:
+    """Séquence persistante d'actions (corde équilibrée AVL)
+
+    Insertion, suppression et décalage temporel d'une plage coûtent O(log² n) et
+    retournent une nouvelle corde qui partage tous les nœuds non modifiés avec
+    l'ancienne : conserver une version (pour annuler) coûte O(1).
+    """
+
+    LEAF_SIZE = 256
+
+    def __init__(self, root: Optional[_RopeNode] = None):
+        self.root = root
+
+    @classmethod
+    def from_actions(cls, actions: List[MacroAction]) -> "ActionRope":
+        nodes = [_RopeNode(items=tuple(actions[i:i + cls.LEAF_SIZE]))
+                 for i in range(0, len(actions), cls.LEAF_SIZE)]
+        while len(nodes) > 1:
+            paired = [_RopeNode(nodes[i], nodes[i + 1]) for i in range(0, len(nodes) - 1, 2)]
+            if len(nodes) % 2:
+                paired[-1] = cls._join(paired[-1], nodes[-1])
+            nodes = paired
+        return cls(nodes[0] if nodes else None)
+
+    def __len__(self):
+        return self.root.size if self.root else 0
+
+    def __iter__(self):
+        stack = [(self.root, 0.0)] if self.root else []
+        while stack:
+            node, shift = stack.pop()
+            shift += node.shift
+            if node.items is not None:
+                if shift:
+                    for action in node.items:
+                        yield MacroAction(action.action_type, action.timestamp + shift, action.data)
+                else:
+                    yield from node.items
+            else:
+                stack.append((node.right, shift))
+                stack.append((node.left, shift))
+
+    def __getitem__(self, index: int) -> MacroAction:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index hors de la corde")
+        node, shift = self.root, 0.0
+        while node.items is None:
+            shift += node.shift
+            if index < node.left.size:
+                node = node.left
+            else:
+                index -= node.left.size
+                node = node.right
+        shift += node.shift
+        action = node.items[index]
+        return MacroAction(action.action_type, action.timestamp + shift, action.data) if shift else action
+
+    def to_list(self) -> List[MacroAction]:
+        return list(self)
+
+    def max_timestamp(self) -> float:
+        return self.root.max_ts if self.root else 0.0
+
+    # Opérations d'édition (retournent une nouvelle corde)
+    def insert(self, index: int, actions: List[MacroAction]) -> "ActionRope":
+        left, right = self._split(self.root, index)
+        middle = ActionRope.from_actions(actions).root
+        return ActionRope(self._join(self._join(left, middle), right))
+
+    def delete(self, start: int, end: int) -> "ActionRope":
+        left, rest = self._split(self.root, start)
+        _, right = self._split(rest, end - start)
+        return ActionRope(self._join(left, right))
+
+    def shift(self, start: int, end: int, dt: float) -> "ActionRope":
+        left, rest = self._split(self.root, start)
+        middle, right = self._split(rest, end - start)
+        if middle is not None:
+            middle = self._with_shift(middle, dt)
+        return ActionRope(self._join(self._join(left, middle), right))
+
+    def slice(self, start: int, end: int) -> List[MacroAction]:
+        _, rest = self._split(self.root, start)
+        middle, _ = self._split(rest, end - start)
+        return list(ActionRope(middle))
+
+    # Primitives de l'arbre
+    @staticmethod
+    def _with_shift(node: _RopeNode, dt: float) -> _RopeNode:
+        if node.items is not None:
+            return _RopeNode(items=node.items, shift=node.shift + dt)
+        return _RopeNode(node.left, node.right, shift=node.shift + dt)
+
+    @classmethod
+    def _push(cls, node: _RopeNode) -> _RopeNode:
+        """Descend le décalage d'une branche dans ses enfants"""
+        if not node.shift:
+            return node
+        return _RopeNode(cls._with_shift(node.left, node.shift), cls._with_shift(node.right, node.shift))
+
+    @classmethod
+    def _materialize(cls, leaf: _RopeNode) -> tuple:
+        if not leaf.shift:
+            return leaf.items
+        return tuple(MacroAction(a.action_type, a.timestamp + leaf.shift, a.data) for a in leaf.items)
+
+    @classmethod
+    def _rotate_left(cls, node: _RopeNode) -> _RopeNode:
+        right = cls._push(node.right)
+        return _RopeNode(_RopeNode(node.left, right.left), right.right)
+
+    @classmethod
+    def _rotate_right(cls, node: _RopeNode) -> _RopeNode:
+        left = cls._push(node.left)
+        return _RopeNode(left.left, _RopeNode(left.right, node.right))
+
+    @classmethod
+    def _balance(cls, node: _RopeNode) -> _RopeNode:
+        if node.items is not None:
+            return node
+        diff = node.left.height - node.right.height
+        if diff > 1:
+            left = cls._push(node.left)
+            if left.left.height < left.right.height:
+                left = cls._rotate_left(left)
+            return cls._rotate_right(_RopeNode(left, node.right))
+        if diff < -1:
+            right = cls._push(node.right)
+            if right.right.height < right.left.height:
+                right = cls._rotate_right(right)
+            return cls._rotate_left(_RopeNode(node.left, right))
+        return node
+
+    @classmethod
+    def _join(cls, left: Optional[_RopeNode], right: Optional[_RopeNode]) -> Optional[_RopeNode]:
+        if left is None or left.size == 0:
+            return right
+        if right is None or right.size == 0:
+            return left
+        if left.height > right.height + 1:
+            left = cls._push(left)
+            return cls._balance(_RopeNode(left.left, cls._join(left.right, right)))
+        if right.height > left.height + 1:
+            right = cls._push(right)
+            return cls._balance(_RopeNode(cls._join(left, right.left), right.right))
+        if left.items is not None and right.items is not None and left.size + right.size <= cls.LEAF_SIZE:
+            return _RopeNode(items=cls._materialize(left) + cls._materialize(right))
+        return _RopeNode(left, right)
+
+    @classmethod
+    def _split(cls, node: Optional[_RopeNode], k: int):
+        if node is None:
+            return None, None
+        if k <= 0:
+            return None, node
+        if k >= node.size:
+            return node, None
+        if node.items is not None:
+            return (_RopeNode(items=node.items[:k], shift=node.shift),
+                    _RopeNode(items=node.items[k:], shift=node.shift))
+        node = cls._push(node)
+        if k < node.left.size:
+            left, right = cls._split(node.left, k)
+            return left, cls._join(right, node.right)
+        left, right = cls._split(node.right, k - node.left.size)
+        return cls._join(node.left, left), right
+
+class MacroEditor:
+    """Édition des actions avec annuler/rétablir illimités sur une ActionRope
+
+    Chaque édition retourne la liste des modifications à appliquer à la vue, dans l'ordre :
+    ("insert", début, fin), ("delete", début, fin) ou ("update", début, fin), les indices
+    désignant les lignes de la corde résultante (ou de l'ancienne vue pour "delete").
+    """
+
+    def __init__(self, actions: Optional[List[MacroAction]] = None):
+        self.reset(actions or [])
+
+    def reset(self, actions: List[MacroAction]):
+        self.rope = ActionRope.from_actions(actions)
+        self.undo_stack: List[tuple] = []
+        self.redo_stack: List[tuple] = []
+
+    def __len__(self):
+        return len(self.rope)
+
+    def to_list(self) -> List[MacroAction]:
+        return self.rope.to_list()
+
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def _apply(self, rope: ActionRope, description: str, changes: List[tuple], inverse: List[tuple]) -> List[tuple]:
+        self.undo_stack.append((self.rope, description, inverse, changes))
+        self.redo_stack.clear()
+        self.rope = rope
+        return changes
+
+    def insert(self, index: int, actions: List[MacroAction], description: str = "Insertion") -> List[tuple]:
+        index = max(0, min(index, len(self.rope)))
+        end = index + len(actions)
+        return self._apply(self.rope.insert(index, actions), description,
+                           [("insert", index, end)], [("delete", index, end)])
+
+    def delete_ranges(self, ranges: List[tuple], description: str = "Suppression") -> List[tuple]:
+        """Supprime plusieurs plages [début, fin) en une seule étape d'annulation"""
+        ranges = sorted(ranges, reverse=True)
+        rope = self.rope
+        for start, end in ranges:
+            rope = rope.delete(start, end)
+        return self._apply(rope, description,
+                           [("delete", start, end) for start, end in ranges],
+                           [("insert", start, end) for start, end in reversed(ranges)])
+
+    def update(self, index: int, action: MacroAction, description: str = "Modification") -> List[tuple]:
+        rope = self.rope.delete(index, index + 1).insert(index, [action])
+        return self._apply(rope, description, [("update", index, index + 1)], [("update", index, index + 1)])
+
+    def shift(self, start: int, end: int, dt: float, description: str = "Décalage") -> List[tuple]:
+        return self._apply(self.rope.shift(start, end, dt), description,
+                           [("update", start, end)], [("update", start, end)])
+
+    def duplicate(self, start: int, end: int, description: str = "Duplication") -> List[tuple]:
+        """Duplique la plage à sa suite et décale les actions suivantes d'autant"""
+        block = self.rope.slice(start, end)
+        if not block:
+            return []
+        span = max(block[-1].timestamp - block[0].timestamp, 0.05)
+        copies = [MacroAction(a.action_type, a.timestamp + span, a.data) for a in block]
+        count, total = len(copies), len(self.rope)
+        rope = self.rope.insert(end, copies).shift(end + count, total + count, span)
+        return self._apply(rope, description,
+                           [("insert", end, end + count), ("update", end + count, total + count)],
+                           [("delete", end, end + count), ("update", end, total)])
+
+    def undo(self) -> Optional[List[tuple]]:
+        if not self.undo_stack:
+            return None
+        previous, description, inverse, changes = self.undo_stack.pop()
+        self.redo_stack.append((self.rope, description, changes, inverse))
+        self.rope = previous
+        return inverse
+
+    def replace_all(self, actions: List[MacroAction], description: str = "Remplacement") -> List[tuple]:
+        """Remplace toute la macro (ex. regroupement de la saisie) en une seule étape d'annulation"""
+        old, new = len(self.rope), len(actions)
+        return self._apply(ActionRope.from_actions(actions), description,
+                           [("delete", 0, old), ("insert", 0, new)],
+                           [("delete", 0, new), ("insert", 0, old)])
+
+    def redo(self) -> Optional[List[tuple]]:
+        if not self.redo_stack:
+            return None
+        following, description, changes, inverse = self.redo_stack.pop()
+        self.undo_stack.append((self.rope, description, inverse, changes))
+        self.rope = following
+        return changes
+
+def dhash(image, size: int = 8) -> int:
+    """Empreinte perceptuelle (difference hash) : 64 bits comparés par distance de Hamming"""
+    pixels = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR).tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+class ThumbnailStore:
+    """Fichier annexe de vignettes d'une macro (<macro>.thumbs, archive zip)
+
+    index.json associe chaque identifiant de vignette (data["thumb"] des actions) à une
+    image JPEG ; les images identiques à l'œil ne sont stockées qu'une fois. L'archive
+    n'est ouverte qu'au premier accès et chaque image est lue à la demande.
+    """
+
+    SUFFIX = ".thumbs"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._zip: Optional[zipfile.ZipFile] = None
+        self.index: Dict[str, str] = {}
+
+    @classmethod
+    def for_macro(cls, macro_path) -> "ThumbnailStore":
+        return cls(str(macro_path) + cls.SUFFIX)
+
+    def _open(self) -> bool:
+        if self._zip is None:
+            if not self.path.exists():
+                return False
+            self._zip = zipfile.ZipFile(self.path)
+            self.index = json.loads(self._zip.read("index.json"))
+        return True
+
+    def get(self, thumb_id: str) -> Optional[bytes]:
+        if not self._open():
+            return None
+        image_id = self.index.get(thumb_id)
+        return self._zip.read(f"{image_id}.jpg") if image_id else None
+
+    def close(self):
+        if self._zip:
+            self._zip.close()
+            self._zip = None
+
+    @classmethod
+    def write(cls, path, thumb_ids, sources) -> int:
+        """Écrit (atomiquement) les vignettes référencées, prises dans la première source qui les connaît
+
+        `sources` : objets exposant `index` (vignette -> image) et `image_bytes(image_id)`.
+        Retourne le nombre d'images écrites.
+        """
+        index, images = {}, {}
+        for thumb_id in thumb_ids:
+            for source in sources:
+                image_id = source.image_id(thumb_id)
+                if image_id is not None:
+                    index[thumb_id] = image_id
+                    if image_id not in images:
+                        images[image_id] = source.image_bytes(image_id)
+                    break
+
+        path = Path(path)
+        if not index:
+            path.unlink(missing_ok=True)
+            return 0
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr("index.json", json.dumps(index))
+            for image_id, data in images.items():
+                archive.writestr(f"{image_id}.jpg", data)  # JPEG déjà compressé : stocké tel quel
+        os.replace(tmp_path, path)
+        return len(images)
+
+    # Interface de source pour write() (fichier annexe existant)
+    def image_id(self, thumb_id: str) -> Optional[str]:
+        return self.index.get(thumb_id) if self._open() else None
+
+    def image_bytes(self, image_id: str) -> bytes:
+        self._open()
+        return self._zip.read(f"{image_id}.jpg")
+
+class ThumbnailCapturer:
+    """Capture de vignettes autour des clics et des rafales de frappe, hors des callbacks
+
+    Les callbacks des listeners ne font qu'attribuer un identifiant et déposer une demande
+    dans une file bornée (sans attente, ignorée si pleine). Un thread dédié capture la zone,
+    calcule son dHash, réutilise une image déjà vue si elle est perceptuellement identique
+    (distance de Hamming <= DEDUP_DISTANCE) et sinon la compresse en JPEG en mémoire.
+
+    Budget : le thread s'abstient quand son temps CPU dépasse `cpu_budget` (fraction d'un
+    cœur depuis le début de l'enregistrement) ou quand les images dépassent `memory_budget`.
+    """
+
+    DEDUP_DISTANCE = 4
+    QUEUE_SIZE = 64
+    JPEG_QUALITY = 70
+    KEY_BURST_GAP = 1.0  # une vignette pour la première frappe après une pause
+
+    def __init__(self, size: int = 160, cpu_budget: float = 0.05, memory_budget: int = 8 * 1024 * 1024,
+                 grabber=None):
+        self.size = size
+        self.cpu_budget = cpu_budget
+        self.memory_budget = memory_budget
+        self.grabber = grabber or self._grab_screen
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(self.QUEUE_SIZE)
+        self.session = os.urandom(3).hex()
+        self.index: Dict[str, str] = {}
+        self.images: Dict[str, bytes] = {}
+        self._hashes: List[tuple] = []
+        self._counter = itertools.count()
+        self._last_key_time = float("-inf")
+        self._thread: Optional[threading.Thread] = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"requested": 0, "captured": 0, "deduplicated": 0, "dropped_queue": 0,
+                      "skipped_cpu": 0, "skipped_memory": 0, "errors": 0, "cpu_ms": 0.0,
+                      "bytes": 0, "callback_us_max": 0.0, "callback_us_total": 0.0}
+        self._started_at = time.perf_counter()
+
+    @staticmethod
+    def _grab_screen(left: int, top: int, width: int, height: int):
+        return pyautogui.screenshot(region=(left, top, width, height))
+
+    # Côté listeners (aucune attente)
+    def request(self, x: int, y: int) -> Optional[str]:
+        """Demande une vignette centrée sur (x, y) ; retourne son identifiant (None si file pleine)"""
+        start = time.perf_counter()
+        thumb_id = f"{self.session}-{next(self._counter)}"
+        try:
+            self.queue.put_nowait((thumb_id, int(x), int(y)))
+        except queue.Full:
+            self.stats["dropped_queue"] += 1
+            thumb_id = None
+        stats = self.stats
+        stats["requested"] += 1
+        cost = (time.perf_counter() - start) * 1e6
+        stats["callback_us_total"] += cost
+        stats["callback_us_max"] = max(stats["callback_us_max"], cost)
+        return thumb_id
+
+    def request_key(self, x: int, y: int, now: float) -> Optional[str]:
+        """Vignette de début de rafale de frappe (au pointeur), None pendant la rafale"""
+        previous, self._last_key_time = self._last_key_time, now
+        return self.request(x, y) if now - previous >= self.KEY_BURST_GAP else None
+
+    # Thread de capture
+    def start(self):
+        """Démarre une nouvelle session (les vignettes de l'enregistrement précédent sont oubliées)"""
+        if self._thread is None:
+            self.session = os.urandom(3).hex()
+            self.index, self.images, self._hashes = {}, {}, []
+            self._last_key_time = float("-inf")
+            self.reset_stats()
+            self._thread = threading.Thread(target=self._run, name="macro-thumbnails", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Termine les captures en attente puis arrête le thread"""
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            cpu_start = time.thread_time()
+            self._capture(*item)
+            self.stats["cpu_ms"] += (time.thread_time() - cpu_start) * 1000.0
+
+    def _capture(self, thumb_id: str, x: int, y: int):
+        stats = self.stats
+        elapsed = time.perf_counter() - self._started_at
+        if stats["cpu_ms"] / 1000.0 > self.cpu_budget * max(elapsed, 1.0):
+            stats["skipped_cpu"] += 1
+            return
+        if stats["bytes"] >= self.memory_budget:
+            stats["skipped_memory"] += 1
+            return
+        try:
+            half = self.size // 2
+            image = self.grabber(max(0, x - half), max(0, y - half), self.size, self.size)
+            fingerprint = dhash(image)
+            for known, image_id in self._hashes:
+                if (known ^ fingerprint).bit_count() <= self.DEDUP_DISTANCE:
+                    self.index[thumb_id] = image_id
+                    stats["deduplicated"] += 1
+                    return
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, "JPEG", quality=self.JPEG_QUALITY, optimize=True)
+            image_id = f"{fingerprint:016x}"
+            self.images[image_id] = buffer.getvalue()
+            self._hashes.append((fingerprint, image_id))
+            self.index[thumb_id] = image_id
+            stats["captured"] += 1
+            stats["bytes"] += len(self.images[image_id])
+        except Exception:
+            stats["errors"] += 1
+
+    # Interface de source pour ThumbnailStore.write()
+    def image_id(self, thumb_id: str) -> Optional[str]:
+        return self.index.get(thumb_id)
+
+    def image_bytes(self, image_id: str) -> bytes:
+        return self.images[image_id]
+
+    def get(self, thumb_id: str) -> Optional[bytes]:
+        image_id = self.index.get(thumb_id)
+        return self.images.get(image_id) if image_id else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Coût mesuré de l'enregistrement en cours (ou du dernier)"""
+        stats = dict(self.stats)
+        requests = max(stats["requested"], 1)
+        stats["callback_us_mean"] = round(stats.pop("callback_us_total") / requests, 2)
+        stats["callback_us_max"] = round(stats["callback_us_max"], 2)
+        stats["cpu_ms"] = round(stats["cpu_ms"], 2)
+        stats["images"] = len(self.images)
+        return stats
+
+class WindowGeometryCache:
+    """Géométrie des fenêtres de premier niveau, tenue à jour par les événements X11
+
+    Un thread dédié (connexion X séparée) écoute SubstructureNotify sur la racine et
+    PropertyChange sur les fenêtres clientes : CreateNotify/ConfigureNotify/DestroyNotify maintiennent l'ordre d'empilement,
+    ConfigureNotify la position et la taille, Map/Unmap la visibilité, PropertyNotify le titre.
+    L'arbre n'est interrogé qu'au démarrage et à l'apparition d'une fenêtre : les recherches
+    (locate au clic, resolve à la lecture) ne lisent que des structures en mémoire.
+
+    Entrées : id -> (x, y, largeur, hauteur, classe WM_CLASS, titre, pid), remplacées d'un bloc
+    (lecture sans verrou). Sans python-xlib ni serveur X, le cache s'alimente par update().
+    """
+
+    POLL_INTERVAL = 0.2
+
+    def __init__(self):
+        self.windows: Dict[int, tuple] = {}
+        self.stacking: List[int] = []  # enfants de la racine, du bas vers le haut
+        self._by_identity: Dict[tuple, int] = {}
+        self._by_class: Dict[str, int] = {}
+        self._clients: Dict[int, int] = {}  # fenêtre client (titre) -> fenêtre de premier niveau (cadre)
+        self._lock = threading.Lock()
+        self._display = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.stats = {"events": 0, "tree_queries": 0}
+
+    @staticmethod
+    def available() -> bool:
+        return XLIB_AVAILABLE and bool(os.environ.get("DISPLAY"))
+
+    # Mises à jour (thread X11 ou alimentation directe)
+    def update(self, window_id: int, x: int, y: int, width: int, height: int,
+               wm_class: Optional[str] = None, title: Optional[str] = None, pid: Optional[int] = None):
+        """Crée ou déplace une fenêtre ; une nouvelle fenêtre est placée au sommet de la pile"""
+        with self._lock:
+            previous = self.windows.get(window_id)
+            if previous is not None and wm_class is None:
+                wm_class, title, pid = previous[4], previous[5] if title is None else title, previous[6]
+            self.windows[window_id] = (x, y, width, height, wm_class, title, pid)
+            if window_id not in self.stacking:
+                self.stacking = self.stacking + [window_id]
+            if previous is None or previous[4:] != (wm_class, title, pid):
+                self._reindex()
+
+    def set_title(self, window_id: int, title: str):
+        previous = self.windows.get(window_id)
+        if previous is not None and previous[5] != title:
+            self.update(window_id, *previous[:5], title, previous[6])
+
+    def restack(self, window_id: int, above: int = 0):
+        """Place la fenêtre juste au-dessus de `above` (0 : tout en bas), comme ConfigureNotify"""
+        with self._lock:
+            stacking = [wid for wid in self.stacking if wid != window_id]
+            position = stacking.index(above) + 1 if above in stacking else 0
+            stacking.insert(position, window_id)
+            self.stacking = stacking
+            self._reindex()
+
+    def remove(self, window_id: int, destroyed: bool = True):
+        """Fenêtre masquée (reste dans la pile) ou détruite"""
+        with self._lock:
+            self.windows.pop(window_id, None)
+            if destroyed and window_id in self.stacking:
+                self.stacking = [wid for wid in self.stacking if wid != window_id]
+            self._reindex()
+
+    def _reindex(self):
+        """Index d'identité reconstruits aux seuls changements d'identité ou d'empilement (rares)"""
+        by_identity, by_class = {}, {}
+        for wid in self.stacking:  # du bas vers le haut : la plus haute l'emporte
+            info = self.windows.get(wid)
+            if info is not None and info[4]:
+                by_identity[(info[4], info[5])] = wid
+                by_class[info[4]] = wid
+        self._by_identity, self._by_class = by_identity, by_class
+
+    # Recherches (callbacks d'enregistrement et boucle de lecture)
+    def window_at(self, x: int, y: int) -> Optional[int]:
+        """Fenêtre identifiée la plus haute contenant le point"""
+        windows = self.windows
+        for wid in reversed(self.stacking):
+            info = windows.get(wid)
+            if info is not None and info[0] <= x < info[0] + info[2] and info[1] <= y < info[1] + info[3]:
+                if info[4]:
+                    return wid
+        return None
+
+    def locate(self, x: int, y: int) -> Optional[Dict[str, Any]]:
+        """Identité de la fenêtre sous le point et décalage depuis son origine"""
+        wid = self.window_at(x, y)
+        if wid is None:
+            return None
+        wx, wy, _, _, wm_class, title, _ = self.windows[wid]
+        return {"class": wm_class, "title": title, "ox": x - wx, "oy": y - wy}
+
+    def resolve(self, window: Dict[str, Any]) -> Optional[tuple]:
+        """Origine actuelle de la fenêtre enregistrée (même classe et titre, sinon même classe)"""
+        wid = self._by_identity.get((window.get("class"), window.get("title")))
+        if wid is None:
+            wid = self._by_class.get(window.get("class"))
+        info = self.windows.get(wid)
+        return (info[0], info[1]) if info is not None else None
+
+    # Écoute X11
+    def start(self) -> bool:
+        if self._thread is not None:
+            return True
+        if not self.available():
+            return False
+        self._display = xdisplay.Display()
+        self._atoms = {name: self._display.intern_atom(name)
+                       for name in ("WM_NAME", "_NET_WM_NAME", "_NET_WM_PID", "UTF8_STRING")}
+        root = self._display.screen().root
+        root.change_attributes(event_mask=X.SubstructureNotifyMask)
+        self._display.sync()
+        children = root.query_tree().children
+        self.stats["tree_queries"] += 1
+        with self._lock:
+            self.stacking = [child.id for child in children]
+        for child in children:
+            self._track(child)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="macro-windows", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._display is not None:
+            self._display.close()
+            self._display = None
+
+    def _run(self):
+        display = self._display
+        while self._running:
+            if not display.pending_events():
+                select.select([display], [], [], self.POLL_INTERVAL)
+                continue
+            event = display.next_event()
+            self.stats["events"] += 1
+            try:
+                self._handle(event)
+            except Exception:
+                pass  # fenêtre disparue entre l'événement et sa lecture
+
+    def _handle(self, event):
+        kind = event.type
+        if kind == X.ConfigureNotify:
+            wid = event.window.id
+            info = self.windows.get(wid)
+            if info is not None:
+                self.update(wid, event.x, event.y, event.width, event.height)
+            above = event.above_sibling.id if event.above_sibling else 0
+            if self._below(wid) != above:
+                self.restack(wid, above)
+        elif kind == X.CreateNotify:
+            with self._lock:
+                self.stacking = self.stacking + [event.window.id]
+        elif kind == X.ReparentNotify:
+            if event.parent.id == self._display.screen().root.id:
+                with self._lock:
+                    self.stacking = self.stacking + [event.window.id]
+            else:
+                self.remove(event.window.id)
+        elif kind == X.MapNotify:
+            self._track(event.window)
+        elif kind == X.UnmapNotify:
+            self.remove(event.window.id, destroyed=False)
+        elif kind == X.DestroyNotify:
+            self.remove(event.window.id)
+        elif kind == X.PropertyNotify and event.atom in (self._atoms["WM_NAME"], self._atoms["_NET_WM_NAME"]):
+            frame = self._clients.get(event.window.id)
+            if frame is not None:
+                self.set_title(frame, self._title(event.window))
+
+    def _below(self, window_id: int) -> int:
+        stacking = self.stacking
+        position = stacking.index(window_id) if window_id in stacking else 0
+        return stacking[position - 1] if position > 0 else 0
+
+    def _track(self, window):
+        """Lit l'identité d'une fenêtre de premier niveau qui apparaît (seul accès à l'arbre)"""
+        attributes = window.get_attributes()
+        if attributes.override_redirect or attributes.map_state != X.IsViewable:
+            return
+        client = self._client_of(window)
+        if client is None:
+            return
+        wm_class = client.get_wm_class()
+        pid = client.get_full_property(self._atoms["_NET_WM_PID"], X.AnyPropertyType)
+        geometry = window.get_geometry()
+        client.change_attributes(event_mask=X.PropertyChangeMask)
+        self._clients[client.id] = window.id
+        self.update(window.id, geometry.x, geometry.y, geometry.width, geometry.height,
+                    wm_class[1] if wm_class else "", self._title(client), int(pid.value[0]) if pid else None)
+
+    def _client_of(self, window, depth: int = 2):
+        """Fenêtre portant WM_CLASS : le cadre lui-même ou un descendant (gestionnaire qui re-parente)"""
+        if window.get_wm_class():
+            return window
+        if depth:
+            self.stats["tree_queries"] += 1
+            for child in window.query_tree().children:
+                client = self._client_of(child, depth - 1)
+                if client is not None:
+                    return client
+        return None
+
+    def _title(self, client) -> str:
+        prop = client.get_full_property(self._atoms["_NET_WM_NAME"], self._atoms["UTF8_STRING"])
+        if prop is not None:
+            return prop.value.decode("utf-8", "replace") if isinstance(prop.value, bytes) else str(prop.value)
+        return client.get_wm_name() or ""
+
+@dataclass
+class CaptureScope:
+    """Portée de l'enregistrement, vérifiée dans les callbacks des listeners
+
+    Un événement hors portée est abandonné avant la création de son MacroAction et
+    l'émission du signal. Les souris sont filtrées par type, zone, zones exclues,
+    fenêtre/processus cible et processus exclu (les fenêtres de l'enregistreur) ; les deux
+    derniers utilisent la fenêtre la plus haute sous le point dans le cache de fenêtres X11,
+    donc une application qui recouvre l'enregistreur reste enregistrée. Les touches, sans
+    position, sont filtrées par type et par touches ou raccourcis exclus.
+
+    Raccourcis : "<ctrl>+<shift>+r" (syntaxe pynput) abandonne r et son relâchement quand
+    les modificateurs sont maintenus ; les modificateurs eux-mêmes restent enregistrés.
+    Les touches caractères sont comparées sans la casse (Maj maintenue, pynput signale 'R').
+    """
+
+    event_types: Optional[frozenset] = None     # types d'actions gardés (None : tous)
+    region: Optional[tuple] = None              # (gauche, haut, largeur, hauteur) gardée
+    exclude_regions: List[tuple] = field(default_factory=list)
+    window_class: Optional[str] = None          # classe WM_CLASS de la fenêtre cible
+    pid: Optional[int] = None                   # processus propriétaire de la fenêtre cible
+    exclude_pid: Optional[int] = None           # processus dont les fenêtres sont ignorées
+    excluded_keys: frozenset = frozenset()      # "Key.f9", "'q'", "<ctrl>+r"...
+    window_cache: Optional[WindowGeometryCache] = None
+
+    MODIFIERS = ("ctrl", "shift", "alt", "cmd")
+
+    def __post_init__(self):
+        self.keys, self.hotkeys = set(), {}
+        for entry in self.excluded_keys:
+            if "+" not in entry.strip("+"):
+                self.keys.add(self._pynput_name(entry))
+                continue
+            *modifiers, key = entry.split("+")
+            self.hotkeys.setdefault(self._pynput_name(key), []).append(frozenset(m.strip("<>") for m in modifiers))
+        self.reset()
+
+    @classmethod
+    def _pynput_name(cls, token: str) -> str:
+        """Nom de touche tel que str(key) dans les callbacks : <f9> -> Key.f9, r -> 'r'"""
+        if token.startswith("<") and token.endswith(">"):
+            return f"Key.{token[1:-1]}"
+        return cls._fold(repr(token) if len(token) == 1 else token)
+
+    @staticmethod
+    def _fold(key: str) -> str:
+        """Touche caractère sans la casse : 'R' -> 'r' (les touches Key.* sont inchangées)"""
+        return key.lower() if len(key) == 3 and key[0] == key[2] == "'" else key
+
+    def reset(self):
+        self.seen = 0
+        self.dropped = {"type": 0, "region": 0, "window": 0, "key": 0}
+        self._held = set()
+        self._suppressed = set()
+
+    def allows(self, action_type: str, x: int, y: int) -> bool:
+        """Événement souris : True s'il doit être enregistré"""
+        self.seen += 1
+        if self.event_types is not None and action_type not in self.event_types:
+            reason = "type"
+        elif self.region is not None and not self._inside(self.region, x, y):
+            reason = "region"
+        elif self.exclude_regions and any(self._inside(rect, x, y) for rect in self.exclude_regions):
+            reason = "region"
+        elif (self.window_class is not None or self.pid is not None) and not self._in_target(x, y):
+            reason = "window"
+        elif self.exclude_pid is not None and self._owner(x, y) == self.exclude_pid:
+            reason = "window"
+        else:
+            return True
+        self.dropped[reason] += 1
+        return False
+
+    def allows_key(self, action_type: str, key: str) -> bool:
+        """Événement clavier (str(key) de pynput) : suit aussi les modificateurs maintenus"""
+        self.seen += 1
+        pressed = action_type == "key_press"
+        modifier = key[4:].split("_")[0] if key.startswith("Key.") else None
+        if modifier in self.MODIFIERS:
+            if pressed:
+                self._held.add(modifier)
+            else:
+                self._held.discard(modifier)
+        key = self._fold(key)
+
+        if self.event_types is not None and action_type not in self.event_types:
+            reason = "type"
+        elif key in self.keys:
+            reason = "key"
+        elif key in self._suppressed:
+            if not pressed:
+                self._suppressed.discard(key)
+            reason = "key"
+        elif pressed and any(mods <= self._held for mods in self.hotkeys.get(key, ())):
+            self._suppressed.add(key)
+            reason = "key"
+        else:
+            return True
+        self.dropped[reason] += 1
+        return False
+
+    @staticmethod
+    def _inside(rect: tuple, x: int, y: int) -> bool:
+        return rect[0] <= x < rect[0] + rect[2] and rect[1] <= y < rect[1] + rect[3]
+
+    def _window(self, x: int, y: int) -> Optional[tuple]:
+        """Entrée du cache pour la fenêtre la plus haute sous le point"""
+        cache = self.window_cache
+        wid = cache.window_at(x, y) if cache is not None else None
+        return cache.windows.get(wid) if wid is not None else None
+
+    def _in_target(self, x: int, y: int) -> bool:
+        info = self._window(x, y)
+        return info is not None and (self.window_class is None or info[4] == self.window_class) \
+            and (self.pid is None or info[6] == self.pid)
+
+    def _owner(self, x: int, y: int) -> Optional[int]:
+        info = self._window(x, y)
+        return info[6] if info is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        dropped = sum(self.dropped.values())
+        return {"seen": self.seen, "kept": self.seen - dropped, "dropped": dropped,
+                "ratio": round(dropped / self.seen, 3) if self.seen else 0.0, "by_reason": dict(self.dropped)}
+
+class TrackBuffer:
+    """Tampon borné d'une source d'enregistrement, alimenté par un seul thread
+
+    Un seul producteur par piste : les horodatages y sont croissants, ce qui permet la
+    fusion par tas sans tri. Tampon plein : l'événement est abandonné et compté.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.events: deque = deque()
+        self.last_timestamp = 0.0
+        self.pushed = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def push(self, action: MacroAction) -> bool:
+        events = self.events
+        if len(events) >= self.capacity:
+            self.dropped += 1
+            return False
+        events.append(action)
+        self.last_timestamp = action.timestamp
+        self.pushed += 1
+        if len(events) > self.high_water:
+            self.high_water = len(events)
+        return True
+
+    def pop_until(self, watermark: float) -> List[MacroAction]:
+        """Retire les événements horodatés jusqu'au filigrane inclus (tous si infini)"""
+        events, ready = self.events, []
+        while events and events[0].timestamp <= watermark:
+            ready.append(events.popleft())
+        return ready
+
+class TrackTimeline:
+    """Chronologie unique fusionnant plusieurs sources d'enregistrement
+
+    Chaque source (souris et clavier locaux, autres écrans X, événements injectés,
+    marqueurs) dépose ses actions dans sa propre piste (TrackBuffer, `capacity` événements
+    au plus), horodatées sur une horloge monotone commune relative au début. drain()
+    fusionne les pistes en k voies (heapq.merge) jusqu'au filigrane now - LAG : un
+    événement horodaté mais pas encore déposé par son thread n'est pas dépassé tant que
+    le délai entre son horodatage et son dépôt reste sous LAG (50 ms). Un dépôt plus tardif
+    (thread bloqué) arrive après des événements plus récents déjà fusionnés.
+    drain(final=True) vide toutes les pistes à l'arrêt.
+    """
+
+    LAG = 0.05
+
+    def __init__(self, capacity: int = 8192, clock=time.monotonic):
+        self.capacity = capacity
+        self.clock = clock
+        self.tracks: Dict[str, TrackBuffer] = {}
+        self.t0 = clock()
+        self.merged = 0
+        self._lock = threading.Lock()
+
+    def start(self, t0: Optional[float] = None):
+        """Nouvelle session : pistes vidées, origine des temps `t0` (horloge de `clock`)"""
+        with self._lock:
+            self.tracks = {}
+            self.t0 = self.clock() if t0 is None else t0
+            self.merged = 0
+
+    def now(self) -> float:
+        return self.clock() - self.t0
+
+    def track(self, name: str) -> TrackBuffer:
+        buffer = self.tracks.get(name)
+        if buffer is None:
+            with self._lock:
+                buffer = self.tracks.setdefault(name, TrackBuffer(name, self.capacity))
+        return buffer
+
+    def push(self, name: str, action: MacroAction) -> bool:
+        """Dépôt par le thread propriétaire de la piste (horodatages croissants)"""
+        return self.track(name).push(action)
+
+    def inject(self, name: str, action_type: str, data: Dict[str, Any], timestamp: Optional[float] = None) -> bool:
+        """Dépôt depuis n'importe quel thread : horodaté sous verrou (maintenant par défaut)"""
+        buffer = self.track(name)
+        with self._lock:
+            if timestamp is None:
+                timestamp = max(self.now(), buffer.last_timestamp)
+            elif timestamp < buffer.last_timestamp:
+                raise ValueError(f"Piste {name}: horodatage {timestamp} antérieur au précédent")
+            return buffer.push(MacroAction(action_type, timestamp, data))
+
+    def drain(self, final: bool = False) -> List[MacroAction]:
+        """Actions prêtes de toutes les pistes, fusionnées dans l'ordre chronologique"""
+        watermark = float("inf") if final else self.now() - self.LAG
+        ready = [events for events in (buffer.pop_until(watermark) for buffer in list(self.tracks.values()))
+                 if events]
+        if not ready:
+            return []
+        merged = ready[0] if len(ready) == 1 else list(heapq.merge(*ready, key=attrgetter("timestamp")))
+        self.merged += len(merged)
+        return merged
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "merged": self.merged,
+            "tracks": {name: {"events": buffer.pushed, "dropped": buffer.dropped, "high_water": buffer.high_water}
+                       for name, buffer in self.tracks.items()},
+        }
+
+class XRecordSource:
+    """Entrées d'un autre écran X (extension RECORD), déposées dans une piste de TrackTimeline
+
+    Deux connexions : l'une reste bloquée dans record_enable_context (thread dédié),
+    l'autre traduit les keycodes et désactive le contexte à l'arrêt. Les touches sont
+    nommées comme par pynput ("'a'", "Key.enter") ; un mouvement au plus tous les
+    `move_threshold` secondes. Horodatage à la réception, sur l'horloge de la chronologie.
+    """
+
+    KEY_NAMES = {
+        "Return": "enter", "KP_Enter": "enter", "BackSpace": "backspace", "Tab": "tab", "Escape": "esc",
+        "space": "space", "Delete": "delete", "Insert": "insert", "Home": "home", "End": "end",
+        "Prior": "page_up", "Next": "page_down", "Left": "left", "Right": "right", "Up": "up", "Down": "down",
+        "Control_L": "ctrl", "Control_R": "ctrl_r", "Shift_L": "shift", "Shift_R": "shift_r",
+        "Alt_L": "alt", "Alt_R": "alt_r", "ISO_Level3_Shift": "alt_gr", "Super_L": "cmd", "Super_R": "cmd_r",
+        "Caps_Lock": "caps_lock", "Num_Lock": "num_lock", "Scroll_Lock": "scroll_lock",
+        "Print": "print_screen", "Pause": "pause", "Menu": "menu",
+    }
+    SCROLL_BUTTONS = {4: (0, 1), 5: (0, -1), 6: (-1, 0), 7: (1, 0)}
+
+    def __init__(self, display_name: str, timeline: TrackTimeline, track: Optional[str] = None,
+                 move_threshold: float = 0.1):
+        self.display_name = display_name
+        self.timeline = timeline
+        self.track = track or display_name
+        self.move_threshold = move_threshold
+        self._control = self._record = self._context = None
+        self._thread: Optional[threading.Thread] = None
+        self._last_move = float("-inf")
+        self._keysym_names: Dict[int, str] = {}
+        if XLIB_AVAILABLE:
+            for name, value in vars(XK).items():
+                if name.startswith("XK_"):
+                    self._keysym_names.setdefault(value, name[3:])  # F11 plutôt que son alias L1
+
+    @staticmethod
+    def available() -> bool:
+        return XLIB_AVAILABLE
+
+    def start(self):
+        self._control = xdisplay.Display(self.display_name)
+        self._record = xdisplay.Display(self.display_name)
+        if not self._record.has_extension("RECORD"):
+            self.stop()
+            raise RuntimeError(f"Extension RECORD absente sur {self.display_name}")
+        self._context = self._record.record_create_context(0, [record.AllClients], [{
+            "core_requests": (0, 0), "core_replies": (0, 0),
+            "ext_requests": (0, 0, 0, 0), "ext_replies": (0, 0, 0, 0),
+            "delivered_events": (0, 0), "device_events": (X.KeyPress, X.MotionNotify),
+            "errors": (0, 0), "client_started": False, "client_died": False,
+        }])
+        self._thread = threading.Thread(target=self._run, name=f"macro-xrecord-{self.track}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        if self._context is not None:
+            self._control.record_disable_context(self._context)
+            self._control.flush()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for connection in (self._record, self._control):
+            if connection is not None:
+                connection.close()
+        self._control = self._record = self._context = None
+
+    def _run(self):
+        self._record.record_enable_context(self._context, self._on_reply)
+        self._record.record_free_context(self._context)
+
+    def _on_reply(self, reply):
+        if reply.category != record.FromServer or reply.client_swapped or not reply.data or reply.data[0] < 2:
+            return
+        data = reply.data
+        while data:
+            event, data = rq.EventField(None).parse_binary_value(data, self._record.display, None, None)
+            action = self._to_action(event, self.timeline.now())
+            if action is not None:
+                action.data["track"] = self.track
+                self.timeline.push(self.track, action)
+
+    def _to_action(self, event, timestamp: float) -> Optional[MacroAction]:
+        kind = event.type
+        if kind == X.MotionNotify:
+            if timestamp - self._last_move < self.move_threshold:
+                return None
+            self._last_move = timestamp
+            return MacroAction("mouse_move", timestamp, {"x": event.root_x, "y": event.root_y})
+        if kind in (X.ButtonPress, X.ButtonRelease):
+            x, y = event.root_x, event.root_y
+            if event.detail in self.SCROLL_BUTTONS:
+                if kind == X.ButtonRelease:
+                    return None
+                dx, dy = self.SCROLL_BUTTONS[event.detail]
+                return MacroAction("scroll", timestamp, {"x": x, "y": y, "dx": dx, "dy": dy})
+            if event.detail not in (1, 3):
+                return None
+            return MacroAction("mouse_click", timestamp, {"x": x, "y": y, "button": "gauche" if event.detail == 1
+                                                          else "droit", "pressed": kind == X.ButtonPress})
+        if kind in (X.KeyPress, X.KeyRelease):
+            key = self._key_name(self._keysym(event.detail, event.state))
+            if key is None:
+                return None
+            return MacroAction("key_press" if kind == X.KeyPress else "key_release", timestamp, {"key": key})
+        return None
+
+    def _keysym(self, keycode: int, state: int) -> int:
+        """Keysym selon l'état de Maj de l'événement (colonne 1 de la table du clavier, sinon 0)"""
+        if state & X.ShiftMask:
+            keysym = self._control.keycode_to_keysym(keycode, 1)
+            if keysym:
+                return keysym
+        return self._control.keycode_to_keysym(keycode, 0)
+
+    def _key_name(self, keysym: int) -> Optional[str]:
+        """Nom pynput d'un keysym : "'a'" pour un caractère, "Key.enter" pour une touche spéciale"""
+        name = self._keysym_names.get(keysym)
+        if name in self.KEY_NAMES:
+            return f"Key.{self.KEY_NAMES[name]}"
+        if name and name[0] == "F" and name[1:].isdigit():
+            return f"Key.f{name[1:]}"
+        char = XK.keysym_to_string(keysym)
+        return repr(char) if char and len(char) == 1 and char.isprintable() else None
+
 class MacroRecorder(QObject):
     """Classe pour enregistrer les actions utilisateur avec pynput"""
 
     action_recorded = pyqtSignal(MacroAction)
     recording_stopped = pyqtSignal()
+    flight_snapshot_requested = pyqtSignal()
     error_occurred = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, tracer: Optional[PerfTracer] = None, metrics: Optional[MetricsRegistry] = None):
         super().__init__()
-        self.actions: List[MacroAction] = []
+        self.store = ActionStore()
+        self.tracer = tracer or PerfTracer()
+        self.metrics = metrics or MetricsRegistry()
         self.is_recording = False
         self.start_time = 0
         self.mouse_listener = None
         self.keyboard_listener = None
         self.last_move_time = 0
         self.move_threshold = 0.1
+        self.group_text = False  # regroupe les frappes en actions "text_input" à l'arrêt
+
+        # Enregistreur de vol (capture continue dans un tampon circulaire)
+        self.flight_buffer: Optional[ActionRingBuffer] = None
+        self.flight_hotkey = "Key.f12"
+
+        # Capture hors processus (lue par lots depuis la mémoire partagée)
+        self.capture_process: Optional[CaptureProcess] = None
+        self.capture_timer: Optional[QTimer] = None
+        self._capture_t0 = 0.0
+        self._last_capture_move = 0.0
+        self.capture_stats: Dict[str, Any] = {}
+
+        # Vignettes de contexte autour des clics et des rafales de frappe
+        self.thumbnails: Optional[ThumbnailCapturer] = None
+        self.thumbnail_stats: Dict[str, Any] = {}
+        self._pointer = (0, 0)
+
+        # Coordonnées relatives à la fenêtre sous le pointeur
+        self.window_cache: Optional[WindowGeometryCache] = None
+
+        # Portée : événements filtrés dans les callbacks, avant toute allocation
+        self.scope: Optional[CaptureScope] = None
+        self.scope_stats: Dict[str, Any] = {}
+
+        # Multipiste : sources fusionnées en une chronologie (None : actions publiées dès leur capture)
+        self.timeline: Optional[TrackTimeline] = None
+        self.display_sources: List[XRecordSource] = []
+        self.track_stats: Dict[str, Any] = {}
+        self._tracks_stop = threading.Event()
+        self._tracks_thread: Optional[threading.Thread] = None
+
+        # Télémétrie
+        self.events_metric = self.metrics.counter("macro_recorder_events_total", "Actions enregistrées", ("type",))
+        self.recording_metric = self.metrics.gauge("macro_recorder_recording", "1 pendant un enregistrement")
+        self.metrics.gauge("macro_recorder_actions", "Actions de la macro en cours", function=lambda: len(self.store))
+        self.metrics.gauge("macro_recorder_capture_backlog", "Événements en attente dans le tampon de capture",
+                           function=self.capture_backlog)
+        self.metrics.gauge("macro_recorder_capture_dropped", "Événements de capture perdus (tampon plein)",
+                           function=lambda: self.capture_process.ring.dropped
+                           if self.capture_process and self.capture_process.ring else 0)
+        self.metrics.gauge("macro_recorder_scope_dropped", "Événements ignorés hors de la portée (enregistrement en cours)",
+                           function=lambda: sum(self.scope.dropped.values()) if self.scope else 0)
+
+    def capture_backlog(self) -> int:
+        """Profondeur de la file du processus de capture (événements écrits mais pas encore lus)"""
+        ring = self.capture_process.ring if self.capture_process else None
+        return max(0, ring.written() - ring.read_index) if ring and ring.buf is not None else 0
+
+    @property
+    def actions(self) -> ActionSnapshot:
+        """Instantané figé des actions enregistrées (partagé sans copie avec le player et l'interface)"""
+        return self.store.snapshot()
+
+    @actions.setter
+    def actions(self, actions: List[MacroAction]):
+        self.store.replace(actions)
+
+    @property
+    def is_flight_recording(self):
+        return self.flight_buffer is not None
 
     def start_recording(self):
         """Démarre l'enregistrement des actions"""
@@ -149,24 +2576,25 @@ class MacroRecorder(QObject):
             return False
 
         try:
-            self.actions.clear()
-            self.is_recording = True
-            self.start_time = time.time()
+            self.store.clear()
+            self.start_time = time.monotonic()
             self.last_move_time = 0
-
-            self.mouse_listener = mouse.Listener(
-                on_move=self._on_mouse_move,
-                on_click=self._on_mouse_click,
-                on_scroll=self._on_mouse_scroll
-            )
-
-            self.keyboard_listener = keyboard.Listener(
-                on_press=self._on_key_press,
-                on_release=self._on_key_release
-            )
-
-            self.mouse_listener.start()
-            self.keyboard_listener.start()
+            if self.scope is not None:
+                self.scope.reset()
+            if self.timeline is not None:
+                self._start_tracks()
+            if self.capture_process is not None:
+                self._capture_t0 = time.monotonic()
+                self._last_capture_move = 0.0
+                self.capture_stats = {"events": 0, "dropped": 0, "latency_max_ms": 0.0}
+                self.capture_process.start()
+                self.capture_timer.start()
+            else:
+                self._start_listeners()
+            if self.thumbnails is not None:
+                self.thumbnails.start()
+            self.is_recording = True
+            self.recording_metric.set(1)
 
             return True
 
@@ -176,8 +2604,231 @@ class MacroRecorder(QObject):
 
     def stop_recording(self):
         """Arrête l'enregistrement"""
+        if self.capture_process is not None and self.capture_process.is_alive:
+            self.capture_timer.stop()
+            try:
+                self.capture_process.stop()
+            except RuntimeError as e:
+                self.error_occurred.emit(f"Processus de capture: {e}")
+            while self._drain_capture():
+                pass
+
         self.is_recording = False
+        self.recording_metric.set(0)
+        if self.timeline is not None:
+            self._stop_tracks()
+
+        if self.thumbnails is not None:
+            self.thumbnails.stop()
+            self.thumbnail_stats = self.thumbnails.summary()
+        self.scope_stats = self.scope.summary() if self.scope is not None else {}
+
+        if not self.is_flight_recording:
+            self._stop_listeners()
+
+        if self.group_text:
+            self.store.replace(group_text_runs(list(self.store.snapshot())))
+
+        self.recording_stopped.emit()
+
+    def set_thumbnails(self, enabled: bool, **options) -> bool:
+        """Active les vignettes (options de ThumbnailCapturer : size, cpu_budget, memory_budget)"""
+        if self.is_recording:
+            return False
+        if enabled and not PIL_AVAILABLE:
+            self.error_occurred.emit("Pillow requis pour les vignettes")
+            return False
+        self.thumbnails = ThumbnailCapturer(**options) if enabled else None
+        return True
+
+    def _attach_thumbnail(self, action: MacroAction):
+        """Demande une vignette pour un clic ou un début de rafale (avant publication de l'action)"""
+        data = action.data
+        if action.action_type == "mouse_move":
+            self._pointer = (data["x"], data["y"])
+            return
+        thumb_id = None
+        if action.action_type == "mouse_click":
+            self._pointer = (data["x"], data["y"])
+            if data.get("pressed", True):
+                thumb_id = self.thumbnails.request(data["x"], data["y"])
+        elif action.action_type == "key_press":
+            thumb_id = self.thumbnails.request_key(*self._pointer, time.monotonic())
+        if thumb_id:
+            data["thumb"] = thumb_id
+
+    def set_scope(self, scope: Optional[CaptureScope]) -> bool:
+        """Restreint l'enregistrement (None : tout le bureau)"""
+        if self.is_recording:
+            return False
+        self.scope = scope
+        return True
+
+    def set_window_relative(self, enabled: bool, cache: Optional[WindowGeometryCache] = None) -> bool:
+        """Enregistre aussi la fenêtre visée et le décalage dans celle-ci (cache partagé avec le player)"""
+        if self.is_recording:
+            return False
+        if enabled and cache is None:
+            cache = WindowGeometryCache()
+            if not cache.start():
+                self.error_occurred.emit("python-xlib et un serveur X requis pour les coordonnées relatives")
+                return False
+        self.window_cache = cache if enabled else None
+        return True
+
+    def set_multitrack(self, enabled: bool, displays: tuple = (), capacity: int = 8192) -> bool:
+        """Enregistre par pistes fusionnées : souris et clavier locaux, écrans X `displays` (":1"...),
+        événements injectés et marqueurs ; chaque piste est bornée à `capacity` événements"""
+        if self.is_recording:
+            return False
+        if displays and not XRecordSource.available():
+            self.error_occurred.emit("python-xlib requis pour enregistrer d'autres écrans X")
+            return False
+        self.timeline = TrackTimeline(capacity) if enabled else None
+        self.display_sources = [XRecordSource(name, self.timeline, move_threshold=self.move_threshold)
+                                for name in displays] if enabled else []
+        return True
+
+    TRACK_POLL = 0.02
+
+    def _start_tracks(self):
+        self.timeline.start(self.start_time)
+        started = []
+        try:
+            for source in self.display_sources:
+                source.start()
+                started.append(source)
+        except Exception:
+            for source in started:
+                source.stop()
+            raise
+        self._tracks_stop.clear()
+        self._tracks_thread = threading.Thread(target=self._run_tracks, name="macro-tracks", daemon=True)
+        self._tracks_thread.start()
+
+    def _run_tracks(self):
+        while not self._tracks_stop.wait(self.TRACK_POLL):
+            self._drain_tracks()
+
+    def _stop_tracks(self):
+        """Arrête les sources puis publie tout ce qui reste dans les pistes"""
+        for source in self.display_sources:
+            source.stop()
+        self._tracks_stop.set()
+        if self._tracks_thread is not None:
+            self._tracks_thread.join()
+            self._tracks_thread = None
+        self._drain_tracks(final=True)
+        self.track_stats = self.timeline.summary()
+
+    def _drain_tracks(self, final: bool = False) -> int:
+        merged = self.timeline.drain(final)
+        for action in merged:
+            self._publish(action)
+        return len(merged)
+
+    def inject(self, action_type: str, data: Dict[str, Any], track: str = "injecté",
+               timestamp: Optional[float] = None) -> bool:
+        """Ajoute un événement synthétique à l'enregistrement en cours (depuis n'importe quel thread)"""
+        if not self.is_recording:
+            return False
+        data = dict(data, track=track)
+        if self.timeline is not None:
+            return self.timeline.inject(track, action_type, data, timestamp)
+        self._publish(MacroAction(action_type, self._get_current_time() if timestamp is None else timestamp, data))
+        return True
+
+    def mark(self, label: str, **data) -> bool:
+        """Marqueur (annotation) dans la chronologie de l'enregistrement en cours ; ignoré à la lecture"""
+        return self.inject("marker", dict(data, label=label), track="marqueurs")
+
+    CAPTURE_POLL_MS = 15
+
+    def set_capture_process(self, enabled: bool) -> bool:
+        """Active la capture dans un processus séparé, à l'abri du GIL de l'interface"""
+        if self.is_recording:
+            return False
+        if enabled and self.capture_process is None:
+            self.capture_process = CaptureProcess()
+            self.capture_timer = QTimer(self)
+            self.capture_timer.setInterval(self.CAPTURE_POLL_MS)
+            self.capture_timer.timeout.connect(self._drain_capture)
+        elif not enabled and self.capture_process is not None:
+            self.capture_process.close()
+            self.capture_process = None
+            self.capture_timer = None
+        return True
+
+    def _drain_capture(self) -> int:
+        """Convertit un lot d'événements du processus de capture en actions (appelé par le QTimer)"""
+        events = self.capture_process.read_batch()
+        now = time.monotonic()
+        stats = self.capture_stats
+        scope = self.scope
+        for code, t, x, y, a, b, key in events:
+            stats["latency_max_ms"] = max(stats["latency_max_ms"], (now - t) * 1000.0)
+            if code == ActionRingBuffer.MOVE:
+                if t - self._last_capture_move < self.move_threshold:
+                    continue
+                self._last_capture_move = t
+            if scope is not None:
+                action_type = ACTION_TYPE_NAMES[code]
+                if not (scope.allows_key(action_type, key) if code >= ActionRingBuffer.KEY_PRESS
+                        else scope.allows(action_type, x, y)):
+                    continue
+            stats["events"] += 1
+            self._store_action(ActionRingBuffer.to_action(code, t - self._capture_t0, x, y, a, b, key))
+        stats["dropped"] = self.capture_process.ring.dropped
+        return len(events)
+
+    def start_flight_recording(self, capacity: int = 50_000, window: Optional[float] = None):
+        """Démarre la capture continue dans un tampon circulaire de taille fixe"""
+        if not MODULES_AVAILABLE:
+            self.error_occurred.emit("Modules pynput/pyautogui non disponibles")
+            return False
+
+        try:
+            self.flight_buffer = ActionRingBuffer(capacity, window)
+            self._start_listeners()
+            return True
+
+        except Exception as e:
+            self.flight_buffer = None
+            self.error_occurred.emit(f"Erreur lors du démarrage de l'enregistreur de vol: {str(e)}")
+            return False
+
+    def stop_flight_recording(self):
+        """Arrête l'enregistreur de vol et libère son tampon"""
+        self.flight_buffer = None
+        if not self.is_recording:
+            self._stop_listeners()
+
+    def flight_snapshot(self, seconds: Optional[float] = None) -> List[MacroAction]:
+        """Retourne les dernières secondes capturées par l'enregistreur de vol sous forme de macro"""
+        if self.flight_buffer is None:
+            return []
+        return self.flight_buffer.snapshot(seconds)
+
+    def _start_listeners(self):
+        """Démarre les listeners pynput s'ils ne tournent pas déjà (partagés avec l'enregistreur de vol)"""
+        if self.mouse_listener is not None and self.mouse_listener.running:
+            return
+
+        self.mouse_listener = mouse.Listener(
+            on_move=self._on_mouse_move,
+            on_click=self._on_mouse_click,
+            on_scroll=self._on_mouse_scroll
+        )
+
+        self.keyboard_listener = keyboard.Listener(
+            on_press=self._on_key_press,
+            on_release=self._on_key_release
+        )
 
+        self.mouse_listener.start()
+        self.keyboard_listener.start()
+
+    def _stop_listeners(self):
         try:
             if self.mouse_listener:
                 self.mouse_listener.stop()
@@ -186,33 +2837,80 @@ class MacroRecorder(QObject):
         except:
             pass
 
-        self.recording_stopped.emit()
+        self.mouse_listener = None
+        self.keyboard_listener = None
 
     def _get_current_time(self):
-        return time.time() - self.start_time
+        return time.monotonic() - self.start_time
+
+    def _store_action(self, action: MacroAction):
+        """Complète une action capturée localement, puis la publie (ou la dépose dans sa piste)"""
+        if self.thumbnails is not None:
+            self._attach_thumbnail(action)
+        if self.window_cache is not None and "x" in action.data:
+            window = self.window_cache.locate(action.data["x"], action.data["y"])
+            if window is not None:
+                action.data["window"] = window
+        if self.timeline is not None:
+            # Une piste par thread de listener : horodatages croissants dans chaque piste
+            self.timeline.push("clavier" if action.action_type.startswith("key_") else "souris", action)
+            return
+        self._publish(action)
+
+    def _publish(self, action: MacroAction):
+        """Ajoute l'action et notifie l'interface (instrumenté si le traceur est actif)"""
+        self.events_metric.labels(action.action_type).inc()
+        tracer = self.tracer
+        if not tracer.enabled:
+            self.store.append(action)
+            self.action_recorded.emit(action)
+            return
+
+        t0 = tracer.now()
+        self.store.append(action)
+        t1 = tracer.now()
+        self.action_recorded.emit(action)
+        t2 = tracer.now()
+        tracer.add_span(action.action_type, PerfTracer.CAT_RECORD, t0, t1, {"index": len(self.store) - 1})
+        tracer.add_span("action_recorded", PerfTracer.CAT_SIGNAL, t1, t2)
 
     def _on_mouse_move(self, x, y):
-        if not self.is_recording:
+        if not self.is_recording and self.flight_buffer is None:
             return
 
-        current_time = time.time()
+        current_time = time.monotonic()
         if current_time - self.last_move_time < self.move_threshold:
             return
 
         self.last_move_time = current_time
 
+        flight_buffer = self.flight_buffer
+        if flight_buffer is not None:
+            flight_buffer.push(ActionRingBuffer.MOVE, time.monotonic(), int(x), int(y))
+        if not self.is_recording:
+            return
+        scope = self.scope
+        if scope is not None and not scope.allows("mouse_move", x, y):
+            return
+
         action = MacroAction(
             action_type="mouse_move",
             timestamp=self._get_current_time(),
             data={"x": int(x), "y": int(y)}
         )
 
-        self.actions.append(action)
-        self.action_recorded.emit(action)
+        self._store_action(action)
 
     def _on_mouse_click(self, x, y, button, pressed):
+        flight_buffer = self.flight_buffer
+        if flight_buffer is not None:
+            flags = (1 if pressed else 0) | (0 if button == MouseButton.left else 2)
+            flight_buffer.push(ActionRingBuffer.CLICK, time.monotonic(), int(x), int(y), flags)
         if not self.is_recording:
             return
+        scope = self.scope
+        if scope is not None and not scope.allows("mouse_click", x, y):
+            return
 
         button_name = "gauche" if button == MouseButton.left else "droit"
 
@@ -222,12 +2920,17 @@ class MacroRecorder(QObject):
             data={"x": int(x), "y": int(y), "button": button_name, "pressed": pressed}
         )
 
-        self.actions.append(action)
-        self.action_recorded.emit(action)
+        self._store_action(action)
 
     def _on_mouse_scroll(self, x, y, dx, dy):
+        flight_buffer = self.flight_buffer
+        if flight_buffer is not None:
+            flight_buffer.push(ActionRingBuffer.SCROLL, time.monotonic(), int(x), int(y), int(dx), int(dy))
         if not self.is_recording:
             return
+        scope = self.scope
+        if scope is not None and not scope.allows("scroll", x, y):
+            return
 
         action = MacroAction(
             action_type="scroll",
@@ -235,34 +2938,643 @@ class MacroRecorder(QObject):
             data={"x": int(x), "y": int(y), "dx": int(dx), "dy": int(dy)}
         )
 
-        self.actions.append(action)
-        self.action_recorded.emit(action)
+        self._store_action(action)
 
     def _on_key_press(self, key):
+        flight_buffer = self.flight_buffer
+        if flight_buffer is not None:
+            key_name = str(key)
+            if key_name == self.flight_hotkey:
+                self.flight_snapshot_requested.emit()
+                return
+            flight_buffer.push(ActionRingBuffer.KEY_PRESS, time.monotonic(), key=key_name)
         if not self.is_recording:
             return
+        key_name = str(key)
+        scope = self.scope
+        if scope is not None and not scope.allows_key("key_press", key_name):
+            return
 
         action = MacroAction(
             action_type="key_press",
             timestamp=self._get_current_time(),
-            data={"key": str(key)}
+            data={"key": key_name}
         )
 
-        self.actions.append(action)
-        self.action_recorded.emit(action)
+        self._store_action(action)
 
     def _on_key_release(self, key):
+        flight_buffer = self.flight_buffer
+        if flight_buffer is not None:
+            key_name = str(key)
+            if key_name == self.flight_hotkey:
+                return
+            flight_buffer.push(ActionRingBuffer.KEY_RELEASE, time.monotonic(), key=key_name)
         if not self.is_recording:
             return
+        key_name = str(key)
+        scope = self.scope
+        if scope is not None and not scope.allows_key("key_release", key_name):
+            return
 
         action = MacroAction(
             action_type="key_release",
             timestamp=self._get_current_time(),
-            data={"key": str(key)}
+            data={"key": key_name}
         )
 
-        self.actions.append(action)
-        self.action_recorded.emit(action)
+        self._store_action(action)
+
+TEXT_METHODS = ("auto", "xtest", "clipboard", "rate")
+
+# Outils de presse-papiers en ligne de commande : (écriture, lecture)
+CLIPBOARD_TOOLS = (
+    (["wl-copy"], ["wl-paste", "--no-newline"]),
+    (["xclip", "-selection", "clipboard"], ["xclip", "-selection", "clipboard", "-o"]),
+    (["xsel", "--clipboard", "--input"], ["xsel", "--clipboard", "--output"]),
+    (["pbcopy"], ["pbpaste"]),
+    (["clip"], None),
+)
+
+def clipboard_tool() -> Optional[tuple]:
+    for write_cmd, read_cmd in CLIPBOARD_TOOLS:
+        if shutil.which(write_cmd[0]):
+            return write_cmd, read_cmd
+    return None
+
+class XTestTyper:
+    """Saisie de chaînes par lots d'événements XTest (python-xlib)
+
+    Les caractères absents de la table du clavier sont tapés en remappant
+    temporairement un keycode libre sur leur keysym Unicode (0x01000000 + code) ;
+    sa table d'origine est restaurée à la fin de chaque saisie. Sans keycode libre,
+    aucune touche réelle n'est détournée : can_type() refuse ces chaînes.
+    """
+
+    BATCH = 64
+    REMAP_DELAY = 0.005
+
+    def __init__(self, display=None):
+        self.display = display or xdisplay.Display()
+        self.shift = self.display.keysym_to_keycode(XK.string_to_keysym("Shift_L"))
+        self.scratch, self._scratch_keysyms = self._free_keycode()
+
+    def _free_keycode(self) -> tuple:
+        """(keycode sans aucun keysym, sa table d'origine), ou (None, None) si tous sont attribués"""
+        first = self.display.display.info.min_keycode
+        count = self.display.display.info.max_keycode - first + 1
+        for offset, keysyms in enumerate(self.display.get_keyboard_mapping(first, count)):
+            if not any(keysyms):
+                return first + offset, tuple(keysyms)
+        return None, None
+
+    def can_type(self, text: str) -> bool:
+        """True si chaque caractère est dans la table du clavier ou qu'un keycode libre permet de le remapper"""
+        return self.scratch is not None or all(self.display.keysym_to_keycode(self.keysym_for(char))
+                                               for char in set(text))
+
+    def _fake(self, kind: int, keycode: int):
+        xtest.fake_input(self.display, kind, keycode)
+
+    @staticmethod
+    def keysym_for(char: str) -> int:
+        if char == "\n":
+            return XK.string_to_keysym("Return")
+        if char == "\t":
+            return XK.string_to_keysym("Tab")
+        code = ord(char)
+        return code if 0x20 <= code <= 0x7E or 0xA0 <= code <= 0xFF else 0x01000000 | code
+
+    def type(self, text: str, interval: float = 0.0):
+        if not self.can_type(text):
+            raise LookupError("Aucun keycode libre pour les caractères hors de la table du clavier")
+        pending = 0
+        touched = False
+        try:
+            for char in text:
+                keysym = self.keysym_for(char)
+                keycode = self.display.keysym_to_keycode(keysym)
+                remapped = not keycode
+                if remapped:
+                    self.display.change_keyboard_mapping(self.scratch, [(keysym, keysym)])
+                    self.display.sync()
+                    keycode, touched = self.scratch, True
+                shifted = not remapped and self.display.keycode_to_keysym(keycode, 0) != keysym
+
+                if shifted:
+                    self._fake(X.KeyPress, self.shift)
+                self._fake(X.KeyPress, keycode)
+                self._fake(X.KeyRelease, keycode)
+                if shifted:
+                    self._fake(X.KeyRelease, self.shift)
+
+                pending += 1
+                if remapped or interval or pending >= self.BATCH:
+                    self.display.sync()
+                    pending = 0
+                    time.sleep(max(interval, self.REMAP_DELAY if remapped else 0.0))
+        finally:
+            if touched:
+                self.display.change_keyboard_mapping(self.scratch, [self._scratch_keysyms])
+            self.display.sync()
+
+class PyAutoGuiBackend:
+    """Backend d'injection réel basé sur pyautogui"""
+
+    name = "pyautogui"
+
+    def __init__(self, text_method: str = "auto"):
+        self.text_method = text_method
+        self._typer: Optional[XTestTyper] = None
+
+    def is_available(self):
+        return MODULES_AVAILABLE
+
+    def click(self, x, y, button):
+        pyautogui.click(x, y, button=button)
+
+    def move_to(self, x, y):
+        pyautogui.moveTo(x, y)
+
+    def press(self, key):
+        pyautogui.press(key)
+
+    def scroll(self, dy, x, y):
+        pyautogui.scroll(dy, x=x, y=y)
+
+    def key_down(self, key):
+        pyautogui.keyDown(key)
+
+    def key_up(self, key):
+        pyautogui.keyUp(key)
+
+    def mouse_down(self, x, y, button):
+        pyautogui.mouseDown(x, y, button=button)
+
+    def mouse_up(self, x, y, button):
+        pyautogui.mouseUp(x, y, button=button)
+
+    # Saisie de texte rapide
+    def resolve_text_method(self) -> str:
+        if self.text_method != "auto":
+            return self.text_method
+        if XLIB_AVAILABLE and os.environ.get("DISPLAY"):
+            return "xtest"
+        return "clipboard" if clipboard_tool() else "rate"
+
+    def type_text(self, text: str, rate: Optional[float] = None):
+        """Tape une chaîne entière ; `rate` (caractères/s) impose une cadence, sinon le plus vite possible"""
+        method = self.resolve_text_method()
+        interval = 1.0 / rate if rate else 0.0
+        if method == "xtest":
+            if self._typer is None:
+                self._typer = XTestTyper()
+            if self._typer.can_type(text):
+                self._typer.type(text, interval)
+                return
+            # Aucun keycode libre : presse-papiers ou pyautogui plutôt que détourner une touche réelle
+            method = "clipboard" if clipboard_tool() else "rate"
+        if method == "clipboard" and not rate:
+            self._paste(text)
+        else:
+            pyautogui.write(text, interval=interval)
+
+    def _paste(self, text: str):
+        """Colle le texte via le presse-papiers puis restaure son contenu précédent"""
+        write_cmd, read_cmd = clipboard_tool()
+        previous = None
+        if read_cmd:
+            result = subprocess.run(read_cmd, capture_output=True, timeout=2)
+            previous = result.stdout if result.returncode == 0 else None
+        subprocess.run(write_cmd, input=text.encode("utf-8"), check=True, timeout=2)
+        pyautogui.hotkey("command" if sys.platform == "darwin" else "ctrl", "v")
+        if previous is not None:
+            time.sleep(0.05)  # laisse l'application lire le presse-papiers avant de le restaurer
+            subprocess.run(write_cmd, input=previous, timeout=2)
+
+    # Sondes de synchronisation (mode rapide)
+    def window_title(self) -> Optional[str]:
+        try:
+            if hasattr(pyautogui, "getActiveWindowTitle"):
+                return pyautogui.getActiveWindowTitle()
+            result = subprocess.run(["xdotool", "getactivewindow", "getwindowname"],
+                                    capture_output=True, text=True, timeout=1)
+            return result.stdout.strip() if result.returncode == 0 else None
+        except Exception:
+            return None
+
+    def grab_region(self, region=None) -> Optional[bytes]:
+        try:
+            image = pyautogui.screenshot(region=tuple(region) if region else None)
+            return hashlib.blake2b(image.reduce(4).tobytes(), digest_size=16).digest()
+        except Exception:
+            return None
+
+    def locate(self, image, region=None):
+        try:
+            return pyautogui.locateOnScreen(image, region=tuple(region) if region else None, grayscale=True)
+        except Exception:
+            return None
+
+class VirtualClock:
+    """Horloge simulée : sleep() avance le temps instantanément (tests, simulation de lecture)
+
+    Des rappels peuvent être programmés à un instant simulé (call_at) : ils s'exécutent,
+    dans l'ordre chronologique, pendant le sleep() qui franchit cet instant - par exemple
+    l'arrêt d'une lecture au bout d'une heure ou le changement d'écran attendu par une synchro.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+        self.sleeps = 0
+        self._timers: List[tuple] = []
+        self._counter = itertools.count()
+
+    def now(self) -> float:
+        return self.time
+
+    def now_ns(self) -> int:
+        """Horloge au format de PerfTracer (ns entières)"""
+        return round(self.time * 1e9)
+
+    def sleep(self, seconds: float):
+        self.sleeps += 1
+        target = self.time + max(0.0, seconds)
+        while self._timers and self._timers[0][0] <= target:
+            at, _, callback = heapq.heappop(self._timers)
+            self.time = max(self.time, at)
+            callback()
+        self.time = target
+
+    def call_at(self, at: float, callback):
+        heapq.heappush(self._timers, (at, next(self._counter), callback))
+
+    def call_later(self, delay: float, callback):
+        self.call_at(self.time + delay, callback)
+
+class RecordingBackend:
+    """Backend factice qui enregistre les événements au lieu de les injecter (tests, benchmarks)"""
+
+    name = "recording"
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.events: List[tuple] = []
+
+        # État simulé de l'écran pour les sondes de synchronisation
+        self.title: Optional[str] = None
+        self.screen: Any = None
+        self.images = set()
+
+    def is_available(self):
+        return True
+
+    def clear(self):
+        self.events = []
+
+    def click(self, x, y, button):
+        self.events.append((self.clock(), "click", (x, y, button)))
+
+    def move_to(self, x, y):
+        self.events.append((self.clock(), "move_to", (x, y)))
+
+    def press(self, key):
+        self.events.append((self.clock(), "press", (key,)))
+
+    def scroll(self, dy, x, y):
+        self.events.append((self.clock(), "scroll", (dy, x, y)))
+
+    def key_down(self, key):
+        self.events.append((self.clock(), "key_down", (key,)))
+
+    def key_up(self, key):
+        self.events.append((self.clock(), "key_up", (key,)))
+
+    def mouse_down(self, x, y, button):
+        self.events.append((self.clock(), "mouse_down", (x, y, button)))
+
+    def mouse_up(self, x, y, button):
+        self.events.append((self.clock(), "mouse_up", (x, y, button)))
+
+    def type_text(self, text, rate=None):
+        self.events.append((self.clock(), "type_text", (text, rate)))
+
+    def window_title(self):
+        return self.title
+
+    def grab_region(self, region=None):
+        return self.screen
+
+    def locate(self, image, region=None):
+        return (0, 0) if image in self.images else None
+
+class ActionTimeIndex:
+    """Index temporel des actions pour la recherche en O(log n)
+
+    On indexe le maximum cumulé des timestamps : la suite est croissante même si
+    deux listeners ont entrelacé quelques actions, et bisect reste valide.
+    """
+
+    def __init__(self, actions: List[MacroAction]):
+        self.times = array('d')
+        running = float("-inf")
+        for action in actions:
+            running = max(running, action.timestamp)
+            self.times.append(running)
+
+    def __len__(self):
+        return len(self.times)
+
+    def index_at(self, timestamp: float) -> int:
+        """Index de la première action jouée à partir de `timestamp`"""
+        return bisect.bisect_left(self.times, timestamp)
+
+@dataclass
+class InputState:
+    """État des entrées (pointeur, touches et boutons maintenus) à un point de la macro"""
+    position: Optional[tuple] = None
+    held_keys: List[str] = field(default_factory=list)
+    held_buttons: List[str] = field(default_factory=list)
+
+    @classmethod
+    def at(cls, actions: List[MacroAction], index: int) -> "InputState":
+        """Rejoue (sans injecter) les actions précédant `index` pour reconstruire l'état"""
+        state = cls()
+        for action in actions[:index]:
+            data = action.data
+            if "x" in data:
+                state.position = (data["x"], data["y"])
+            if action.action_type == "mouse_click":
+                button = data.get("button", "gauche")
+                if data.get("pressed", True):
+                    if button not in state.held_buttons:
+                        state.held_buttons.append(button)
+                elif button in state.held_buttons:
+                    state.held_buttons.remove(button)
+            elif action.action_type == "key_press":
+                if data["key"] not in state.held_keys:
+                    state.held_keys.append(data["key"])
+            elif action.action_type == "key_release":
+                if data["key"] in state.held_keys:
+                    state.held_keys.remove(data["key"])
+        return state
+
+SYNC_CHECKS = ("auto", "title", "stable", "image")
+
+def detect_sync_points(actions: List[MacroAction], min_gap: float = 0.5) -> Dict[int, Dict[str, Any]]:
+    """Points de synchronisation d'une macro : marqués par l'utilisateur ou détectés
+
+    Un point marqué est porté par l'action elle-même (data["sync"] = {"check": ...}).
+    Détection : relâchement d'un clic ou de la touche Entrée suivi d'une pause humaine
+    d'au moins `min_gap` secondes (ouverture de fenêtre, chargement...). L'attente d'un
+    point détecté est bornée par cette pause : le mode rapide n'attend jamais plus
+    longtemps que la lecture chronométrée.
+    """
+    points = {}
+    for i, action in enumerate(actions):
+        if action.data.get("sync"):
+            points[i] = dict(action.data["sync"])
+            continue
+        if i + 1 >= len(actions):
+            continue
+
+        gap = actions[i + 1].timestamp - action.timestamp
+        if gap < min_gap:
+            continue
+        if (action.action_type == "mouse_click" and not action.data.get("pressed", True)) or \
+                (action.action_type == "key_release" and action.data["key"] == "Key.enter"):
+            points[i] = {"check": "auto", "timeout": gap}
+    return points
+
+class ReadinessProbe:
+    """Attente d'un point de synchronisation par sondage de conditions peu coûteuses
+
+    - title  : le titre de la fenêtre active a changé depuis le point précédent
+    - stable : la région d'écran a changé puis n'a plus bougé pendant STABLE_TIME
+               (ou n'a pas bougé du tout pendant SETTLE_TIME)
+    - image  : une image de référence est visible dans la région
+    - auto   : title ou stable, le premier arrivé
+    """
+
+    POLL_INTERVAL = 0.02
+    STABLE_TIME = 0.15
+    SETTLE_TIME = 0.3
+    DEFAULT_TIMEOUT = 10.0
+
+    def __init__(self, backend, tracer: Optional[PerfTracer] = None, clock=time.perf_counter, sleep=time.sleep):
+        self.backend = backend
+        self.tracer = tracer
+        self.clock = clock
+        self.sleep = sleep
+        self.last_title = backend.window_title()
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+
+    def wait(self, sync: Dict[str, Any], index: int = -1, should_continue=lambda: True) -> bool:
+        """Attend que la condition soit remplie ; False si le délai maximal est écoulé"""
+        check = sync.get("check", "auto")
+        region = sync.get("region")
+        start, start_ns = self.clock(), self.tracer.now() if self.tracer else 0
+        deadline = start + float(sync.get("timeout", self.DEFAULT_TIMEOUT))
+        first_frame = last_frame = changed_at = None
+        ready = False
+
+        while should_continue():
+            now = self.clock()
+            if check in ("title", "auto"):
+                title = self.backend.window_title()
+                if title is not None and title != self.last_title:
+                    ready = True
+                    break
+
+            if check in ("stable", "auto"):
+                frame = self.backend.grab_region(region)
+                if changed_at is None:
+                    first_frame = last_frame = frame
+                    changed_at = now
+                elif frame != last_frame:
+                    last_frame, changed_at = frame, now
+                elif now - changed_at >= (self.SETTLE_TIME if frame == first_frame else self.STABLE_TIME):
+                    ready = True
+                    break
+
+            if check == "image" and self.backend.locate(sync["image"], region) is not None:
+                ready = True
+                break
+
+            if now >= deadline:
+                break
+            self.sleep(self.POLL_INTERVAL)
+
+        end = self.clock()
+        self.last_title = self.backend.window_title()
+        self.waits += 1
+        self.timeouts += not ready
+        self.wait_time += end - start
+        if self.tracer:
+            self.tracer.add_span(f"synchro {check}", PerfTracer.CAT_CONDITION,
+                                 start_ns, self.tracer.now(),
+                                 {"index": index, "pret": ready, "attente_ms": round((end - start) * 1000.0, 3)})
+        return ready
+
+class Humanizer:
+    """Variations « humaines » de chaque boucle, précalculées en lots NumPy hors du thread de lecture
+
+    Par boucle : délais multipliés par un facteur borné [1 - jitter, 1 + jitter] (loi
+    normale tronquée), clics et scrolls décalés dans un disque de `click_radius` px, et
+    trajectoire courbe (Bézier quadratique, point de contrôle décalé perpendiculairement
+    de `curvature` x distance) de PATH_POINTS mouvements avant chaque déplacement ou clic
+    éloigné d'au moins MIN_PATH_DISTANCE px, répartis sur la fin du délai qui le précède.
+
+    Un thread calcule jusqu'à LOOP_BATCH boucles à la fois (tableaux boucles x actions,
+    au plus BATCH_ACTIONS éléments) et convertit chaque boucle en listes Python au moment
+    de la déposer dans une file de `read_ahead` boucles : la mémoire reste bornée quelle
+    que soit la taille de la macro, et la boucle de lecture ne fait que distribuer. Le lot k
+    est tiré de default_rng([seed, k]) : une graine donne toujours les mêmes variations.
+
+    Chaque trajectoire porte sa courbure : avec les coordonnées relatives aux fenêtres,
+    le player la recalcule (path()) entre les positions résolues au moment de la lecture.
+    """
+
+    LOOP_BATCH = 16
+    BATCH_ACTIONS = 262_144
+    PATH_POINTS = 8
+    MIN_PATH_DISTANCE = 40
+    PATH_SHARE = 0.5      # part maximale du délai consacrée à la trajectoire
+    PATH_DURATION = 0.25  # durée maximale d'une trajectoire (s)
+
+    def __init__(self, seed: Optional[int] = None, timing_jitter: float = 0.15, click_radius: float = 3.0,
+                 curvature: float = 0.2, read_ahead: int = 2):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("Humanisation: NumPy requis")
+        self.seed = int(seed) if seed is not None else int.from_bytes(os.urandom(4), "little")
+        self.timing_jitter = max(0.0, min(0.9, timing_jitter))
+        self.click_radius = max(0.0, click_radius)
+        self.curvature = max(0.0, curvature)
+        self.read_ahead = max(1, read_ahead)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"loops": 0, "batches": 0, "paths": 0, "compute_ms": 0.0,
+                      "underruns": 0, "underrun_ms": 0.0, "max_buffered": 0}
+
+    def variations(self, actions: List[MacroAction], start: int, end: int, loops: int,
+                   speed: float = 1.0, fast_delay: Optional[float] = None):
+        """Itérateur des variations de chaque boucle : (délais, attentes avant trajectoire,
+        pas de trajectoire, décalages (dx, dy), trajectoires (courbure, points) ou None),
+        indexés depuis `start`"""
+        self.reset_stats()
+
+        def produce():
+            columns = self._columns([actions[i] for i in range(start, end)], speed, fast_delay)
+            per_batch = max(1, min(self.LOOP_BATCH, self.BATCH_ACTIONS // max(1, end - start)))
+            for batch, first in enumerate(range(0, loops, per_batch)):
+                yield from self._batch(np.random.default_rng([self.seed, batch]),
+                                       min(per_batch, loops - first), *columns)
+
+        return prefetch(produce, self.read_ahead, "macro-humanize", self.stats)
+
+    def path(self, origin: tuple, target: tuple, bend: float) -> List[tuple]:
+        """Trajectoire de `origin` à `target` (même courbe de Bézier que les lots précalculés)"""
+        dx, dy = target[0] - origin[0], target[1] - origin[1]
+        points = []
+        for k in range(1, self.PATH_POINTS + 1):
+            t = k / (self.PATH_POINTS + 1)
+            w = 2 * (1 - t) * t * bend
+            points.append((round(origin[0] + t * dx - w * dy), round(origin[1] + t * dy + w * dx)))
+        return points
+
+    @staticmethod
+    def _columns(actions: List[MacroAction], speed: float, fast_delay: Optional[float]) -> tuple:
+        """Colonnes des actions de la plage : délais de base, positions et masques par rôle"""
+        n = len(actions)
+        base = np.zeros(n)
+        if n > 1:
+            if fast_delay is not None:
+                base[1:] = fast_delay
+            else:
+                times = np.fromiter((a.timestamp for a in actions), np.float64, n)
+                base[1:] = np.maximum(0.0, np.diff(times) / speed)
+        positions = np.zeros((n, 2))
+        offset_mask = np.zeros(n, bool)  # clics et scrolls : décalés
+        path_mask = np.zeros(n, bool)    # mouvements et appuis : précédés d'une trajectoire
+        previous = np.arange(n)          # action positionnelle précédente (elle-même si aucune)
+        press_of = np.arange(n)          # relâchement -> appui correspondant (même décalage)
+        last, pressed = None, {}
+        for i, action in enumerate(actions):
+            data = action.data
+            if "x" not in data:
+                continue
+            positions[i] = data["x"], data["y"]
+            kind = action.action_type
+            offset_mask[i] = kind in ("mouse_click", "scroll")
+            if kind == "mouse_click":
+                if data.get("pressed", True):
+                    pressed[data.get("button")] = i
+                    path_mask[i] = True
+                elif data.get("button") in pressed:
+                    press_of[i] = pressed.pop(data.get("button"))
+            elif kind == "mouse_move":
+                path_mask[i] = True
+            if last is not None:
+                previous[i] = last
+            last = i
+        return base, positions, offset_mask, path_mask, previous, press_of
+
+    def _batch(self, rng, count: int, base, positions, offset_mask, path_mask, previous, press_of):
+        """Variations de `count` boucles, converties en listes une boucle à la fois"""
+        started = time.perf_counter()
+        n = len(base)
+        jitter = self.timing_jitter
+        factors = np.clip(rng.normal(1.0, jitter / 2, (count, n)), 1.0 - jitter, 1.0 + jitter)
+        delays = base * factors
+
+        angle = rng.uniform(0.0, 2 * np.pi, (count, n))
+        radius = self.click_radius * np.sqrt(rng.uniform(0.0, 1.0, (count, n))) * offset_mask
+        offsets = np.rint(np.stack((np.cos(angle) * radius, np.sin(angle) * radius), axis=-1))[:, press_of]
+
+        targets = positions + offsets
+        origins = targets[:, previous]
+        delta = targets - origins
+        distance = np.hypot(delta[..., 0], delta[..., 1])
+        has_path = path_mask & (distance >= self.MIN_PATH_DISTANCE)
+        has_path[:, 0] = False  # pas d'attente avant la première action de la plage
+        bend = rng.uniform(-self.curvature, self.curvature, (count, n, 1))
+
+        # Trajectoires des seules actions concernées : (trajectoires, PATH_POINTS, 2)
+        loop_of, index_of = np.nonzero(has_path)
+        start_points, end_points = origins[loop_of, index_of], targets[loop_of, index_of]
+        normal = np.stack((-delta[loop_of, index_of, 1], delta[loop_of, index_of, 0]), axis=-1)
+        control = (start_points + end_points) / 2 + normal * bend[loop_of, index_of]
+        t = (np.arange(1, self.PATH_POINTS + 1) / (self.PATH_POINTS + 1))[:, None]
+        points = np.rint((1 - t) ** 2 * start_points[:, None] + 2 * (1 - t) * t * control[:, None]
+                         + t ** 2 * end_points[:, None]).astype(np.int64).tolist()
+
+        path_time = np.where(has_path, np.minimum(delays * self.PATH_SHARE, self.PATH_DURATION), 0.0)
+        pre = delays - path_time
+        steps = path_time / self.PATH_POINTS
+        offsets = offsets.astype(np.int64)
+
+        bends, indices = bend[loop_of, index_of, 0].tolist(), index_of.tolist()
+        stats = self.stats
+        stats["loops"] += count
+        stats["batches"] += 1
+        stats["paths"] += len(points)
+        stats["compute_ms"] += (time.perf_counter() - started) * 1000.0
+
+        by_loop = np.searchsorted(loop_of, np.arange(count + 1)).tolist()  # loop_of est trié
+        for loop in range(count):
+            paths = [None] * n
+            for k in range(by_loop[loop], by_loop[loop + 1]):
+                paths[indices[k]] = (bends[k], points[k])
+            yield delays[loop].tolist(), pre[loop].tolist(), steps[loop].tolist(), offsets[loop].tolist(), paths
+
+    def summary(self) -> Dict[str, Any]:
+        stats = dict(self.stats, seed=self.seed)
+        stats["compute_ms"] = round(stats["compute_ms"], 3)
+        stats["underrun_ms"] = round(stats["underrun_ms"], 3)
+        return stats
 
 class MacroPlayer(QObject):
     """Classe pour rejouer les macros avec pyautogui"""
@@ -272,16 +3584,68 @@ class MacroPlayer(QObject):
     action_played = pyqtSignal(int)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, tracer: Optional[PerfTracer] = None, metrics: Optional[MetricsRegistry] = None,
+                 clock=time.perf_counter, sleep=time.sleep, player_id: str = "principal"):
         super().__init__()
         self.actions: List[MacroAction] = []
+        self.tracer = tracer or PerfTracer()
+        self.metrics = metrics or MetricsRegistry()
+        self.backend = PyAutoGuiBackend()
+        self.source: Optional[ActionStream] = None
+        self.clock = clock  # horloge et attente injectables (VirtualClock pour simuler)
+        self.sleep = sleep
         self.is_playing = False
         self.speed_multiplier = 1.0
         self.loop_count = 1
         self.playback_thread = None
 
+        # Plage de lecture (lecture partielle / reprise au milieu d'une macro)
+        self.start_index = 0
+        self.end_index: Optional[int] = None
+        self._time_index: Optional[ActionTimeIndex] = None
+        self._restored_inputs = set()
+        self._restored_position = None
+
+        # Mode rapide : pauses enregistrées supprimées, attente aux seuls points de synchro
+        self.fast_mode = False
+        self.fast_min_delay = 0.0
+        self.sync_min_gap = 0.5
+        self._sync_points: Dict[int, Dict[str, Any]] = {}
+        self._probe: Optional[ReadinessProbe] = None
+        self.last_run: Dict[str, Any] = {}
+
+        # Coordonnées relatives : position recalculée depuis la fenêtre enregistrée
+        self.window_cache: Optional[WindowGeometryCache] = None
+        self.window_misses = 0
+
+        # Humanisation : variations par boucle précalculées (Humanizer), None pour rejouer à l'identique
+        self.humanizer: Optional[Humanizer] = None
+
+        # Télémétrie : retard sur le planning = instant réel d'injection - instant prévu.
+        # Séries propres à ce player (étiquette player) : un seul thread écrit chacune
+        self.player_id = player_id
+        self.actions_metric = self.metrics.counter("macro_player_actions_total", "Actions injectées",
+                                                   ("player", "type")).labels(player_id)
+        self.lag_metric = self.metrics.histogram("macro_player_schedule_lag_seconds",
+                                                 "Retard de chaque injection sur le planning", ("player",)).labels(player_id)
+        self.behind_metric = self.metrics.gauge("macro_player_behind_seconds", "Retard courant sur le planning",
+                                                ("player",)).labels(player_id)
+        self.playing_metric = self.metrics.gauge("macro_player_playing", "1 pendant une lecture",
+                                                 ("player",)).labels(player_id)
+        self.runs_metric = self.metrics.counter("macro_player_runs_total", "Lectures terminées",
+                                                ("player",)).labels(player_id)
+
     def set_actions(self, actions: List[MacroAction]):
-        self.actions = actions.copy()
+        """Les instantanés (ActionSnapshot) sont partagés tels quels, les listes sont copiées"""
+        self.actions = actions if isinstance(actions, ActionSnapshot) else list(actions)
+        self.source = None
+        self._time_index = None
+        self.set_range()
+
+    def set_source(self, source: "ActionStream"):
+        """Lecture en continu depuis le disque (macro entière, pas de plage ; synchros marquées seulement)"""
+        self.set_actions([])
+        self.source = source
 
     def set_speed(self, speed: float):
         self.speed_multiplier = max(0.1, min(10.0, speed))
@@ -289,80 +3653,2247 @@ class MacroPlayer(QObject):
     def set_loop_count(self, count: int):
         self.loop_count = max(1, count)
 
+    def set_fast_mode(self, enabled: bool, min_gap: float = 0.5):
+        """Joue « aussi vite que l'application le permet » en n'attendant qu'aux points de synchro"""
+        self.fast_mode = enabled
+        self.sync_min_gap = min_gap
+
+    def set_humanizer(self, humanizer: Optional[Humanizer]):
+        """Variations de délais, clics et trajectoires à chaque boucle (ignoré en lecture continue)"""
+        self.humanizer = humanizer
+
+    def set_range(self, start_index: int = 0, end_index: Optional[int] = None):
+        """Limite la lecture aux actions [start_index, end_index)"""
+        self.start_index = max(0, min(start_index, len(self.actions)))
+        self.end_index = None if end_index is None else max(self.start_index, min(end_index, len(self.actions)))
+
+    def index_at_time(self, timestamp: float) -> int:
+        """Index de la première action à partir de `timestamp` (index construit à la demande)"""
+        if self._time_index is None or len(self._time_index) != len(self.actions):
+            self._time_index = ActionTimeIndex(self.actions)
+        return self._time_index.index_at(timestamp)
+
+    def set_time_range(self, start_time: float = 0.0, end_time: Optional[float] = None):
+        """Limite la lecture à une plage de temps de la macro (secondes)"""
+        end_index = None if end_time is None else self.index_at_time(end_time)
+        self.set_range(self.index_at_time(start_time), end_index)
+
     def play_macro(self):
-        if not MODULES_AVAILABLE:
+        if not self.backend.is_available():
             self.error_occurred.emit("Modules non disponibles")
             return
 
-        if not self.actions:
+        if self.source is None and (not self.actions or self.start_index >= self._end()):
             self.error_occurred.emit("Aucune action à jouer")
             return
 
         self.is_playing = True
+        self.playing_metric.set(1)
         self.playback_started.emit()
 
-        self.playback_thread = threading.Thread(target=self._play_loop, daemon=True)
+        target = self._play_loop if self.source is None else self._play_stream
+        self.playback_thread = threading.Thread(target=target, daemon=True)
         self.playback_thread.start()
 
     def stop_playback(self):
         self.is_playing = False
 
+    def _end(self):
+        return len(self.actions) if self.end_index is None else self.end_index
+
     def _play_loop(self):
+        tracer = self.tracer if self.tracer.enabled else None
+        start, end = self.start_index, self._end()
+        state = InputState.at(self.actions, start) if start > 0 else None
+        run_start = self.clock()
+        loops_done = 0
+        self.window_misses = 0
+        self._sync_points, self._probe = {}, None
+        if self.fast_mode:
+            self._sync_points = {i: sync for i, sync in detect_sync_points(self.actions, self.sync_min_gap).items()
+                                 if start <= i < end}
+            self._probe = ReadinessProbe(self.backend, tracer, self.clock, self.sleep)
+        variations = None
+        if self.humanizer is not None:
+            variations = self.humanizer.variations(self.actions, start, end, self.loop_count, self.speed_multiplier,
+                                                   self.fast_min_delay if self.fast_mode else None)
         try:
             for loop in range(self.loop_count):
                 if not self.is_playing:
                     break
+                loops_done += 1
+
+                if state:
+                    self._restore_state(state)
+
+                if variations is not None:
+                    self._play_actions_humanized(next(variations), start, end, tracer, loop)
+                elif tracer:
+                    self._play_actions_traced(tracer, loop, start, end)
+                else:
+                    loop_start, planned = self.clock(), 0.0
+                    actions_metric, lag_metric, behind_metric = self.actions_metric, self.lag_metric, self.behind_metric
+                    for i in range(start, end):
+                        if not self.is_playing:
+                            break
+
+                        action = self.actions[i]
+                        if i > start:
+                            delay = self._delay_before(i)
+                            planned += delay
+                            self.sleep(delay)
+                            if not self.is_playing:
+                                break  # arrêt demandé pendant l'attente
+
+                        behind = self.clock() - loop_start - planned
+                        self._execute_action(action)
+                        self.action_played.emit(i)
+                        actions_metric.labels(action.action_type).inc()
+                        lag_metric.observe(max(0.0, behind))
+                        behind_metric.set(behind)
+                        if i in self._sync_points:
+                            self._wait_sync(i)
+                            planned = self.clock() - loop_start  # l'attente de synchro fait partie du planning
+
+                self._release_restored_inputs()
 
-                for i, action in enumerate(self.actions):
-                    if not self.is_playing:
-                        break
-
-                    if i > 0:
-                        delay = (action.timestamp - self.actions[i-1].timestamp) / self.speed_multiplier
-                        time.sleep(max(0, delay))
+        except Exception as e:
+            self.error_occurred.emit(f"Erreur pendant la lecture: {str(e)}")
+        finally:
+            if variations is not None:
+                variations.close()
+            self._release_restored_inputs()
+            recorded = self.actions[end - 1].timestamp - self.actions[start].timestamp if end > start else 0.0
+            self._report_run(recorded, loops_done, self.clock() - run_start)
+            self.is_playing = False
+            self.playing_metric.set(0)
+            self.behind_metric.set(0)
+            self.runs_metric.inc()
+            self.playback_finished.emit()
 
-                    self._execute_action(action)
-                    self.action_played.emit(i)
+    def _delay_before(self, i: int) -> float:
+        if self.fast_mode:
+            return self.fast_min_delay
+        return max(0.0, (self.actions[i].timestamp - self.actions[i-1].timestamp) / self.speed_multiplier)
+
+    def _wait_sync(self, i: int):
+        self._probe.wait(self._sync_points[i], i, lambda: self.is_playing)
+
+    def _report_run(self, recorded: float, loops: int, elapsed: float):
+        """Durée réelle de la lecture comparée à la lecture chronométrée équivalente"""
+        timed = recorded / self.speed_multiplier * loops
+        self.last_run = {
+            "mode": "rapide" if self.fast_mode else "chronométré",
+            "elapsed": round(elapsed, 6),
+            "timed": round(timed, 6),
+            "speedup": round(timed / elapsed, 2) if elapsed > 0 else None,
+            "sync_points": len(self._sync_points),
+            "waits": self._probe.waits if self._probe else 0,
+            "wait_time": round(self._probe.wait_time, 6) if self._probe else 0.0,
+            "timeouts": self._probe.timeouts if self._probe else 0,
+            "window_misses": self.window_misses,
+        }
+        if self.source is not None:
+            self.last_run["stream"] = self.source.summary()
+        elif self.humanizer is not None:
+            self.last_run["humanize"] = self.humanizer.summary()
+
+    def _play_stream(self):
+        """Boucle de lecture d'une source en continu : seules l'action courante et la précédente sont utiles"""
+        source = self.source
+        source.reset_stats()
+        run_start = self.clock()
+        loops_done = 0
+        recorded = 0.0
+        self.window_misses = 0
+        self._sync_points = {}
+        self._probe = ReadinessProbe(self.backend, None, self.clock, self.sleep) if self.fast_mode else None
+        actions_metric, lag_metric, behind_metric = self.actions_metric, self.lag_metric, self.behind_metric
+        try:
+            for loop in range(self.loop_count):
+                if not self.is_playing:
+                    break
+                loops_done += 1
+                loop_start, planned = self.clock(), 0.0
+                first = previous = None
+                stream = iter(source)
+                try:
+                    for i, action in enumerate(stream):
+                        if not self.is_playing:
+                            break
+                        if previous is None:
+                            first = action.timestamp
+                        else:
+                            delay = self.fast_min_delay if self.fast_mode else \
+                                max(0.0, (action.timestamp - previous) / self.speed_multiplier)
+                            planned += delay
+                            self.sleep(delay)
+                            if not self.is_playing:
+                                break
+                        previous = action.timestamp
+
+                        behind = self.clock() - loop_start - planned
+                        self._execute_action(action)
+                        self.action_played.emit(i)
+                        actions_metric.labels(action.action_type).inc()
+                        lag_metric.observe(max(0.0, behind))
+                        behind_metric.set(behind)
+                        sync = action.data.get("sync")
+                        if sync and self._probe is not None:
+                            self._probe.wait(sync, i, lambda: self.is_playing)
+                            planned = self.clock() - loop_start
+                finally:
+                    stream.close()
+                if previous is not None:
+                    recorded = previous - first
 
         except Exception as e:
             self.error_occurred.emit(f"Erreur pendant la lecture: {str(e)}")
         finally:
+            self._report_run(recorded, loops_done, self.clock() - run_start)
             self.is_playing = False
+            self.playing_metric.set(0)
+            self.behind_metric.set(0)
+            self.runs_metric.inc()
             self.playback_finished.emit()
 
-    def _execute_action(self, action: MacroAction):
+    def _restore_state(self, state: InputState):
+        """Reproduit l'état des entrées avant de démarrer au milieu de la macro"""
+        self._restored_position = state.position
+        if state.position:
+            self.backend.move_to(*state.position)
+        for key in state.held_keys:
+            key_name = self._key_name(key)
+            if key_name:
+                self.backend.key_down(key_name)
+                self._restored_inputs.add(("key", key))
+        if state.position:
+            for button in state.held_buttons:
+                self.backend.mouse_down(*state.position, "left" if button == "gauche" else "right")
+                self._restored_inputs.add(("button", button))
+
+    def _release_restored_inputs(self):
+        """Relâche les touches/boutons maintenus par _restore_state et pas encore relâchés par la macro"""
+        for kind, name in list(self._restored_inputs):
+            try:
+                if kind == "key":
+                    self.backend.key_up(self._key_name(name))
+                else:
+                    self.backend.mouse_up(*self._restored_position, "left" if name == "gauche" else "right")
+            except Exception as e:
+                print(f"Erreur lors du relâchement de {name}: {e}")
+        self._restored_inputs.clear()
+
+    def _play_actions_traced(self, tracer: PerfTracer, loop: int, start: int, end: int):
+        """Variante instrumentée de la boucle de lecture (attente, injection, signal)"""
+        loop_start = tracer.now()
+        first_timestamp = self.actions[start].timestamp
+        planned_ns = 0
+
+        for i in range(start, end):
+            if not self.is_playing:
+                break
+
+            action = self.actions[i]
+            t0 = tracer.now()
+            if i > start:
+                delay = self._delay_before(i)
+                planned_ns += int(delay * 1e9)
+                self.sleep(delay)
+                if not self.is_playing:
+                    break
+            t1 = tracer.now()
+            self._execute_action(action)
+            t2 = tracer.now()
+            self.action_played.emit(i)
+            t3 = tracer.now()
+            behind = (t1 - loop_start - planned_ns) / 1e9
+            self.actions_metric.labels(action.action_type).inc()
+            self.lag_metric.observe(max(0.0, behind))
+            self.behind_metric.set(behind)
+            if i in self._sync_points:
+                self._wait_sync(i)
+                planned_ns = tracer.now() - loop_start
+
+            # Dérive : écart entre l'instant prévu et l'instant réel d'injection
+            planned_ms = (action.timestamp - first_timestamp) / self.speed_multiplier * 1000.0
+            drift_ms = (t1 - loop_start) / 1e6 - planned_ms
+            tracer.add_span("attente", PerfTracer.CAT_SCHEDULE, t0, t1, {"index": i, "derive_ms": round(drift_ms, 3)})
+            tracer.add_span(action.action_type, PerfTracer.CAT_INJECT, t1, t2, {"index": i})
+            tracer.add_span("action_played", PerfTracer.CAT_SIGNAL, t2, t3)
+
+        tracer.add_span(f"boucle {loop + 1}", PerfTracer.CAT_SCHEDULE, loop_start, tracer.now())
+
+    def _play_actions_humanized(self, variation: tuple, start: int, end: int,
+                                tracer: Optional[PerfTracer] = None, loop: int = 0):
+        """Boucle de lecture humanisée : distribue les délais, décalages et trajectoires précalculés
+
+        Avec un traceur : spans d'attente, de trajectoire, d'injection et de signal, comme
+        _play_actions_traced.
+        """
+        delays, pre, steps, offsets, paths = variation
+        backend = self.backend
+        actions_metric, lag_metric, behind_metric = self.actions_metric, self.lag_metric, self.behind_metric
+        loop_start, planned = self.clock(), 0.0
+        traced_start = tracer.now() if tracer else 0
+        # Coordonnées relatives : trajectoires refaites entre les positions résolues à la lecture
+        relative = self.window_cache is not None
+        origin = None
+        for j in range(end - start):
+            if not self.is_playing:
+                break
+
+            i = start + j
+            action = self.actions[i]
+            t0 = tracer.now() if tracer else 0
+            if j:
+                planned += delays[j]
+                self.sleep(pre[j])
+                path = paths[j]
+                if path is not None:
+                    t_path = tracer.now() if tracer else 0
+                    step = steps[j]
+                    bend, path = path
+                    if relative and origin is not None:
+                        path = self.humanizer.path(origin, self._point(action.data, offsets[j], False), bend)
+                    for x, y in path:
+                        backend.move_to(x, y)
+                        self.sleep(step)
+                    if tracer:
+                        tracer.add_span("trajectoire", PerfTracer.CAT_INJECT, t_path, tracer.now(),
+                                        {"index": i, "points": len(path)})
+                if not self.is_playing:
+                    break
+
+            behind = self.clock() - loop_start - planned
+            if tracer:
+                t1 = tracer.now()
+                self._execute_action(action, offsets[j])
+                t2 = tracer.now()
+                self.action_played.emit(i)
+                t3 = tracer.now()
+                tracer.add_span("attente", PerfTracer.CAT_SCHEDULE, t0, t1,
+                                {"index": i, "derive_ms": round(behind * 1000.0, 3)})
+                tracer.add_span(action.action_type, PerfTracer.CAT_INJECT, t1, t2, {"index": i})
+                tracer.add_span("action_played", PerfTracer.CAT_SIGNAL, t2, t3)
+            else:
+                self._execute_action(action, offsets[j])
+                self.action_played.emit(i)
+            if relative and "x" in action.data:
+                origin = self._point(action.data, offsets[j], False)
+            actions_metric.labels(action.action_type).inc()
+            lag_metric.observe(max(0.0, behind))
+            behind_metric.set(behind)
+            if i in self._sync_points:
+                self._wait_sync(i)
+                planned = self.clock() - loop_start
+
+        if tracer:
+            tracer.add_span(f"boucle {loop + 1} (humanisée)", PerfTracer.CAT_SCHEDULE, traced_start, tracer.now())
+
+    @staticmethod
+    def _key_name(key: str) -> Optional[str]:
+        """Convertit une touche enregistrée par pynput en nom pyautogui (None si non supportée)"""
+        key_str = key.replace("Key.", "").replace("'", "")
+        key_mapping = {
+            "space": " ",
+            "enter": "enter",
+            "tab": "tab",
+            "backspace": "backspace",
+            "delete": "delete",
+            "shift": "shift",
+            "ctrl": "ctrl",
+            "alt": "alt"
+        }
+        key_str = key_mapping.get(key_str.lower(), key_str)
+        if len(key_str) == 1 or key_str in ["enter", "tab", "backspace", "delete", "shift", "ctrl", "alt"]:
+            return key_str
+        return None
+
+    def _point(self, data: Dict[str, Any], offset: Optional[list] = None, count_miss: bool = True) -> tuple:
+        """Position à injecter : origine actuelle de la fenêtre + décalage, sinon coordonnées absolues
+
+        `offset` : décalage d'humanisation (dx, dy) ajouté à la position résolue.
+        `count_miss` : False pour une résolution annexe (trajectoire), sans compter l'échec.
+        """
+        x, y = data["x"], data["y"]
+        window = data.get("window")
+        if window is not None and self.window_cache is not None:
+            origin = self.window_cache.resolve(window)
+            if origin is not None:
+                x, y = origin[0] + window["ox"], origin[1] + window["oy"]
+            elif count_miss:
+                self.window_misses += 1
+        if offset:
+            return x + offset[0], y + offset[1]
+        return x, y
+
+    def _execute_action(self, action: MacroAction, offset: Optional[list] = None):
         try:
             if action.action_type == "mouse_click" and action.data.get("pressed", True):
                 button = "left" if action.data.get("button") == "gauche" else "right"
-                pyautogui.click(action.data["x"], action.data["y"], button=button)
+                self.backend.click(*self._point(action.data, offset), button)
 
             elif action.action_type == "mouse_move":
-                pyautogui.moveTo(action.data["x"], action.data["y"])
+                self.backend.move_to(*self._point(action.data, offset))
 
             elif action.action_type == "key_press":
-                key_str = action.data["key"].replace("Key.", "").replace("'", "")
-                key_mapping = {
-                    "space": " ",
-                    "enter": "enter",
-                    "tab": "tab",
-                    "backspace": "backspace",
-                    "delete": "delete",
-                    "shift": "shift",
-                    "ctrl": "ctrl",
-                    "alt": "alt"
-                }
-                key_str = key_mapping.get(key_str.lower(), key_str)
-                if len(key_str) == 1 or key_str in ["enter", "tab", "backspace", "delete", "shift", "ctrl", "alt"]:
-                    pyautogui.press(key_str)
+                key_str = self._key_name(action.data["key"])
+                if key_str:
+                    self.backend.press(key_str)
 
             elif action.action_type == "scroll":
-                x, y = action.data["x"], action.data["y"]
+                x, y = self._point(action.data, offset)
                 dy = action.data["dy"]
-                pyautogui.scroll(dy, x=x, y=y)
+                self.backend.scroll(dy, x, y)
+
+            elif action.action_type == "text_input":
+                self.backend.type_text(action.data["text"], action.data.get("rate"))
+
+            # Relâchement d'une entrée maintenue par la reconstruction d'état
+            if self._restored_inputs:
+                if action.action_type == "key_release" and ("key", action.data["key"]) in self._restored_inputs:
+                    self._restored_inputs.discard(("key", action.data["key"]))
+                    self.backend.key_up(self._key_name(action.data["key"]))
+                elif action.action_type == "mouse_click" and not action.data.get("pressed", True) \
+                        and ("button", action.data.get("button")) in self._restored_inputs:
+                    button = action.data.get("button")
+                    self._restored_inputs.discard(("button", button))
+                    self.backend.mouse_up(*self._point(action.data, offset), "left" if button == "gauche" else "right")
 
         except Exception as e:
             print(f"Erreur lors de l'exécution de l'action {action.action_type}: {e}")
 
+def simulate_playback(actions: List[MacroAction], speed: float = 1.0, loop_count: int = 1, fast: bool = False,
+                      setup=None) -> MacroPlayer:
+    """Lecture complète en temps simulé dans un RecordingBackend (aucune attente réelle)
+
+    Le flux d'événements et leurs instants sont ceux d'une lecture réelle sans retard.
+    `actions` peut être une ActionStream (lecture en continu depuis le disque).
+    `setup(player, clock)` peut programmer des événements sur l'horloge (arrêt, écran...).
+    """
+    clock = VirtualClock()
+    player = MacroPlayer(PerfTracer(clock=clock.now_ns), clock=clock.now, sleep=clock.sleep)
+    player.backend = RecordingBackend(clock=clock.now)
+    if isinstance(actions, ActionStream):
+        player.set_source(actions)
+    else:
+        player.set_actions(actions)
+    player.set_speed(speed)
+    player.set_loop_count(loop_count)
+    player.set_fast_mode(fast)
+    if setup is not None:
+        setup(player, clock)
+    player.is_playing = True
+    if player.source is None:
+        player._play_loop()
+    else:
+        player._play_stream()
+    return player
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+class CronExpression:
+    """Expression cron à 5 champs (minute heure jour mois jour-de-semaine), en heure locale
+
+    Syntaxe : *, listes (1,15), plages (1-5), pas (*/10, 8-18/2), noms (jan, mon) et
+    raccourcis @hourly, @daily, @weekly, @monthly, @yearly. Comme cron, si le jour du mois
+    et le jour de la semaine sont tous deux restreints, l'un OU l'autre suffit.
+    """
+
+    ALIASES = {"@yearly": "0 0 1 1 *", "@annually": "0 0 1 1 *", "@monthly": "0 0 1 * *",
+               "@weekly": "0 0 * * 0", "@daily": "0 0 * * *", "@midnight": "0 0 * * *", "@hourly": "0 * * * *"}
+    FIELDS = (("minute", 0, 59), ("heure", 0, 23), ("jour", 1, 31), ("mois", 1, 12), ("jour de semaine", 0, 7))
+    NAMES = {3: ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"],
+             4: ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]}
+    MAX_DAYS = 366 * 8  # au-delà, l'expression ne correspond à aucune date (ex. 30 février)
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = self.ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expression cron invalide (5 champs attendus): {expression!r}")
+        parsed = [self._parse_field(text, index) for index, text in enumerate(fields)]
+        self.minutes, self.hours, self.days, self.months, weekdays = (sorted(values) for values in parsed)
+        self.weekdays = {day % 7 for day in weekdays}
+        self.day_restricted = fields[2] != "*"
+        self.weekday_restricted = fields[4] != "*"
+
+    def _parse_field(self, text: str, index: int) -> set:
+        name, low, high = self.FIELDS[index]
+        names = self.NAMES.get(index, [])
+
+        def value(token):
+            token = token.lower()
+            if token in names:
+                return names.index(token) + (1 if index == 3 else 0)
+            number = int(token)
+            if not low <= number <= high:
+                raise ValueError(f"{name} hors limites: {token}")
+            return number
+
+        values = set()
+        for part in text.split(","):
+            body, _, step = part.partition("/")
+            step = int(step) if step else 1
+            if step < 1:
+                raise ValueError(f"Pas invalide: {part}")
+            if body == "*":
+                start, end = low, high
+            elif "-" in body:
+                start, end = (value(token) for token in body.split("-", 1))
+            else:
+                start = value(body)
+                end = high if step > 1 else start
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        in_month = day.day in self.days
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return in_month or in_week
+        return in_month and in_week
+
+    def next_after(self, timestamp: float) -> float:
+        """Instant (epoch) du prochain déclenchement strictement après `timestamp`"""
+        moment = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = moment.replace(hour=0, minute=0)
+        for _ in range(self.MAX_DAYS):
+            if day.month in self.months and self._day_matches(day):
+                # Premier couple (heure, minute) valide de ce jour à partir de `moment`
+                hour_index = bisect.bisect_left(self.hours, moment.hour if moment.date() == day.date() else 0)
+                for hour in self.hours[hour_index:]:
+                    first_minute = moment.minute if moment.date() == day.date() and hour == moment.hour else 0
+                    minute_index = bisect.bisect_left(self.minutes, first_minute)
+                    if minute_index < len(self.minutes):
+                        return day.replace(hour=hour, minute=self.minutes[minute_index]).timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"Expression cron sans occurrence: {self.expression!r}")
+
+SCHEDULE_TRIGGERS = ("cron", "interval", "hotkey")
+OVERLAP_POLICIES = ("skip", "queue", "parallel")
+CATCH_UP_POLICIES = ("skip", "once", "all")
+
+@dataclass
+class Schedule:
+    """Déclenchement planifié d'une macro
+
+    `spec` : expression cron, intervalle en secondes ou raccourci pynput ("<ctrl>+<alt>+m").
+    `overlap` : que faire si la lecture précédente n'est pas finie (ignorer, mettre en file,
+    lancer en parallèle sur un autre player). `catch_up` : que faire des occurrences manquées
+    (démon arrêté, mise en veille) : les ignorer, en rejouer une seule, ou toutes.
+    """
+    schedule_id: str
+    macro: str
+    trigger: str
+    spec: Any
+    overlap: str = "skip"
+    catch_up: str = "once"
+    speed: float = 1.0
+    loops: int = 1
+    fast: bool = False
+    enabled: bool = True
+    last_run: Optional[float] = None
+
+    def __post_init__(self):
+        if self.trigger not in SCHEDULE_TRIGGERS:
+            raise ValueError(f"Déclencheur inconnu: {self.trigger}")
+        if self.overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Politique de chevauchement inconnue: {self.overlap}")
+        if self.catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Politique de rattrapage inconnue: {self.catch_up}")
+        self.cron = CronExpression(self.spec) if self.trigger == "cron" else None
+        if self.trigger == "interval" and float(self.spec) <= 0:
+            raise ValueError("L'intervalle doit être positif")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Schedule":
+        return cls(**data)
+
+    def next_after(self, timestamp: float) -> Optional[float]:
+        if self.trigger == "cron":
+            return self.cron.next_after(timestamp)
+        if self.trigger == "interval":
+            return timestamp + float(self.spec)
+        return None
+
+class MacroScheduler:
+    """Planificateur de macros à coût quasi nul au repos
+
+    Les échéances cron/intervalle sont rangées dans un tas (heapq) ; un unique thread dort
+    jusqu'à la plus proche (au plus MAX_SLEEP, pour détecter un saut d'horloge ou une mise
+    en veille), quel que soit le nombre de planifications. Les modifications réveillent le
+    thread via une Condition. Les raccourcis passent par pynput.GlobalHotKeys (optionnel).
+
+    Les lectures sont confiées à des MacroPlayer « chauds » réutilisés (backend initialisé),
+    au plus `max_players` en même temps. `loader` charge chaque macro à chaque lecture
+    (load_macro_file par défaut, sans cache ; le démon fournit son cache). Avec `runner`,
+    les lectures lui sont déléguées à la place des players : le démon les place dans sa
+    file de jobs, une macro à la fois avec les siennes.
+    """
+
+    MAX_SLEEP = 60.0
+    MISFIRE_GRACE = 5.0   # retard au-delà duquel une occurrence est considérée comme manquée
+    MAX_CATCH_UP = 100
+
+    def __init__(self, loader=None, backend=None, max_players: int = 4,
+                 metrics: Optional[MetricsRegistry] = None, clock=time.time, state_path=None, runner=None):
+        self.loader = loader or load_macro_file
+        self.runner = runner  # runner(schedule) -> message d'erreur ou None (appel bloquant)
+        self.backend = backend
+        self.max_players = max(1, max_players)
+        self.metrics = metrics or MetricsRegistry()
+        self.clock = clock
+        self.state_path = Path(state_path) if state_path else None
+
+        self.schedules: Dict[str, Schedule] = {}
+        self._heap: List[tuple] = []            # (échéance, version, id) ; entrées périmées ignorées
+        self._versions: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._idle_players: List[MacroPlayer] = []
+        self._busy_players = 0
+        self._created_players = 0  # numérote les players (étiquette player des métriques)
+        self._waiting: List[tuple] = []          # lectures en attente d'un player libre
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._hotkeys = None
+        self._stopped = False
+        self.wakeups = 0
+        self.history: List[Dict[str, Any]] = []  # derniers déclenchements (bornée)
+
+        self.runs_metric = self.metrics.counter("macro_scheduler_runs_total", "Déclenchements planifiés",
+                                                ("result",))
+        self.metrics.gauge("macro_scheduler_schedules", "Planifications actives",
+                           function=lambda: sum(s.enabled for s in list(self.schedules.values())))
+
+    # Planifications
+    def add(self, schedule: Schedule) -> Schedule:
+        with self._condition:
+            self.schedules[schedule.schedule_id] = schedule
+            self._arm(schedule, self.clock())
+            self._condition.notify()
+        if schedule.trigger == "hotkey":
+            self._refresh_hotkeys()
+        return schedule
+
+    def remove(self, schedule_id: str) -> bool:
+        with self._condition:
+            schedule = self.schedules.pop(schedule_id, None)
+            self._versions.pop(schedule_id, None)
+            self._pending.pop(schedule_id, None)
+            self._condition.notify_all()
+        if schedule and schedule.trigger == "hotkey":
+            self._refresh_hotkeys()
+        return schedule is not None
+
+    def _arm(self, schedule: Schedule, now: float):
+        """(Re)place la prochaine échéance ; reprend après le dernier passage connu pour détecter les manqués"""
+        version = self._versions.get(schedule.schedule_id, 0) + 1
+        self._versions[schedule.schedule_id] = version
+        if not schedule.enabled or schedule.trigger == "hotkey":
+            return
+        due = schedule.next_after(schedule.last_run if schedule.last_run is not None else now)
+        heapq.heappush(self._heap, (due, version, schedule.schedule_id))
+
+    def next_due(self) -> Optional[tuple]:
+        """(échéance, id) de la prochaine planification à déclencher"""
+        with self._condition:
+            self._drop_stale()
+            return (self._heap[0][0], self._heap[0][2]) if self._heap else None
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._versions.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    # Boucle principale
+    def start(self):
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="macro-scheduler", daemon=True)
+            self._thread.start()
+            self._refresh_hotkeys()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._hotkeys:
+            self._hotkeys.stop()
+            self._hotkeys = None
+        self.save_state()
+
+    def _run(self):
+        with self._condition:
+            while not self._stopped:
+                self._drop_stale()
+                timeout = self.MAX_SLEEP
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - self.clock()))
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    self.wakeups += 1
+                if not self._stopped:
+                    self.run_pending()
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        """Déclenche les planifications échues (appelé par le thread, ou directement dans les tests)"""
+        now = self.clock() if now is None else now
+        fired = 0
+        with self._condition:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, version, schedule_id = heapq.heappop(self._heap)
+                schedule = self.schedules[schedule_id]
+                occurrences = self._occurrences(schedule, due, now)
+                schedule.last_run = now
+                self._arm(schedule, now)
+                for reason in occurrences:
+                    self._fire(schedule, reason)
+                    fired += 1
+        return fired
+
+    def _occurrences(self, schedule: Schedule, due: float, now: float) -> List[str]:
+        """Déclenchements à effectuer pour une échéance atteinte, selon la politique de rattrapage"""
+        if now - due <= self.MISFIRE_GRACE:
+            return ["planifié"]
+        missed, t = 0, due
+        while t <= now - self.MISFIRE_GRACE and missed < self.MAX_CATCH_UP:
+            missed += 1
+            t = schedule.next_after(t)
+        self.runs_metric.labels("missed").inc(missed)
+        if schedule.catch_up == "skip":
+            return ["planifié"] if t <= now else []
+        if schedule.catch_up == "once":
+            return ["rattrapage"]
+        return ["rattrapage"] * missed
+
+    def trigger(self, schedule_id: str, reason: str = "manuel"):
+        """Déclenche immédiatement une planification (raccourci, commande du démon)"""
+        with self._condition:
+            schedule = self.schedules.get(schedule_id)
+            if schedule is None:
+                raise ValueError(f"Planification inconnue: {schedule_id}")
+            schedule.last_run = self.clock()
+            self._fire(schedule, reason)
+
+    # Chevauchement et players
+    def _fire(self, schedule: Schedule, reason: str):
+        schedule_id = schedule.schedule_id
+        if self._running.get(schedule_id) and schedule.overlap != "parallel":
+            if schedule.overlap == "skip":
+                self._record(schedule, reason, "ignoré")
+                return
+            self._pending[schedule_id] = self._pending.get(schedule_id, 0) + 1
+            self._record(schedule, reason, "en file")
+            return
+        self._start_run(schedule, reason)
+
+    def _start_run(self, schedule: Schedule, reason: str):
+        self._running[schedule.schedule_id] = self._running.get(schedule.schedule_id, 0) + 1
+        player = None if self.runner else self._acquire_player()
+        if player is None and not self.runner:
+            self._waiting.append((schedule, reason))
+            return
+        threading.Thread(target=self._play, args=(player, schedule, reason),
+                         name=f"macro-schedule-{schedule.schedule_id}", daemon=True).start()
+
+    def _acquire_player(self) -> Optional[MacroPlayer]:
+        if self._idle_players:
+            player = self._idle_players.pop()
+        elif self._busy_players < self.max_players:
+            self._created_players += 1
+            player = MacroPlayer(metrics=self.metrics, player_id=f"planifié-{self._created_players}")
+            if self.backend is not None:
+                player.backend = self.backend
+        else:
+            return None
+        self._busy_players += 1
+        return player
+
+    def _play(self, player: Optional[MacroPlayer], schedule: Schedule, reason: str):
+        result, error = "terminé", None
+        try:
+            error = self.runner(schedule) if player is None else self._play_with(player, schedule)
+            if error:
+                result = "erreur"
+        except Exception as e:
+            result, error = "erreur", f"{type(e).__name__}: {e}"
+
+        with self._condition:
+            if player is not None:
+                self._busy_players -= 1
+                self._idle_players.append(player)
+            self._record(schedule, reason, result, error)
+            schedule_id = schedule.schedule_id
+            self._running[schedule_id] -= 1
+            if self._pending.get(schedule_id) and schedule_id in self.schedules:
+                self._pending[schedule_id] -= 1
+                self._start_run(schedule, "file")
+            if self._waiting:
+                waiting_schedule, waiting_reason = self._waiting.pop(0)
+                self._running[waiting_schedule.schedule_id] -= 1
+                self._start_run(waiting_schedule, waiting_reason)
+            self._condition.notify_all()
+
+    def _play_with(self, player: MacroPlayer, schedule: Schedule) -> Optional[str]:
+        """Lecture sur un player du planificateur : message d'erreur du player ou None"""
+        player.set_actions(self.loader(schedule.macro))
+        player.set_speed(schedule.speed)
+        player.set_loop_count(schedule.loops)
+        player.set_fast_mode(schedule.fast)
+        errors = []
+
+        def on_error(message):
+            errors.append(message)
+
+        player.error_occurred.connect(on_error, Qt.ConnectionType.DirectConnection)
+        try:
+            player.play_macro()
+            if player.is_playing and player.playback_thread:
+                player.playback_thread.join()
+        finally:
+            player.error_occurred.disconnect(on_error)
+        return errors[0] if errors else None
+
+    def _record(self, schedule: Schedule, reason: str, result: str, error: Optional[str] = None):
+        self.runs_metric.labels(result).inc()
+        self.history.append({"schedule": schedule.schedule_id, "at": self.clock(), "reason": reason,
+                             "result": result, "error": error})
+        del self.history[:-1000]
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin de toutes les lectures lancées (et mises en file)"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not any(self._running.values()) and not any(self._pending.values()), timeout)
+
+    # Raccourcis clavier
+    def _refresh_hotkeys(self):
+        if self._thread is None or not MODULES_AVAILABLE:
+            return
+        if self._hotkeys:
+            self._hotkeys.stop()
+            self._hotkeys = None
+        bindings = {s.spec: (lambda schedule_id=s.schedule_id: self.trigger(schedule_id, "raccourci"))
+                    for s in list(self.schedules.values()) if s.trigger == "hotkey" and s.enabled}
+        if bindings:
+            self._hotkeys = keyboard.GlobalHotKeys(bindings)
+            self._hotkeys.start()
+
+    # Persistance
+    def load(self, file_path) -> int:
+        """Charge des planifications depuis un fichier JSON (liste d'objets Schedule)
+
+        Les derniers passages sont repris du fichier d'état, ce qui permet de rattraper
+        les occurrences manquées pendant que le démon était arrêté.
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        state = {}
+        if self.state_path and self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        for entry in entries:
+            schedule = Schedule.from_dict(entry)
+            if schedule.last_run is None:
+                schedule.last_run = state.get(schedule.schedule_id)
+            self.add(schedule)
+        return len(entries)
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        state = {s.schedule_id: s.last_run for s in self.schedules.values() if s.last_run is not None}
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def status(self) -> Dict[str, Any]:
+        due = self.next_due()
+        return {
+            "schedules": len(self.schedules),
+            "next_due": due and {"at": due[0], "schedule": due[1]},
+            "running": sum(self._running.values()),
+            "pending": sum(self._pending.values()),
+            "players": self._busy_players + len(self._idle_players),
+            "wakeups": self.wakeups,
+            "recent": self.history[-10:],
+        }
+
+class MacroDaemon:
+    """Démon d'automatisation local avec API asyncio (lignes JSON sur TCP localhost ou socket Unix)
+
+    Le démon garde en mémoire le backend d'injection, le player, le recorder et
+    les macros déjà chargées, ce qui évite le coût d'import de PyQt6/pynput/pyautogui
+    et la construction de l'interface à chaque exécution automatisée.
+
+    Protocole : une requête JSON par ligne, par exemple
+        {"cmd": "play", "file": "login.json", "speed": 2.0, "loops": 1, "wait": true}
+        {"cmd": "play", "file": "login.json", "fast": true}
+        {"cmd": "play", "file": "genere.jsonl", "stream": true}   (lecture en continu, mémoire constante)
+        {"cmd": "play", "file": "login.json", "loops": 50, "humanize": {"seed": 42, "timing_jitter": 0.1}}
+        {"cmd": "record_start", "multitrack": true, "displays": [":1"]}   (pistes fusionnées)
+        {"cmd": "mark", "label": "étape 2"} / {"cmd": "inject", "action_type": "key_press", "data": {"key": "'a'"}}
+        {"cmd": "status"}
+        {"cmd": "metrics"}
+        {"cmd": "schedule_add", "schedule": {"schedule_id": "nuit", "macro": "login.json",
+                                             "trigger": "cron", "spec": "0 2 * * *"}}
+        {"cmd": "schedule_list"} / {"cmd": "schedule_run", "schedule_id": "nuit"} / {"cmd": "schedule_remove", ...}
+        {"cmd": "subscribe"}
+    Chaque réponse est une ligne JSON contenant "ok" et le champ "id" de la requête ;
+    les événements diffusés (progression, fin de job...) contiennent un champ "event".
+    """
+
+    PROGRESS_INTERVAL = 0.05
+    BACKLOG = 1024
+
+    def __init__(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                 socket_path: Optional[str] = None, backend=None, metrics: Optional[MetricsRegistry] = None,
+                 schedule_file: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.metrics = metrics or MetricsRegistry()
+        self.player = MacroPlayer(metrics=self.metrics)
+        if backend is not None:
+            self.player.backend = backend
+        self.recorder = MacroRecorder(metrics=self.metrics)
+
+        # Planificateur : ses lectures passent par la file de jobs (une à la fois avec les autres)
+        self.scheduler = MacroScheduler(self.load_actions, backend, metrics=self.metrics,
+                                        state_path=schedule_file and schedule_file + ".state",
+                                        runner=self._run_scheduled)
+        self.schedule_file = schedule_file
+
+        # Cache des macros chargées : chemin -> (mtime_ns, actions)
+        self.macro_cache: Dict[str, tuple] = {}
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server = None
+        self.jobs: Optional[asyncio.Queue] = None
+        self.subscribers = set()
+        self.client_count = 0
+        self._clients: Dict[asyncio.Task, asyncio.StreamWriter] = {}  # connexion en cours -> flux d'écriture
+        self.current_job: Optional[Dict[str, Any]] = None
+        self.completed_jobs = 0
+        self.started_at = time.time()
+        self._job_counter = 0
+        self._job_waiters: Dict[int, asyncio.Future] = {}
+        self._job_listeners: Dict[int, set] = {}
+        self._last_progress = 0.0
+        self._stopped: Optional[asyncio.Event] = None
+
+        # Les signaux sont émis depuis les threads de lecture/pynput : connexion directe
+        # puis retour dans la boucle asyncio via call_soon_threadsafe
+        direct = Qt.ConnectionType.DirectConnection
+        self.player.action_played.connect(self._on_action_played, direct)
+        self.player.playback_finished.connect(self._on_playback_finished, direct)
+        self.player.error_occurred.connect(self._on_player_error, direct)
+        self.recorder.action_recorded.connect(self._on_action_recorded, direct)
+
+    # Cycle de vie
+    async def start(self):
+        """Démarre le serveur (TCP localhost ou socket Unix) et le worker de lecture"""
+        self.loop = asyncio.get_running_loop()
+        self.jobs = asyncio.Queue()
+        self._stopped = asyncio.Event()
+
+        if self.socket_path and hasattr(asyncio, "start_unix_server"):
+            self.server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path,
+                                                          backlog=self.BACKLOG)
+        else:
+            self.server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                     backlog=self.BACKLOG)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+        self._worker_task = asyncio.create_task(self._job_worker())
+        if self.schedule_file:
+            self.scheduler.load(self.schedule_file)
+        self.scheduler.start()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"🛰️ Démon de macros à l'écoute sur {self.address()}")
+        await self._stopped.wait()
+        await self.close()
+
+    async def close(self):
+        self.scheduler.stop()
+        self.player.stop_playback()
+        if self.recorder.is_recording:
+            self.recorder.stop_recording()
+        self._worker_task.cancel()
+        self.server.close()
+        # Fermer les connexions plutôt que laisser la boucle annuler leurs tâches en lecture :
+        # chaque client voit une fin de flux et se termine normalement
+        for writer in self._clients.values():
+            writer.close()
+        if self._clients:
+            await asyncio.wait(list(self._clients), timeout=1.0)
+        await self.server.wait_closed()
+
+    def address(self) -> str:
+        if self.socket_path and hasattr(asyncio, "start_unix_server"):
+            return self.socket_path
+        return f"{self.host}:{self.port}"
+
+    # Gestion des macros
+    def load_actions(self, file_path: str) -> ActionSnapshot:
+        """Charge une macro en utilisant le cache (invalidé si le fichier a changé)
+
+        Le cache conserve un instantané figé : chaque lecture le partage sans copie.
+        """
+        path = str(Path(file_path).resolve())
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.macro_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        actions = ActionStore(load_macro_file(path)).snapshot()
+        self.macro_cache[path] = (mtime, actions)
+        return actions
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "playing": self.player.is_playing,
+            "recording": self.recorder.is_recording,
+            "current_job": self.current_job and {k: v for k, v in self.current_job.items() if k != "actions"},
+            "queued_jobs": self.jobs.qsize(),
+            "completed_jobs": self.completed_jobs,
+            "clients": self.client_count,
+            "subscribers": len(self.subscribers),
+            "cached_macros": len(self.macro_cache),
+            "scheduler": self.scheduler.status(),
+            "backend": self.player.backend.name,
+            "uptime": round(time.time() - self.started_at, 3),
+        }
+
+    # Connexions clientes
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.client_count += 1
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received_at = time.perf_counter()
+                request = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("la requête doit être un objet JSON")
+                    await self._dispatch(request, writer, received_at)
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    request_id = request.get("id") if isinstance(request, dict) else None
+                    await self._send(writer, {"ok": False, "id": request_id, "error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.client_count -= 1
+            self._clients.pop(task, None)
+            self.subscribers.discard(writer)
+            for listeners in self._job_listeners.values():
+                listeners.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _number(request: Dict[str, Any], name: str, cast) -> Optional[Any]:
+        """Paramètre numérique optionnel ; refusé (ValueError, renvoyée au client) s'il est mal typé ou négatif"""
+        value = request.get(name)
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value or value < 0:
+            raise ValueError(f"{name} doit être un nombre positif")
+        if cast is int and value != int(value):
+            raise ValueError(f"{name} doit être un entier")
+        return cast(value)
+
+    async def _dispatch(self, request: Dict[str, Any], writer, received_at: float):
+        cmd = request.get("cmd")
+        reply = {"ok": True, "id": request.get("id")}
+
+        if cmd == "status":
+            reply["status"] = self.status()
+
+        elif cmd == "load":
+            reply["action_count"] = len(self.load_actions(request["file"]))
+
+        elif cmd == "play":
+            if request.get("stream"):
+                actions = ActionStream(request["file"])
+            elif "file" in request:
+                actions = self.load_actions(request["file"])
+            else:
+                actions = [MacroAction.from_dict(a) for a in request.get("actions", [])]
+            if not actions and not isinstance(actions, ActionStream):
+                raise ValueError("Aucune action à jouer")
+            humanize = request.get("humanize")
+            humanizer = Humanizer(**humanize) if isinstance(humanize, dict) else Humanizer() if humanize else None
+
+            job = self._new_job(actions, request.get("file"), received_at,
+                                speed=float(request.get("speed", 1.0)),
+                                loops=int(request.get("loops", 1)),
+                                fast=bool(request.get("fast", False)),
+                                humanizer=humanizer,
+                                start_index=self._number(request, "start_index", int) or 0,
+                                end_index=self._number(request, "end_index", int),
+                                start_time=self._number(request, "start_time", float),
+                                end_time=self._number(request, "end_time", float))
+            done = self._job_waiters[job["job"]]
+            if request.get("wait"):
+                self._job_listeners[job["job"]] = {writer}
+            await self.jobs.put(job)
+            reply["job"] = job["job"]
+            reply["queued"] = self.jobs.qsize()
+
+            if request.get("wait"):
+                await self._send(writer, reply)
+                result = await done
+                reply = dict(result, ok=result["error"] is None, id=request.get("id"))
+
+        elif cmd == "stop":
+            self.player.stop_playback()
+
+        elif cmd == "record_start":
+            if self.player.is_playing:
+                raise RuntimeError("Lecture en cours")
+            displays = tuple(request.get("displays", ()))
+            if not self.recorder.set_multitrack(bool(request.get("multitrack") or displays), displays):
+                raise RuntimeError("Multipiste indisponible")
+            if not self.recorder.start_recording():
+                raise RuntimeError("Impossible de démarrer l'enregistrement")
+
+        elif cmd in ("mark", "inject"):
+            if cmd == "mark":
+                accepted = self.recorder.mark(request["label"])
+            else:
+                accepted = self.recorder.inject(request["action_type"], request.get("data", {}),
+                                                request.get("track", "injecté"), request.get("timestamp"))
+            if not accepted:
+                raise RuntimeError("Aucun enregistrement en cours ou piste pleine")
+
+        elif cmd == "record_stop":
+            self.recorder.stop_recording()
+            reply["action_count"] = len(self.recorder.actions)
+            if self.recorder.timeline is not None:
+                reply["tracks"] = self.recorder.track_stats
+            if request.get("save"):
+                save_macro_file(request["save"], self.recorder.actions)
+                reply["saved"] = request["save"]
+
+        elif cmd == "subscribe":
+            self.subscribers.add(writer)
+
+        elif cmd == "metrics":
+            reply["metrics"] = self.metrics.render()
+
+        elif cmd == "schedule_add":
+            reply["schedule"] = self.scheduler.add(Schedule.from_dict(request["schedule"])).to_dict()
+
+        elif cmd == "schedule_remove":
+            if not self.scheduler.remove(request["schedule_id"]):
+                raise ValueError(f"Planification inconnue: {request['schedule_id']}")
+
+        elif cmd == "schedule_run":
+            self.scheduler.trigger(request["schedule_id"])
+
+        elif cmd == "schedule_list":
+            reply["schedules"] = [schedule.to_dict() for schedule in list(self.scheduler.schedules.values())]
+            reply["scheduler"] = self.scheduler.status()
+
+        elif cmd == "shutdown":
+            self._stopped.set()
+
+        else:
+            raise ValueError(f"Commande inconnue: {cmd}")
+
+        await self._send(writer, reply)
+
+    async def _send(self, writer, message: Dict[str, Any]):
+        writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    def _broadcast(self, message: Dict[str, Any], job_id: Optional[int] = None):
+        """Diffuse un événement aux abonnés (et aux clients qui attendent ce job)"""
+        targets = set(self.subscribers)
+        if job_id is not None:
+            targets |= self._job_listeners.get(job_id, set())
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        for writer in targets:
+            if not writer.is_closing():
+                writer.write(data)
+
+    # Exécution des lectures (une à la fois : il n'y a qu'une souris et un clavier)
+    def _new_job(self, actions, file: Optional[str], received_at: float, speed: float = 1.0, loops: int = 1,
+                 fast: bool = False, humanizer: Optional[Humanizer] = None, start_index: int = 0,
+                 end_index: Optional[int] = None, start_time: Optional[float] = None,
+                 end_time: Optional[float] = None) -> Dict[str, Any]:
+        """Job numéroté avec sa future de résultat (à placer dans self.jobs)"""
+        self._job_counter += 1
+        job = {
+            "job": self._job_counter,
+            "file": file,
+            "actions": actions,
+            "total": len(actions),
+            "speed": speed,
+            "loops": loops,
+            "fast": fast,
+            "humanizer": humanizer,
+            "start_index": start_index,
+            "end_index": end_index,
+            "start_time": start_time,
+            "end_time": end_time,
+            "received_at": received_at,
+        }
+        self._job_waiters[job["job"]] = self.loop.create_future()
+        return job
+
+    def _run_scheduled(self, schedule: "Schedule") -> Optional[str]:
+        """Lecture planifiée (thread du planificateur) : mise en file comme un job, résultat attendu"""
+        return asyncio.run_coroutine_threadsafe(self._queue_scheduled(schedule), self.loop).result()
+
+    async def _queue_scheduled(self, schedule: "Schedule") -> Optional[str]:
+        job = self._new_job(self.load_actions(schedule.macro), schedule.macro, time.perf_counter(),
+                            speed=schedule.speed, loops=schedule.loops, fast=schedule.fast)
+        job["schedule"] = schedule.schedule_id
+        done = self._job_waiters[job["job"]]
+        await self.jobs.put(job)
+        return (await done)["error"]
+
+    async def _job_worker(self):
+        while True:
+            job = await self.jobs.get()
+            self.current_job = job
+            job["first_action_at"] = None
+            job["finished"] = self.loop.create_future()
+            self._last_progress = 0.0
+            started = False
+            try:
+                started = self._start_job(job)
+                await job["finished"]
+            except Exception as e:
+                # Un job en échec ne doit jamais arrêter le worker : les jobs suivants restent servis
+                self.player.stop_playback()
+                job["error"] = job.get("error") or f"{type(e).__name__}: {e}"
+            finally:
+                result = {
+                    "job": job["job"],
+                    "error": job.get("error"),
+                    "duration": round(time.perf_counter() - job["received_at"], 6),
+                    "run": self.player.last_run if started else {},
+                }
+                self.completed_jobs += 1
+                self.current_job = None
+                # Les clients en attente reçoivent le résultat comme réponse, pas comme événement
+                self._job_listeners.pop(job["job"], None)
+                self._broadcast(dict(result, event="job_finished"))
+                waiter = self._job_waiters.pop(job["job"], None)
+                if waiter and not waiter.done():
+                    waiter.set_result(result)
+
+    def _start_job(self, job: Dict[str, Any]) -> bool:
+        """Configure le player pour le job et lance la lecture (True une fois play_macro appelé)"""
+        if isinstance(job["actions"], ActionStream):
+            self.player.set_source(job["actions"])
+        else:
+            self.player.set_actions(job["actions"])
+            if job["start_time"] is not None or job["end_time"] is not None:
+                self.player.set_time_range(job["start_time"] or 0.0, job["end_time"])
+            else:
+                self.player.set_range(job["start_index"], job["end_index"])
+        self.player.set_speed(job["speed"])
+        self.player.set_loop_count(job["loops"])
+        self.player.set_fast_mode(job["fast"])
+        self.player.set_humanizer(job["humanizer"])
+        self._broadcast({"event": "job_started", "job": job["job"], "total": job["total"]}, job["job"])
+        # Fin signalée par playback_finished (émis en dernier par le thread de lecture) ;
+        # un refus immédiat de play_macro (erreur synchrone) ne démarre aucun thread
+        previous_thread = self.player.playback_thread
+        self.player.play_macro()
+        if self.player.playback_thread is previous_thread and not self.player.is_playing:
+            self._resolve_job(job)
+        return True
+
+    # Callbacks des threads de lecture / d'enregistrement
+    def _on_action_played(self, index):
+        job = self.current_job
+        if job is None:
+            return
+        now = time.perf_counter()
+        if job["first_action_at"] is None:
+            job["first_action_at"] = now
+            latency_ms = (now - job["received_at"]) * 1000.0
+            self.loop.call_soon_threadsafe(self._broadcast, {
+                "event": "first_action", "job": job["job"], "latency_ms": round(latency_ms, 3)
+            }, job["job"])
+        elif now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.loop.call_soon_threadsafe(self._broadcast, {
+                "event": "progress", "job": job["job"], "index": index, "total": job["total"]
+            }, job["job"])
+
+    def _on_playback_finished(self):
+        job = self.current_job
+        if job is not None:
+            self.loop.call_soon_threadsafe(self._resolve_job, job)
+
+    def _on_player_error(self, message):
+        """Erreur seulement notée : le job se termine à playback_finished, quand le thread a fini"""
+        job = self.current_job
+        if job is not None:
+            job["error"] = message
+
+    def _resolve_job(self, job):
+        if "finished" in job and not job["finished"].done():
+            job["finished"].set_result(True)
+
+    def _on_action_recorded(self, action):
+        if self.subscribers:
+            self.loop.call_soon_threadsafe(self._broadcast, {
+                "event": "action_recorded", "action": action.to_dict(), "count": len(self.recorder.actions)
+            })
+
+async def daemon_request(message: Dict[str, Any], host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                         socket_path: Optional[str] = None, on_event=None) -> Dict[str, Any]:
+    """Envoie une requête au démon et retourne la réponse finale (les événements passent par on_event)"""
+    if socket_path and hasattr(asyncio, "open_unix_connection"):
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Connexion fermée par le démon")
+            reply = json.loads(line)
+            if "event" in reply:
+                if on_event:
+                    on_event(reply)
+                continue
+            if message.get("wait") and "queued" in reply:
+                # Accusé de réception du job : la réponse finale arrive à la fin de la lecture
+                continue
+            return reply
+    finally:
+        writer.close()
+
+def run_daemon(host: str = DAEMON_HOST, port: int = DAEMON_PORT, socket_path: Optional[str] = None,
+               metrics_exporter: Optional[MetricsExporter] = None, schedule_file: Optional[str] = None):
+    """Lance le démon d'automatisation jusqu'à la commande "shutdown" """
+    daemon = MacroDaemon(host, port, socket_path, metrics=metrics_exporter.registry if metrics_exporter else None,
+                         schedule_file=schedule_file)
+    if metrics_exporter:
+        metrics_exporter.start()
+    try:
+        asyncio.run(daemon.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if metrics_exporter:
+            metrics_exporter.stop()
+
+BATCH_OPERATIONS = ("validate", "convert", "optimize")
+
+def _batch_process_file(task) -> Dict[str, Any]:
+    """Traite un fichier macro dans un processus du pool (doit rester au niveau module pour le pickling)"""
+    file_path, operation, options = task
+    result = {"path": file_path, "ok": True, "errors": []}
+    try:
+        data = read_macro_document(file_path)
+        errors = validate_macro_data(data, check_order=operation != "optimize")
+        if errors:
+            result.update(ok=False, errors=errors[:10], error_count=len(errors))
+            return result
+
+        if operation == "validate":
+            result["action_count"] = len(data['actions'])
+            return result
+
+        actions = [MacroAction.from_dict(action_data) for action_data in data['actions']]
+        theme = data.get('theme', 'light')
+
+        if operation == "optimize":
+            optimized = optimize_actions(actions, options.get("min_move_interval", 0.05))
+            result.update(before=len(actions), after=len(optimized))
+            destination = _batch_destination(file_path, options, macro_format_for(file_path))
+            if len(optimized) != len(actions) or destination != file_path:
+                save_macro_file(destination, optimized, theme)
+
+        elif operation == "convert":
+            destination = _batch_destination(file_path, options, options["format"])
+            save_macro_file(destination, actions, theme, options["format"])
+            result["output"] = destination
+
+    except Exception as e:
+        result.update(ok=False, errors=[f"{type(e).__name__}: {e}"])
+
+    return result
+
+def _batch_destination(file_path: str, options: Dict[str, Any], fmt: str) -> str:
+    """Chemin de sortie : même arborescence sous `output` (ou à côté du fichier), extension du format"""
+    path = Path(file_path)
+    if options.get("output"):
+        path = Path(options["output"]) / path.relative_to(options["root"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+    return str(path.with_suffix(f".{fmt}"))
+
+def find_macro_files(root) -> List[str]:
+    """Liste (triée) des fichiers macro .json / .jsonl / .mseg d'une arborescence"""
+    files = []
+    for directory, subdirectories, names in os.walk(root):
+        if SEGMENT_STORE_DIR in subdirectories:
+            subdirectories.remove(SEGMENT_STORE_DIR)
+        files.extend(os.path.join(directory, name) for name in names
+                     if name.lower().endswith((".json", ".jsonl", ".mseg")) and not name.startswith(".macro_batch"))
+    files.sort()
+    return files
+
+def run_batch(root, operation: str = "validate", workers: Optional[int] = None, fmt: str = "jsonl",
+              output: Optional[str] = None, resume: bool = False, journal: bool = True,
+              on_progress=None, chunksize: int = 16) -> Dict[str, Any]:
+    """Applique une opération (validate/convert/optimize) à toutes les macros d'un dossier via un pool de processus
+
+    Chaque fichier terminé est consigné dans un journal : avec `resume=True`, les fichiers
+    déjà traités lors d'une exécution interrompue sont ignorés.
+    """
+    if operation not in BATCH_OPERATIONS:
+        raise ValueError(f"Opération inconnue: {operation}")
+
+    root = str(Path(root).resolve())
+    workers = workers or os.cpu_count() or 1
+    options = {"root": root, "format": fmt, "output": output}
+    journal_path = Path(root) / f".macro_batch_{operation}.journal"
+
+    done = set()
+    if resume and journal_path.exists():
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            done = {line.rstrip("\n") for line in f if line.strip()}
+
+    files = [path for path in find_macro_files(root) if path not in done]
+    if operation == "convert":
+        files = [path for path in files if macro_format_for(path) != fmt]
+    summary = {"operation": operation, "workers": workers, "total": len(files), "skipped": len(done),
+               "processed": 0, "failed": 0, "failures": [], "elapsed": 0.0, "files_per_sec": 0.0}
+    if not files:
+        return summary
+
+    if operation == "convert" and fmt == "mseg":
+        # Un seul magasin de segments pour toute l'arborescence (dédupliquée entre dossiers)
+        (Path(output or root) / SEGMENT_STORE_DIR).mkdir(parents=True, exist_ok=True)
+    tasks = [(path, operation, options) for path in files]
+    journal_file = open(journal_path, 'a' if resume else 'w', encoding='utf-8') if journal else None
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap_unordered(_batch_process_file, tasks, chunksize=chunksize):
+            summary["processed"] += 1
+            if not result["ok"]:
+                summary["failed"] += 1
+                if len(summary["failures"]) < 100:
+                    summary["failures"].append(result)
+            if journal_file:
+                journal_file.write(result["path"] + "\n")
+            if on_progress:
+                on_progress(summary["processed"], len(files), time.perf_counter() - start, result)
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        summary["interrupted"] = True
+    finally:
+        pool.join()
+        if journal_file:
+            journal_file.close()
+
+    summary["elapsed"] = time.perf_counter() - start
+    summary["files_per_sec"] = summary["processed"] / summary["elapsed"] if summary["elapsed"] else 0.0
+    if journal and not summary.get("interrupted"):
+        journal_path.unlink(missing_ok=True)
+    return summary
+
+def measure_batch_scaling(root, operation: str = "validate", max_workers: Optional[int] = None) -> List[tuple]:
+    """Mesure le débit (fichiers/s) pour 1, 2, 4... processus jusqu'au nombre de cœurs"""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({min(2 ** k, max_workers) for k in range(max_workers.bit_length() + 1)})
+    results = []
+    for count in counts:
+        summary = run_batch(root, operation, workers=count, journal=False)
+        results.append((count, summary["files_per_sec"], summary["processed"]))
+    return results
+
+def run_batch_cli(args):
+    """Point d'entrée de --batch : affiche la progression en continu puis le bilan"""
+    last_report = [0.0]
+
+    def on_progress(processed, total, elapsed, result):
+        if not result["ok"]:
+            print(f"❌ {result['path']}: {'; '.join(result['errors'][:3])}")
+        if elapsed - last_report[0] >= 0.5 or processed == total:
+            last_report[0] = elapsed
+            print(f"📦 {processed}/{total} fichiers | {processed / max(elapsed, 1e-9):.0f} fichiers/s", flush=True)
+
+    if args.batch_scaling:
+        print(f"📈 Débit de '{args.batch_op}' selon le nombre de processus:")
+        baseline = None
+        for workers, rate, processed in measure_batch_scaling(args.batch, args.batch_op, args.workers):
+            baseline = baseline or rate
+            print(f"   {workers:3d} processus: {rate:8.0f} fichiers/s (x{rate / baseline if baseline else 0:.2f}, {processed} fichiers)")
+        return True
+
+    summary = run_batch(args.batch, args.batch_op, args.workers, args.format, args.output,
+                        args.resume, on_progress=on_progress)
+    status = "interrompu (relancer avec --resume)" if summary.get("interrupted") else "terminé"
+    print(f"🏁 {args.batch_op} {status}: {summary['processed']} traités, {summary['failed']} en erreur, "
+          f"{summary['skipped']} déjà faits | {summary['files_per_sec']:.0f} fichiers/s "
+          f"avec {summary['workers']} processus")
+    return summary["failed"] == 0 and not summary.get("interrupted")
+
+def fidelity_events(actions: List[MacroAction]) -> List[tuple]:
+    """Flux canonique (t, signature, x, y) de ce qu'injecte une macro
+
+    S'applique aussi aux actions capturées par le recorder pendant une lecture :
+    seuls les événements injectés par le player (clic pressé, touche pressée) sont retenus.
+    """
+    events = []
+    for action in actions:
+        data = action.data
+        if action.action_type == "mouse_move":
+            events.append((action.timestamp, "move", data["x"], data["y"]))
+        elif action.action_type == "mouse_click" and data.get("pressed", True):
+            button = "left" if data.get("button") == "gauche" else "right"
+            events.append((action.timestamp, "click:" + button, data["x"], data["y"]))
+        elif action.action_type == "scroll":
+            events.append((action.timestamp, "scroll:" + ("up" if data["dy"] > 0 else "down"), data["x"], data["y"]))
+        elif action.action_type == "key_press":
+            key = MacroPlayer._key_name(data["key"])
+            if key:
+                events.append((action.timestamp, "key:" + key, None, None))
+        elif action.action_type == "text_input":
+            events.extend((action.timestamp, "key:" + char, None, None) for char in data["text"])
+    return events
+
+def fidelity_events_from_backend(events: List[tuple]) -> List[tuple]:
+    """Flux canonique des événements d'un RecordingBackend (hors restauration d'état)"""
+    canonical = []
+    for t, op, args in events:
+        if op == "move_to":
+            canonical.append((t, "move", args[0], args[1]))
+        elif op == "click":
+            canonical.append((t, "click:" + args[2], args[0], args[1]))
+        elif op == "scroll":
+            canonical.append((t, "scroll:" + ("up" if args[0] > 0 else "down"), args[1], args[2]))
+        elif op == "press":
+            canonical.append((t, "key:" + args[0], None, None))
+        elif op == "type_text":
+            canonical.extend((t, "key:" + char, None, None) for char in args[0])
+    return canonical
+
+@dataclass
+class FidelityReport:
+    """Écart entre le flux attendu d'une macro et le flux réellement injecté"""
+    expected: int = 0
+    captured: int = 0
+    matched: int = 0
+    missed: int = 0
+    extra: int = 0
+    missed_by_kind: Dict[str, int] = field(default_factory=dict)
+    first_missed: List[int] = field(default_factory=list)
+    position_error_mean: float = 0.0
+    position_error_max: float = 0.0
+    timing_offset_ms: float = 0.0
+    timing_error_mean_ms: float = 0.0
+    timing_error_p95_ms: float = 0.0
+    timing_error_max_ms: float = 0.0
+    align_ms: float = 0.0
+
+    def passed(self, max_position_px: float = 2.0, max_timing_ms: float = 50.0, ignore_moves: bool = False) -> bool:
+        missed = self.missed - (self.missed_by_kind.get("move", 0) if ignore_moves else 0)
+        return (missed == 0 and self.position_error_max <= max_position_px
+                and self.timing_error_p95_ms <= max_timing_ms)
+
+    def summary(self) -> str:
+        return (f"{self.matched}/{self.expected} événements alignés, {self.missed} manqués, {self.extra} en trop | "
+                f"position moy {self.position_error_mean:.1f}px max {self.position_error_max:.1f}px | "
+                f"timing moy {self.timing_error_mean_ms:.1f}ms p95 {self.timing_error_p95_ms:.1f}ms "
+                f"max {self.timing_error_max_ms:.1f}ms")
+
+def _fidelity_match_cost(expected: tuple, captured: tuple, match_px: float) -> Optional[float]:
+    """Coût d'appariement de deux événements (None si signatures différentes)"""
+    if expected[1] != captured[1]:
+        return None
+    if expected[2] is None:
+        return 0.0
+    return math.hypot(captured[2] - expected[2], captured[3] - expected[3]) / (4.0 * match_px)
+
+def _align_block(expected: List[tuple], captured: List[tuple], i: int, j: int,
+                 window: int, match_px: float) -> List[tuple]:
+    """Alignement DTW en bande (distance d'édition) d'un bloc de `window` événements
+
+    Un événement manqué ou en trop coûte 1, un appariement son écart de position
+    normalisé. Retourne les opérations ("match" | "miss" | "extra", i, j) de la
+    première moitié du bloc (ou du bloc entier en fin de flux).
+    """
+    rows = min(window, len(expected) - i)
+    cols = min(window, len(captured) - j)
+    band = max(window // 2, abs(rows - cols))
+    infinity = float("inf")
+    cost = [[infinity] * (cols + 1) for _ in range(rows + 1)]
+    back = [[None] * (cols + 1) for _ in range(rows + 1)]
+    cost[0][0] = 0.0
+
+    for r in range(rows + 1):
+        for c in range(max(0, r - band), min(cols, r + band) + 1):
+            if r == 0 and c == 0:
+                continue
+            best, move = infinity, None
+            if r and cost[r - 1][c] + 1.0 < best:
+                best, move = cost[r - 1][c] + 1.0, "miss"
+            if c and cost[r][c - 1] + 1.0 < best:
+                best, move = cost[r][c - 1] + 1.0, "extra"
+            if r and c:
+                match = _fidelity_match_cost(expected[i + r - 1], captured[j + c - 1], match_px)
+                if match is not None and cost[r - 1][c - 1] + match < best:
+                    best, move = cost[r - 1][c - 1] + match, "match"
+            cost[r][c], back[r][c] = best, move
+
+    c = min(range(cols + 1), key=lambda k: cost[rows][k])
+    r, path = rows, []
+    while r or c:
+        move = back[r][c]
+        path.append((move, i + r - 1, j + c - 1))
+        if move != "extra":
+            r -= 1
+        if move != "miss":
+            c -= 1
+    path.reverse()
+
+    if i + rows >= len(expected):
+        return path
+    half = i + max(1, rows // 2)
+    return [op for op in path if op[1] < half]
+
+def align_event_streams(expected: List[tuple], captured: List[tuple], speed: float = 1.0,
+                        window: int = 32, match_px: float = 2.0) -> FidelityReport:
+    """Aligne le flux capturé sur le flux attendu
+
+    Chemin rapide linéaire : tant que les deux curseurs pointent sur des événements de
+    même signature à moins de `match_px` pixels, ils avancent ensemble. À la première
+    divergence (événement perdu, doublon, écart de position), un DTW en bande est
+    calculé sur un bloc de `window` événements pour resynchroniser les curseurs. Le
+    coût total reste O(n) plus O(window²) par divergence. Le décalage de départ est
+    estimé par la médiane des écarts temporels des paires alignées.
+    """
+    start = time.perf_counter()
+    report = FidelityReport(expected=len(expected), captured=len(captured))
+    t0 = expected[0][0] if expected else 0.0
+    pairs = []
+    position_errors = []
+    i = j = 0
+
+    def commit(op, ei, cj):
+        if op == "match":
+            e, c = expected[ei], captured[cj]
+            pairs.append(((e[0] - t0) / speed, c[0]))
+            if e[2] is not None:
+                position_errors.append(math.hypot(c[2] - e[2], c[3] - e[3]))
+        elif op == "miss":
+            report.missed += 1
+            kind = expected[ei][1].split(":", 1)[0]
+            report.missed_by_kind[kind] = report.missed_by_kind.get(kind, 0) + 1
+            if len(report.first_missed) < 20:
+                report.first_missed.append(ei)
+        else:
+            report.extra += 1
+
+    while i < len(expected) and j < len(captured):
+        match = _fidelity_match_cost(expected[i], captured[j], match_px)
+        if match is not None and match <= 0.25:
+            commit("match", i, j)
+            i, j = i + 1, j + 1
+            continue
+
+        for op, ei, cj in _align_block(expected, captured, i, j, window, match_px):
+            commit(op, ei, cj)
+            # (ei, cj) = derniers événements consommés de chaque flux, quelle que soit l'opération
+            i, j = ei + 1, cj + 1
+
+    for ei in range(i, len(expected)):
+        commit("miss", ei, None)
+    report.extra += len(captured) - j
+    report.matched = len(pairs)
+
+    if position_errors:
+        report.position_error_mean = sum(position_errors) / len(position_errors)
+        report.position_error_max = max(position_errors)
+    if pairs:
+        offsets = sorted(c - e for e, c in pairs)
+        offset = offsets[len(offsets) // 2]
+        errors = sorted(abs(c - e - offset) * 1000.0 for e, c in pairs)
+        report.timing_offset_ms = offset * 1000.0
+        report.timing_error_mean_ms = sum(errors) / len(errors)
+        report.timing_error_p95_ms = errors[min(len(errors) - 1, int(len(errors) * 0.95))]
+        report.timing_error_max_ms = errors[-1]
+
+    report.align_ms = (time.perf_counter() - start) * 1000.0
+    return report
+
+FIDELITY_CAPTURES = ("backend", "listeners", "simulated")
+
+def verify_playback(actions: List[MacroAction], speed: float = 1.0, capture: str = "backend",
+                    match_px: float = 2.0) -> FidelityReport:
+    """Joue une macro en boucle fermée et compare le flux injecté à la macro source
+
+    capture="backend" : le player injecte dans un RecordingBackend (aucun effet sur le poste).
+    capture="listeners" : injection réelle, capturée par les listeners du recorder.
+    capture="simulated" : comme backend, en temps simulé (logique seule, instantané).
+    """
+    if capture not in FIDELITY_CAPTURES:
+        raise ValueError(f"Capture inconnue: {capture}")
+
+    if capture == "simulated":
+        player = simulate_playback(actions, speed)
+        captured = fidelity_events_from_backend(player.backend.events)
+        return align_event_streams(fidelity_events(actions), captured, player.speed_multiplier, match_px=match_px)
+
+    player = MacroPlayer()
+    player.set_actions(actions)
+    player.set_speed(speed)
+    player.set_loop_count(1)
+
+    if capture == "backend":
+        player.backend = RecordingBackend()
+        player.is_playing = True
+        player._play_loop()
+        captured = fidelity_events_from_backend(player.backend.events)
+    else:
+        recorder = MacroRecorder()
+        recorder.move_threshold = 0.0
+        if not recorder.start_recording():
+            raise RuntimeError("Impossible de démarrer la capture (pynput indisponible)")
+        try:
+            player.is_playing = True
+            player._play_loop()
+            time.sleep(0.2)  # laisse les listeners vider leur file d'événements
+        finally:
+            recorder.stop_recording()
+        # Le recorder horodate depuis son démarrage : seul l'ordre et les écarts comptent
+        captured = fidelity_events(recorder.actions)
+
+    return align_event_streams(fidelity_events(actions), captured, player.speed_multiplier, match_px=match_px)
+
+def run_verify_cli(args) -> bool:
+    """Point d'entrée de --verify : vérifie un fichier ou toutes les macros d'un dossier"""
+    path = Path(args.verify)
+    files = find_macro_files(path) if path.is_dir() else [str(path)]
+    results = []
+    failed = 0
+
+    for file_path in files:
+        try:
+            report = verify_playback(load_macro_file(file_path), args.speed, args.verify_capture, args.tolerance_px)
+            ok = report.passed(args.tolerance_px, args.tolerance_ms, ignore_moves=args.verify_capture == "listeners")
+            print(f"{'✅' if ok else '❌'} {file_path}: {report.summary()} | alignement {report.align_ms:.0f}ms", flush=True)
+            results.append({"path": file_path, "ok": ok, **asdict(report)})
+        except Exception as e:
+            ok = False
+            print(f"❌ {file_path}: {e}", flush=True)
+            results.append({"path": file_path, "ok": False, "error": str(e)})
+        failed += not ok
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    print(f"🏁 Vérification: {len(files) - failed}/{len(files)} macros fidèles")
+    return failed == 0
+
+COMPILE_TARGETS = ("python", "xdotool")
+
+def compile_schedule(actions: List[MacroAction], speed: float = 1.0) -> List[tuple]:
+    """Programme d'injection précalculé (instant, opération, arguments), avec la sémantique du player
+
+    Les scrolls nuls (sans effet) sont omis.
+    """
+    speed = max(0.1, min(10.0, speed))
+    steps, t = [], 0.0
+    for i, action in enumerate(actions):
+        if i:
+            t += max(0.0, action.timestamp - actions[i - 1].timestamp) / speed
+        data = action.data
+        if action.action_type == "mouse_click" and data.get("pressed", True):
+            steps.append((round(t, 6), "click", (data["x"], data["y"], "left" if data.get("button") == "gauche" else "right")))
+        elif action.action_type == "mouse_move":
+            steps.append((round(t, 6), "move_to", (data["x"], data["y"])))
+        elif action.action_type == "key_press":
+            key = MacroPlayer._key_name(data["key"])
+            if key:
+                steps.append((round(t, 6), "press", (key,)))
+        elif action.action_type == "scroll" and data["dy"]:
+            steps.append((round(t, 6), "scroll", (data["dy"], data["x"], data["y"])))
+        elif action.action_type == "text_input" and data["text"]:
+            steps.append((round(t, 6), "type_text", (data["text"], data.get("rate"))))
+    return steps
+
+def batch_schedule(steps: List[tuple]) -> List[tuple]:
+    """Regroupe les mouvements et les frappes consécutifs : [(opération, [(instant, *arguments), ...]), ...]"""
+    batches = []
+    for t, op, args in steps:
+        if batches and batches[-1][0] == op and op in ("move_to", "press"):
+            batches[-1][1].append((t, *args))
+        else:
+            batches.append((op, [(t, *args)]))
+    return batches
+
+_PYTHON_SCRIPT_HEADER = '''#!/usr/bin/env python3
+"""Macro compilée par Macro Recorder Pro - {count} étapes, {duration:.2f}s
+
+Script autonome : seul pyautogui est nécessaire (importé au lancement uniquement).
+Usage: python {name}
+"""
+import time
+
+# (opération, ((instant, *arguments), ...)) - instants en secondes depuis le début
+BATCHES = (
+'''
+
+_PYTHON_SCRIPT_FOOTER = ''')
+
+
+def run(api, clock=time.perf_counter, sleep=time.sleep):
+    start = clock()
+
+    def wait(t):
+        delay = start + t - clock()
+        if delay > 0:
+            sleep(delay)
+
+    for op, steps in BATCHES:
+        if op == "move_to":
+            for t, x, y in steps:
+                wait(t)
+                api.moveTo(x, y)
+        elif op == "press":
+            for t, key in steps:
+                wait(t)
+                api.press(key)
+        elif op == "click":
+            for t, x, y, button in steps:
+                wait(t)
+                api.click(x, y, button=button)
+        elif op == "scroll":
+            for t, dy, x, y in steps:
+                wait(t)
+                api.scroll(dy, x=x, y=y)
+        elif op == "type_text":
+            for t, text, rate in steps:
+                wait(t)
+                api.write(text, interval=1.0 / rate if rate else 0.0)
+
+
+if __name__ == "__main__":
+    import pyautogui
+    pyautogui.FAILSAFE = True
+    pyautogui.PAUSE = 0
+    run(pyautogui)
+'''
+
+# Noms de keysyms X11 des touches produites par MacroPlayer._key_name
+XDOTOOL_KEYS = {
+    "enter": "Return", "tab": "Tab", "backspace": "BackSpace", "delete": "Delete",
+    "shift": "shift", "ctrl": "ctrl", "alt": "alt", " ": "space",
+    ".": "period", ",": "comma", "/": "slash", "\\": "backslash", "-": "minus", "+": "plus",
+    "=": "equal", "_": "underscore", "'": "apostrophe", '"': "quotedbl", ";": "semicolon",
+    ":": "colon", "!": "exclam", "?": "question", "@": "at", "#": "numbersign", "$": "dollar",
+    "%": "percent", "&": "ampersand", "*": "asterisk", "(": "parenleft", ")": "parenright",
+    "[": "bracketleft", "]": "bracketright", "{": "braceleft", "}": "braceright", "|": "bar",
+    "<": "less", ">": "greater", "`": "grave", "~": "asciitilde", "^": "asciicircum",
+}
+XDOTOOL_KEY_BATCH_JITTER = 0.005
+
+def _xdotool_key(key: str) -> Optional[str]:
+    if key in XDOTOOL_KEYS:
+        return XDOTOOL_KEYS[key]
+    return key if key.isascii() and key.isalnum() else None
+
+def compile_macro(actions: List[MacroAction], target: str = "python", speed: float = 1.0,
+                  name: str = "macro") -> str:
+    """Compile une macro en script autonome (python/pyautogui ou fichier xdotool)"""
+    if target not in COMPILE_TARGETS:
+        raise ValueError(f"Cible inconnue: {target}")
+    steps = compile_schedule(actions, speed)
+    batches = batch_schedule(steps)
+
+    if target == "python":
+        duration = steps[-1][0] if steps else 0.0
+        lines = [_PYTHON_SCRIPT_HEADER.format(count=len(steps), duration=duration, name=name)]
+        lines.extend(f"    ({op!r}, {tuple(batch)!r}),\n" for op, batch in batches)
+        lines.append(_PYTHON_SCRIPT_FOOTER)
+        return "".join(lines)
+
+    # xdotool : pauses relatives calculées à partir des instants absolus arrondis à la ms
+    lines = ["#!/usr/bin/xdotool", f"# Macro compilée par Macro Recorder Pro - {len(steps)} étapes"]
+    emitted = 0.0
+
+    def sleep_until(t):
+        nonlocal emitted
+        t = round(t, 3)
+        if t > emitted:
+            lines.append(f"sleep {t - emitted:.3f}")
+            emitted = t
+
+    for op, batch in batches:
+        if op == "press":
+            names = [_xdotool_key(key) for _, key in batch]
+            gaps = [b[0] - a[0] for a, b in zip(batch, batch[1:])]
+            mean = sum(gaps) / len(gaps) if gaps else 0.0
+            if len(batch) > 1 and all(names) and all(abs(g - mean) <= XDOTOOL_KEY_BATCH_JITTER for g in gaps):
+                sleep_until(batch[0][0])
+                delay_ms = round(mean * 1000)
+                lines.append(f"key --delay {delay_ms} " + " ".join(names))
+                emitted += (len(batch) - 1) * delay_ms / 1000.0
+                continue
+            for (t, key), key_name in zip(batch, names):
+                sleep_until(t)
+                lines.append(f"key {key_name}" if key_name else f"type {shlex.quote(key)}")
+        else:
+            for t, *args in batch:
+                sleep_until(t)
+                if op == "move_to":
+                    lines.append(f"mousemove {args[0]} {args[1]}")
+                elif op == "click":
+                    lines.append(f"mousemove {args[0]} {args[1]} click {1 if args[2] == 'left' else 3}")
+                elif op == "type_text":
+                    # Arguments entre quotes shell ; un retour à la ligne devient "key Return"
+                    delay_ms = round(1000.0 / args[1]) if args[1] else 0
+                    for k, part in enumerate(args[0].split("\n")):
+                        if k:
+                            lines.append("key Return")
+                        if part:
+                            lines.append(f"type --delay {delay_ms} {shlex.quote(part)}")
+                else:
+                    dy, x, y = args
+                    lines.append(f"mousemove {x} {y} click --repeat {abs(dy)} {4 if dy > 0 else 5}")
+    return "\n".join(lines) + "\n"
+
+class _PyAutoGuiRecorder:
+    """Façade pyautogui (moveTo, click, press, scroll, write) qui enregistre dans un RecordingBackend"""
+
+    def __init__(self, backend: RecordingBackend):
+        self.backend = backend
+
+    def moveTo(self, x, y):
+        self.backend.move_to(x, y)
+
+    def click(self, x, y, button="left"):
+        self.backend.click(x, y, button)
+
+    def press(self, key):
+        self.backend.press(key)
+
+    def scroll(self, dy, x=None, y=None):
+        self.backend.scroll(dy, x, y)
+
+    def write(self, text, interval=0.0):
+        self.backend.type_text(text, 1.0 / interval if interval else None)
+
+def replay_xdotool_script(source: str, backend, sleep):
+    """Interprète un fichier xdotool généré par compile_macro dans un backend
+
+    Les arguments sont découpés comme par un shell (shlex.split) : ce qui est vérifié est
+    ce que recevrait xdotool, pas un encodage propre au compilateur.
+    """
+    reverse_keys = {name: key for key, name in XDOTOOL_KEYS.items()}
+    for line in source.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        command, *args = shlex.split(line)
+        if command == "sleep":
+            sleep(float(args[0]))
+        elif command == "type" and args[0] == "--delay":
+            delay_ms = int(args[1])
+            backend.type_text(args[2], 1000.0 / delay_ms if delay_ms else None)
+        elif command == "type":
+            backend.press(args[0])
+        elif command == "key":
+            keys, delay = args, 0.0
+            if args[0] == "--delay":
+                delay, keys = int(args[1]) / 1000.0, args[2:]
+            for k, name in enumerate(keys):
+                if k:
+                    sleep(delay)
+                backend.press(reverse_keys.get(name, name))
+        elif command == "mousemove":
+            x, y = int(args[0]), int(args[1])
+            if len(args) == 2:
+                backend.move_to(x, y)
+            elif args[3] == "--repeat":
+                count, button = int(args[4]), args[5]
+                backend.scroll(count if button == "4" else -count, x, y)
+            else:
+                backend.click(x, y, "left" if args[3] == "1" else "right")
+        else:
+            raise ValueError(f"Commande xdotool inattendue: {line}")
+
+def verify_compiled(actions: List[MacroAction], source: str, target: str, speed: float = 1.0) -> Dict[str, Any]:
+    """Preuve d'équivalence : rejoue la macro (player) et le script compilé dans des RecordingBackend
+    à horloge virtuelle, puis compare les flux d'événements (opérations, arguments, instants)"""
+    # Référence : le player exécute chaque action à son instant planifié
+    reference_backend = simulate_playback(actions, speed).backend
+    reference = [event for event in reference_backend.events if not (event[1] == "scroll" and event[2][0] == 0)]
+
+    clock = VirtualClock()
+    compiled_backend = RecordingBackend(clock=clock.now)
+    if target == "python":
+        namespace = {"__name__": "macro_compilee"}
+        exec(compile(source, "<macro compilée>", "exec"), namespace)
+        namespace["run"](_PyAutoGuiRecorder(compiled_backend), clock=clock.now, sleep=clock.sleep)
+    else:
+        replay_xdotool_script(source, compiled_backend, clock.sleep)
+    compiled = compiled_backend.events
+
+    def text_timing(event):
+        # Cadence de frappe comparée à la résolution de la cible (intervalle, ou délai en ms pour xdotool)
+        if event[1] != "type_text":
+            return [event]
+        text, rate = event[2]
+        if target == "python":
+            return [(event[0], "type_text", (text, round(1.0 / rate, 9) if rate else 0.0))]
+        # xdotool : chaque retour à la ligne est une touche Entrée entre deux segments de texte
+        delay_ms = round(1000.0 / rate) if rate else 0
+        events = []
+        for k, part in enumerate(text.split("\n")):
+            if k:
+                events.append((event[0], "press", ("enter",)))
+            if part:
+                events.append((event[0], "type_text", (part, delay_ms)))
+        return events
+
+    reference = [item for event in reference for item in text_timing(event)]
+    compiled = [item for event in compiled for item in text_timing(event)]
+
+    mismatch = None
+    max_error = 0.0
+    for k, (expected, actual) in enumerate(zip(reference, compiled)):
+        if expected[1:] != actual[1:]:
+            mismatch = k
+            break
+        max_error = max(max_error, abs(expected[0] - actual[0]))
+    if mismatch is None and len(reference) != len(compiled):
+        mismatch = min(len(reference), len(compiled))
+
+    tolerance = 0.001 if target == "python" else XDOTOOL_KEY_BATCH_JITTER + 0.001
+    return {
+        "equivalent": mismatch is None and max_error <= tolerance,
+        "events": len(reference),
+        "compiled_events": len(compiled),
+        "mismatch": mismatch,
+        "max_timing_error_ms": round(max_error * 1000.0, 3),
+    }
+
+def compile_macro_file(file_path, target: str = "python", output=None, speed: float = 1.0) -> Dict[str, Any]:
+    """Compile un fichier macro, écrit le script (exécutable) et vérifie son équivalence"""
+    actions = load_macro_file(file_path)
+    output = Path(output) if output else Path(file_path).with_suffix(".py" if target == "python" else ".xdo")
+    start = time.perf_counter()
+    source = compile_macro(actions, target, speed, output.name)
+    compile_ms = (time.perf_counter() - start) * 1000.0
+
+    output.write_text(source, encoding="utf-8")
+    output.chmod(0o755)
+    result = verify_compiled(actions, source, target, speed)
+    result.update(output=str(output), size=len(source.encode("utf-8")), compile_ms=round(compile_ms, 3))
+    return result
+
+# Codes numériques des types d'action (analyse vectorisée, tampons binaires)
+ACTION_TYPE_CODES = {"mouse_move": 0, "mouse_click": 1, "scroll": 2, "key_press": 3, "key_release": 4}
+ACTION_TYPE_NAMES = list(ACTION_TYPE_CODES) + ["autre"]
+
+class MacroAnalyzer:
+    """Statistiques vectorisées (NumPy) d'une macro : heatmaps, histogramme des délais, débit par type
+
+    Les actions sont converties une seule fois en colonnes NumPy ; tous les calculs
+    se font ensuite sur ces tableaux. Un instantané (ActionSnapshot) est reconnu par sa
+    génération et sa longueur sans relire les actions, et seules les actions ajoutées
+    depuis la dernière analyse de la même génération sont converties. Les listes
+    ordinaires sont mises en cache par empreinte du contenu.
+    """
+
+    IDLE_THRESHOLD = 1.0
+
+    def __init__(self, heatmap_bins=(64, 36), screen_size: Optional[tuple] = None, cache_size: int = 8):
+        self.heatmap_bins = heatmap_bins
+        self.screen_size = screen_size
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[Any, tuple]" = OrderedDict()  # clé -> (génération retenue, statistiques)
+        self._generation: Optional[tuple] = None  # (liste de génération, longueur, colonnes, codes des touches)
+
+    @staticmethod
+    def to_columns(actions: List[MacroAction], key_codes: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Convertit les actions en colonnes NumPy (type, temps, x, y, positionné, dy, pressé, code touche)
+
+        Les coordonnées peuvent être négatives (écran à gauche ou au-dessus du principal) :
+        l'absence de position est marquée par la colonne "positioned", pas par une valeur sentinelle.
+        """
+        n = len(actions)
+        other = len(ACTION_TYPE_CODES)
+        key_codes = {} if key_codes is None else key_codes  # codes déjà attribués (conversion incrémentale)
+        datas = [action.data for action in actions]
+        return {
+            "type": np.fromiter((ACTION_TYPE_CODES.get(a.action_type, other) for a in actions), np.int8, n),
+            "t": np.fromiter((a.timestamp for a in actions), np.float64, n),
+            "x": np.fromiter((d.get("x", 0) for d in datas), np.int32, n),
+            "y": np.fromiter((d.get("y", 0) for d in datas), np.int32, n),
+            "positioned": np.fromiter(("x" in d for d in datas), bool, n),
+            "dy": np.fromiter((d.get("dy", 0) for d in datas), np.int32, n),
+            "pressed": np.fromiter((d.get("pressed", True) for d in datas), bool, n),
+            "key": np.fromiter((key_codes.setdefault(d["key"], len(key_codes)) if "key" in d else -1
+                                for d in datas), np.int32, n),
+            "key_names": list(key_codes),
+        }
+
+    @staticmethod
+    def content_hash(columns: Dict[str, Any]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for name in ("type", "t", "x", "y", "positioned", "dy", "pressed", "key"):
+            digest.update(columns[name].tobytes())
+        digest.update("\0".join(columns["key_names"]).encode("utf-8"))
+        return digest.hexdigest()
+
+    def analyze(self, actions: List[MacroAction]) -> Dict[str, Any]:
+        """Retourne (depuis le cache si possible) les statistiques de la macro"""
+        base = actions.base if isinstance(actions, ActionSnapshot) else None
+        if base is not None:
+            # La génération est retenue dans l'entrée : son id ne peut pas être réutilisé
+            key = ("instantané", id(base), len(actions))
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key][1]
+            columns = self._snapshot_columns(actions)
+        else:
+            columns = self.to_columns(actions)
+            key = self.content_hash(columns)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key][1]
+
+        stats = self._compute(columns)
+        stats["hash"] = key if base is None else self.content_hash(columns)
+        self.cache[key] = (base, stats)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return stats
+
+    def _snapshot_columns(self, snapshot: ActionSnapshot) -> Dict[str, Any]:
+        """Colonnes d'un instantané : seules les actions ajoutées depuis la dernière analyse de la
+        même génération sont converties (une génération ne fait que croître)"""
+        base, n = snapshot.base, len(snapshot)
+        cached = self._generation
+        if cached is not None and cached[0] is base and cached[1] <= n:
+            _, done, columns, key_codes = cached
+            if done < n:
+                tail = self.to_columns(snapshot[done:n], key_codes)
+                columns = {name: np.concatenate((columns[name], tail[name])) for name in columns if name != "key_names"}
+                columns["key_names"] = tail["key_names"]
+        else:
+            key_codes = {}
+            columns = self.to_columns(snapshot, key_codes)
+        self._generation = (base, n, columns, key_codes)
+        return columns
+
+    def _compute(self, c: Dict[str, Any]) -> Dict[str, Any]:
+        types, t, x, y = c["type"], c["t"], c["x"], c["y"]
+        n = len(types)
+        duration = float(t.max() - t.min()) if n else 0.0
+
+        counts = np.bincount(types, minlength=len(ACTION_TYPE_NAMES)) if n else np.zeros(len(ACTION_TYPE_NAMES), int)
+        per_type = {
+            name: {"count": int(count), "per_sec": float(count / duration) if duration > 0 else 0.0}
+            for name, count in zip(ACTION_TYPE_NAMES, counts) if count
+        }
+
+        # Zone couverte : écran fourni (origine 0, 0) étendu à la boîte englobante des positions,
+        # qui peuvent sortir de l'écran principal (multi-écrans, coordonnées négatives)
+        positioned = c["positioned"]
+        left, top, right, bottom = (0, 0) + (tuple(self.screen_size) if self.screen_size else (1, 1))
+        if positioned.any():
+            xs, ys = x[positioned], y[positioned]
+            left, top = min(left, int(xs.min())), min(top, int(ys.min()))
+            right, bottom = max(right, int(xs.max()) + 1), max(bottom, int(ys.max()) + 1)
+        width, height = right - left, bottom - top
+        bins_x, bins_y = self.heatmap_bins
+        extent = [[left, right], [top, bottom]]
+
+        clicks = (types == ACTION_TYPE_CODES["mouse_click"]) & c["pressed"] & positioned
+        moves = (types == ACTION_TYPE_CODES["mouse_move"]) & positioned
+        click_heatmap = np.histogram2d(y[clicks], x[clicks], bins=(bins_y, bins_x), range=extent[::-1])[0]
+        move_heatmap = np.histogram2d(y[moves], x[moves], bins=(bins_y, bins_x), range=extent[::-1])[0]
+
+        # Délais entre événements (échelle logarithmique de 1 ms à la plus longue pause)
+        delays = np.diff(np.sort(t)) if n > 1 else np.zeros(0)
+        if delays.size:
+            upper = max(float(delays.max()), 0.002)
+            edges = np.concatenate(([0.0], np.geomspace(0.001, upper, 24)))
+            delay_hist = np.histogram(delays, bins=edges)[0]
+            percentiles = dict(zip(("p50", "p90", "p99"), np.percentile(delays, [50, 90, 99]).tolist()))
+            idle = delays[delays >= self.IDLE_THRESHOLD]
+        else:
+            edges, delay_hist, percentiles, idle = np.zeros(1), np.zeros(0, int), {}, np.zeros(0)
+
+        # Touches les plus fréquentes (pressions uniquement)
+        key_presses = c["key"][types == ACTION_TYPE_CODES["key_press"]]
+        top_keys = []
+        if key_presses.size:
+            key_counts = np.bincount(key_presses)
+            for code in np.argsort(key_counts)[::-1][:10]:
+                if key_counts[code]:
+                    name = c["key_names"][code].replace("Key.", "").replace("'", "")
+                    top_keys.append((name, int(key_counts[code])))
+
+        # Régions de l'écran (grille 3x3) : clics et mouvements par région
+        region_of = lambda mask: (np.clip((y[mask] - top) * 3 // height, 0, 2) * 3
+                                  + np.clip((x[mask] - left) * 3 // width, 0, 2))
+        regions = {
+            "clicks": np.bincount(region_of(clicks), minlength=9).reshape(3, 3).tolist(),
+            "moves": np.bincount(region_of(moves), minlength=9).reshape(3, 3).tolist(),
+        }
+
+        return {
+            "count": n,
+            "duration": duration,
+            "per_type": per_type,
+            "screen": (width, height),
+            "origin": (left, top),
+            "click_heatmap": click_heatmap,
+            "move_heatmap": move_heatmap,
+            "delay_edges": edges,
+            "delay_hist": delay_hist,
+            "delay_percentiles": percentiles,
+            "idle_time": float(idle.sum()),
+            "idle_count": int(idle.size),
+            "top_keys": top_keys,
+            "regions": regions,
+        }
+
 class ModernButton(QPushButton):
     """Bouton moderne avec thèmes"""
 
@@ -499,10 +6030,12 @@ class ModernListWidget(QListWidget):
             }}
         """)
 
-    def add_action(self, action: MacroAction):
-        text = f"{action.timestamp:6.2f}s | {action.get_display_text()}"
-
-        item = QListWidgetItem(text)
+    def _fill_item(self, item: QListWidgetItem, action: MacroAction):
+        sync = " 🔗" if action.data.get("sync") else ""
+        thumb = " 🖼️" if "thumb" in action.data else ""
+        window = f" 🪟 {action.data['window']['class']}" if "window" in action.data else ""
+        track = f" 🎚️ {action.data['track']}" if "track" in action.data and action.action_type != "marker" else ""
+        item.setText(f"{action.timestamp:6.2f}s | {action.get_display_text()}{sync}{thumb}{window}{track}")
         item.setData(Qt.ItemDataRole.UserRole, action)
 
         # Couleur selon le type d'action
@@ -513,9 +6046,30 @@ class ModernListWidget(QListWidget):
         elif action.action_type == "mouse_move":
             item.setForeground(QColor(self.theme['text_secondary']))
 
+    def add_action(self, action: MacroAction):
+        item = QListWidgetItem()
+        self._fill_item(item, action)
+
         self.addItem(item)
         self.scrollToBottom()
 
+    def insert_actions(self, row: int, actions: List[MacroAction]):
+        for offset, action in enumerate(actions):
+            item = QListWidgetItem()
+            self._fill_item(item, action)
+            self.insertItem(row + offset, item)
+
+    def remove_rows(self, start: int, end: int):
+        for row in range(end - 1, start - 1, -1):
+            self.takeItem(row)
+
+    def update_rows(self, start: int, actions: List[MacroAction]):
+        """Ne rafraîchit que les lignes modifiées"""
+        for offset, action in enumerate(actions):
+            item = self.item(start + offset)
+            if item is not None:
+                self._fill_item(item, action)
+
 class StatusLabel(QLabel):
     """Label de statut moderne avec thème"""
 
@@ -542,38 +6096,414 @@ class StatusLabel(QLabel):
 
         self.setStyleSheet(f"""
             QLabel {{
-                background-color: {bg_color};
-                color: {color};
-                border-radius: 15px;
-                padding: 6px 16px;
-                font-weight: 600;
-                font-size: 12px;
-                border: 2px solid {self.theme['border']};
+                background-color: {bg_color};
+                color: {color};
+                border-radius: 15px;
+                padding: 6px 16px;
+                font-weight: 600;
+                font-size: 12px;
+                border: 2px solid {self.theme['border']};
+            }}
+        """)
+
+    def set_recording(self):
+        self.current_status = "recording"
+        self.setText("🔴 Enregistrement en cours...")
+        self.setup_style()
+
+    def set_playing(self):
+        self.current_status = "playing"
+        self.setText("▶️ Lecture en cours...")
+        self.setup_style()
+
+    def set_stopped(self):
+        self.current_status = "stopped"
+        self.setText("⏸️ Arrêté")
+        self.setup_style()
+
+class TimelineSummary:
+    """Résumés multi-résolution (compte, premier et dernier index) par piste pour la timeline
+
+    Le niveau 0 découpe la durée de la macro en 2^k intervalles ; chaque niveau
+    suivant fusionne les intervalles deux à deux. Pour un zoom donné, on choisit
+    le niveau dont l'intervalle correspond à environ un pixel : le rendu ne
+    parcourt donc jamais plus de quelques centaines d'intervalles, quelle que
+    soit la longueur de la macro.
+    """
+
+    LANES = ("Mouvements", "Clics", "Touches", "Scroll")
+    LANE_OF_TYPE = (0, 1, 3, 2, 2, 2)  # index = code ACTION_TYPE_CODES (dernier = autre)
+    MAX_BINS = 1 << 18
+
+    def __init__(self, actions: List[MacroAction]):
+        n = len(actions)
+        self.count = n
+        self.times = np.fromiter((action.timestamp for action in actions), np.float64, n)
+        other = len(ACTION_TYPE_CODES)
+        types = np.fromiter((ACTION_TYPE_CODES.get(a.action_type, other) for a in actions), np.int8, n)
+        lanes = np.asarray(self.LANE_OF_TYPE, dtype=np.int8)[types]
+
+        self.start = float(self.times.min()) if n else 0.0
+        self.end = float(self.times.max()) if n else 0.0
+        bin_count = int(min(self.MAX_BINS, max(1024, 1 << max(n - 1, 1).bit_length())))
+        self.base_width = max(self.end - self.start, 1e-6) / bin_count
+
+        bins = np.minimum(((self.times - self.start) / self.base_width).astype(np.int64), bin_count - 1)
+        indices = np.arange(n, dtype=np.int32)
+
+        # levels[niveau][piste] = (comptes, premier index, dernier index)
+        self.levels: List[List[tuple]] = [[]]
+        for lane in range(len(self.LANES)):
+            mask = lanes == lane
+            lane_bins, lane_indices = bins[mask], indices[mask]
+            counts = np.bincount(lane_bins, minlength=bin_count).astype(np.int32)
+            first = np.full(bin_count, np.iinfo(np.int32).max, dtype=np.int32)
+            last = np.full(bin_count, -1, dtype=np.int32)
+            np.minimum.at(first, lane_bins, lane_indices)
+            np.maximum.at(last, lane_bins, lane_indices)
+            self.levels[0].append((counts, first, last))
+
+        while len(self.levels[-1][0][0]) > 1:
+            self.levels.append([
+                (counts[0::2] + counts[1::2], np.minimum(first[0::2], first[1::2]), np.maximum(last[0::2], last[1::2]))
+                for counts, first, last in self.levels[-1]
+            ])
+        self.peaks = [[max(int(counts.max()), 1) for counts, _, _ in level] for level in self.levels]
+
+    def level_for(self, seconds_per_pixel: float) -> int:
+        """Niveau le plus détaillé dont un intervalle couvre au moins un pixel"""
+        if seconds_per_pixel <= self.base_width:
+            return 0
+        level = int(math.log2(seconds_per_pixel / self.base_width))
+        return min(level, len(self.levels) - 1)
+
+    def bin_width(self, level: int) -> float:
+        return self.base_width * (1 << level)
+
+    def index_at(self, timestamp: float) -> int:
+        """Index de la première action à partir de `timestamp` (timestamps supposés croissants)"""
+        return int(min(np.searchsorted(self.times, timestamp), self.count - 1))
+
+class TimelineWidget(QWidget):
+    """Timeline zoomable par pistes (mouvements, clics, touches, scroll) pour les longues macros
+
+    Molette : zoom autour du curseur | glisser : déplacement | double-clic : vue complète
+    """
+
+    action_selected = pyqtSignal(int)
+
+    LANE_HEIGHT = 22
+    LABEL_WIDTH = 90
+
+    def __init__(self, theme=None):
+        super().__init__()
+        self.theme = theme or Theme.LIGHT
+        self.summary: Optional[TimelineSummary] = None
+        self.view_start = 0.0
+        self.view_end = 1.0
+        self.cursor_index = -1
+        self._drag_x = None
+        self._drag_moved = False
+        self.setMinimumHeight(self.LANE_HEIGHT * len(TimelineSummary.LANES) + 24)
+        self.setMouseTracking(False)
+
+    def set_theme(self, theme):
+        self.theme = theme
+        self.update()
+
+    def set_actions(self, actions: List[MacroAction]):
+        """Recalcule les résumés (coût O(n), une fois par macro et non à chaque rendu)"""
+        self.summary = TimelineSummary(actions) if actions else None
+        self.cursor_index = -1
+        self.reset_view()
+
+    def reset_view(self):
+        if self.summary:
+            margin = max(self.summary.end - self.summary.start, 1e-3) * 0.01
+            self.view_start = self.summary.start - margin
+            self.view_end = self.summary.end + margin
+        self.update()
+
+    def set_cursor(self, index: int):
+        """Place le curseur sur une action (sélection dans la liste ou action en cours de lecture)"""
+        if self.summary is None or not 0 <= index < self.summary.count:
+            return
+        self.cursor_index = index
+        timestamp = float(self.summary.times[index])
+        if not self.view_start <= timestamp <= self.view_end:
+            span = self.view_end - self.view_start
+            self.view_start = timestamp - span / 2
+            self.view_end = timestamp + span / 2
+        self.update()
+
+    # Conversions temps <-> pixels
+    def _plot_width(self):
+        return max(self.width() - self.LABEL_WIDTH - 8, 1)
+
+    def _time_to_x(self, timestamp):
+        return self.LABEL_WIDTH + (timestamp - self.view_start) / (self.view_end - self.view_start) * self._plot_width()
+
+    def _x_to_time(self, x):
+        return self.view_start + (x - self.LABEL_WIDTH) / self._plot_width() * (self.view_end - self.view_start)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(self.theme['list_bg']))
+        lane_colors = (self.theme['text_secondary'], self.theme['primary'], self.theme['success'], self.theme['warning'])
+
+        painter.setPen(QColor(self.theme['text_secondary']))
+        for lane, name in enumerate(TimelineSummary.LANES):
+            top = 4 + lane * self.LANE_HEIGHT
+            painter.drawText(QRectF(4, top, self.LABEL_WIDTH - 8, self.LANE_HEIGHT),
+                             Qt.AlignmentFlag.AlignVCenter, name)
+            painter.fillRect(QRectF(self.LABEL_WIDTH, top + self.LANE_HEIGHT - 1, self._plot_width(), 1),
+                             QColor(self.theme['border']))
+
+        summary = self.summary
+        if summary is not None:
+            seconds_per_pixel = (self.view_end - self.view_start) / self._plot_width()
+            level = summary.level_for(seconds_per_pixel)
+            width = summary.bin_width(level)
+            bin_count = len(summary.levels[level][0][0])
+            first_bin = max(int((self.view_start - summary.start) / width), 0)
+            last_bin = min(int((self.view_end - summary.start) / width) + 1, bin_count)
+
+            painter.setPen(Qt.PenStyle.NoPen)
+            pixels_per_bin = max(width / seconds_per_pixel, 1.0)
+            for lane, (counts, _, _) in enumerate(summary.levels[level]):
+                visible = counts[first_bin:last_bin]
+                nonzero = np.nonzero(visible)[0]
+                if not nonzero.size:
+                    continue
+
+                # Intensité quantifiée en 8 paliers : un seul drawRects par palier
+                peak = math.log1p(summary.peaks[level][lane])
+                shades = np.minimum((np.log1p(visible[nonzero]) / peak * 8).astype(np.int32), 7)
+                xs = self._time_to_x(summary.start + (first_bin + nonzero) * width)
+                color = QColor(lane_colors[lane])
+                top = 4 + lane * self.LANE_HEIGHT + 3
+                for shade in np.unique(shades).tolist():
+                    color.setAlpha(70 + 185 * (shade + 1) // 8)
+                    painter.setBrush(color)
+                    painter.drawRects([QRectF(x, top, pixels_per_bin, self.LANE_HEIGHT - 6)
+                                       for x in xs[shades == shade].tolist()])
+
+            if self.cursor_index >= 0:
+                x = self._time_to_x(float(summary.times[self.cursor_index]))
+                painter.fillRect(QRectF(x - 1, 0, 2, self.height()), QColor(self.theme['danger']))
+
+            painter.setPen(QColor(self.theme['text_secondary']))
+            bottom = self.height() - 4
+            painter.drawText(QPointF(self.LABEL_WIDTH, bottom), f"{max(self.view_start, 0):.2f}s")
+            painter.drawText(QPointF(self.width() - 70, bottom), f"{self.view_end:.2f}s")
+            painter.drawText(QPointF(self.LABEL_WIDTH + self._plot_width() / 2 - 40, bottom),
+                             f"niveau {level} · {summary.count} actions")
+        painter.end()
+
+    # Interactions
+    def wheelEvent(self, event):
+        if self.summary is None:
+            return
+        anchor = self._x_to_time(event.position().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        min_span = max(self.summary.base_width * 4, 1e-3)
+        span = max((self.view_end - self.view_start) * factor, min_span)
+        ratio = (anchor - self.view_start) / (self.view_end - self.view_start)
+        self.view_start = anchor - span * ratio
+        self.view_end = self.view_start + span
+        self.update()
+
+    def mousePressEvent(self, event):
+        self._drag_x = event.position().x()
+        self._drag_moved = False
+
+    def mouseMoveEvent(self, event):
+        if self._drag_x is None:
+            return
+        dx = event.position().x() - self._drag_x
+        if abs(dx) > 2:
+            self._drag_moved = True
+        shift = dx / self._plot_width() * (self.view_end - self.view_start)
+        self.view_start -= shift
+        self.view_end -= shift
+        self._drag_x = event.position().x()
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        if not self._drag_moved and self.summary is not None and event.position().x() > self.LABEL_WIDTH:
+            index = self.summary.index_at(self._x_to_time(event.position().x()))
+            self.set_cursor(index)
+            self.action_selected.emit(index)
+        self._drag_x = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+
+class HeatmapView(QLabel):
+    """Affichage d'une heatmap (tableau NumPy 2D) avec une échelle logarithmique"""
+
+    def __init__(self, theme=None):
+        super().__init__()
+        self.theme = theme or Theme.LIGHT
+        self.setMinimumSize(320, 180)
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self._image = None
+
+    def set_data(self, heatmap, color: str):
+        intensity = np.log1p(heatmap)
+        if intensity.max() > 0:
+            intensity = intensity / intensity.max()
+
+        base = QColor(self.theme['bg_secondary'])
+        hot = QColor(color)
+        rgba = np.empty(heatmap.shape + (4,), dtype=np.uint8)
+        for channel, (low, high) in enumerate(((base.red(), hot.red()), (base.green(), hot.green()),
+                                               (base.blue(), hot.blue()))):
+            rgba[..., channel] = (low + (high - low) * intensity).astype(np.uint8)
+        rgba[..., 3] = 255
+
+        height, width = heatmap.shape
+        # QImage ne copie pas le buffer : on garde une référence au tableau
+        self._buffer = np.ascontiguousarray(rgba)
+        self._image = QImage(self._buffer.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        self._update_pixmap()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_pixmap()
+
+    def _update_pixmap(self):
+        if self._image is not None:
+            self.setPixmap(QPixmap.fromImage(self._image).scaled(
+                self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation))
+
+class HistogramView(QWidget):
+    """Histogramme en barres des délais entre événements"""
+
+    def __init__(self, theme=None):
+        super().__init__()
+        self.theme = theme or Theme.LIGHT
+        self.counts = []
+        self.labels = []
+        self.setMinimumHeight(160)
+
+    def set_data(self, counts, edges):
+        self.counts = [int(c) for c in counts]
+        self.labels = [self._format_delay(edge) for edge in edges[1:]]
+        self.update()
+
+    @staticmethod
+    def _format_delay(seconds):
+        return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.1f}s"
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(self.theme['bg_secondary']))
+        if not self.counts:
+            painter.end()
+            return
+
+        margin = 20
+        width = self.width() - 2 * margin
+        height = self.height() - 2 * margin
+        bar_width = width / len(self.counts)
+        peak = max(self.counts) or 1
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(self.theme['primary']))
+        for i, count in enumerate(self.counts):
+            bar_height = height * count / peak
+            painter.drawRect(QRectF(margin + i * bar_width + 1, margin + height - bar_height,
+                                    max(bar_width - 2, 1), bar_height))
+
+        painter.setPen(QColor(self.theme['text_secondary']))
+        for i in (0, len(self.labels) // 2, len(self.labels) - 1):
+            painter.drawText(QPointF(margin + i * bar_width, self.height() - 4), self.labels[i])
+        painter.end()
+
+class AnalyticsDialog(QDialog):
+    """Panneau d'analyse d'une macro (heatmaps, délais, débit par type, touches)"""
+
+    def __init__(self, stats: Dict[str, Any], theme=None, parent=None):
+        super().__init__(parent)
+        self.theme = theme or Theme.LIGHT
+        self.setWindowTitle("📊 Analyse de la macro")
+        self.resize(900, 650)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+
+        percentiles = stats["delay_percentiles"]
+        summary = QLabel(
+            f"<b>{stats['count']}</b> actions sur <b>{stats['duration']:.1f}s</b> | "
+            f"inactivité ≥ {MacroAnalyzer.IDLE_THRESHOLD:.0f}s: {stats['idle_count']} pauses, "
+            f"{stats['idle_time']:.1f}s | délais p50 {percentiles.get('p50', 0) * 1000:.0f} ms, "
+            f"p90 {percentiles.get('p90', 0) * 1000:.0f} ms, p99 {percentiles.get('p99', 0) * 1000:.0f} ms"
+        )
+        summary.setWordWrap(True)
+        layout.addWidget(summary)
+
+        heatmaps = QHBoxLayout()
+        for title, key, color in (("🖱️ Clics", "click_heatmap", self.theme['danger']),
+                                  ("↗️ Mouvements", "move_heatmap", self.theme['primary'])):
+            group = ModernGroupBox(title, self.theme)
+            group_layout = QVBoxLayout(group)
+            view = HeatmapView(self.theme)
+            view.set_data(stats[key], color)
+            group_layout.addWidget(view)
+            heatmaps.addWidget(group)
+        layout.addLayout(heatmaps)
+
+        bottom = QHBoxLayout()
+        delay_group = ModernGroupBox("⏱️ Délais entre événements", self.theme)
+        delay_layout = QVBoxLayout(delay_group)
+        histogram = HistogramView(self.theme)
+        histogram.set_data(stats["delay_hist"], stats["delay_edges"])
+        delay_layout.addWidget(histogram)
+        bottom.addWidget(delay_group, 2)
+
+        details_group = ModernGroupBox("📈 Débit et touches", self.theme)
+        details_layout = QVBoxLayout(details_group)
+        lines = [f"{name}: {info['count']} ({info['per_sec']:.1f}/s)" for name, info in stats["per_type"].items()]
+        if stats["top_keys"]:
+            lines.append("")
+            lines.append("Touches: " + ", ".join(f"{key} ×{count}" for key, count in stats["top_keys"]))
+        clicks = stats["regions"]["clicks"]
+        lines.append("")
+        lines.append("Clics par région (3×3): " + " / ".join(" ".join(str(v) for v in row) for row in clicks))
+        details = QLabel("\n".join(lines))
+        details.setWordWrap(True)
+        details.setAlignment(Qt.AlignmentFlag.AlignTop)
+        details_layout.addWidget(details)
+        bottom.addWidget(details_group, 1)
+        layout.addLayout(bottom)
+
+        self.setStyleSheet(f"""
+            QDialog {{
+                background-color: {self.theme['bg_primary']};
+                color: {self.theme['text_primary']};
+            }}
+            QLabel {{
+                color: {self.theme['text_primary']};
+                font-size: 13px;
             }}
         """)
 
-    def set_recording(self):
-        self.current_status = "recording"
-        self.setText("🔴 Enregistrement en cours...")
-        self.setup_style()
-
-    def set_playing(self):
-        self.current_status = "playing"
-        self.setText("▶️ Lecture en cours...")
-        self.setup_style()
-
-    def set_stopped(self):
-        self.current_status = "stopped"
-        self.setText("⏸️ Arrêté")
-        self.setup_style()
-
 class MacroRecorderUI(QMainWindow):
     """Interface utilisateur principale redesignée"""
 
     def __init__(self):
         super().__init__()
-        self.recorder = MacroRecorder()
-        self.player = MacroPlayer()
+        self.tracer = PerfTracer()
+        self.metrics = MetricsRegistry()
+        self.metrics_exporter: Optional[MetricsExporter] = None
+        self.recorder = MacroRecorder(self.tracer, self.metrics)
+        self.player = MacroPlayer(self.tracer, self.metrics)
+        self.analyzer = MacroAnalyzer() if NUMPY_AVAILABLE else None
+        self.editor = MacroEditor()
+        self._actions_dirty = False
+        self._marker_count = 0
+        self.thumb_store: Optional[ThumbnailStore] = None
         self.current_macro_file = None
         self.current_theme = Theme.LIGHT
         self.is_dark_mode = False
@@ -691,8 +6621,13 @@ class MacroRecorderUI(QMainWindow):
         self.stop_record_btn = ModernButton("⏹️ Arrêter", danger=True, theme=self.current_theme)
         self.stop_record_btn.setEnabled(False)
 
+        self.mark_btn = ModernButton("📍 Marqueur", theme=self.current_theme)
+        self.mark_btn.setToolTip("Ajoute un marqueur à la chronologie de l'enregistrement en cours")
+        self.mark_btn.setEnabled(False)
+
         record_layout.addWidget(self.record_btn)
         record_layout.addWidget(self.stop_record_btn)
+        record_layout.addWidget(self.mark_btn)
 
         # Groupe Lecture
         playback_group = ModernGroupBox("▶️ Lecture", self.current_theme)
@@ -716,10 +6651,16 @@ class MacroRecorderUI(QMainWindow):
         self.new_btn = ModernButton("🆕 Nouveau", theme=self.current_theme)
         self.open_btn = ModernButton("📂 Ouvrir", theme=self.current_theme)
         self.save_btn = ModernButton("💾 Sauvegarder", theme=self.current_theme)
+        self.compile_btn = ModernButton("📦 Compiler", theme=self.current_theme)
+        self.compile_btn.setToolTip("Exporte la macro en script autonome (Python/pyautogui ou xdotool)")
+        self.stream_btn = ModernButton("📼 Lire depuis le disque", theme=self.current_theme)
+        self.stream_btn.setToolTip("Joue un fichier .jsonl/.mseg en continu sans le charger (mémoire constante)")
 
         file_layout.addWidget(self.new_btn)
         file_layout.addWidget(self.open_btn)
         file_layout.addWidget(self.save_btn)
+        file_layout.addWidget(self.compile_btn)
+        file_layout.addWidget(self.stream_btn)
 
         controls_layout.addWidget(record_group)
         controls_layout.addWidget(playback_group)
@@ -760,7 +6701,13 @@ class MacroRecorderUI(QMainWindow):
 
         list_header.addWidget(actions_title)
         list_header.addStretch()
+        self.analyze_btn = ModernButton("📊 Analyser", theme=self.current_theme)
+        self.analyze_btn.setEnabled(NUMPY_AVAILABLE)
+        if not NUMPY_AVAILABLE:
+            self.analyze_btn.setToolTip("Installez numpy pour l'analyse des macros")
+
         list_header.addWidget(self.actions_info)
+        list_header.addWidget(self.analyze_btn)
         list_header.addWidget(self.clear_btn)
 
         left_layout.addLayout(list_header)
@@ -768,8 +6715,22 @@ class MacroRecorderUI(QMainWindow):
         # Liste des actions
         self.action_list = ModernListWidget(self.current_theme)
         self.action_list.setMinimumHeight(300)
+        self.action_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.action_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         left_layout.addWidget(self.action_list)
 
+        # Vignette de l'action courante (chargée à la demande)
+        self.thumb_preview = QLabel()
+        self.thumb_preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.thumb_preview.setToolTip("Écran autour de l'action au moment de l'enregistrement")
+        self.thumb_preview.hide()
+        left_layout.addWidget(self.thumb_preview)
+
+        # Timeline zoomable (nécessite numpy pour les résumés multi-résolution)
+        self.timeline = TimelineWidget(self.current_theme) if NUMPY_AVAILABLE else None
+        if self.timeline:
+            left_layout.addWidget(self.timeline)
+
         # Zone droite - Paramètres
         right_widget = QWidget()
         right_layout = QVBoxLayout(right_widget)
@@ -815,8 +6776,121 @@ class MacroRecorderUI(QMainWindow):
         """)
         settings_layout.addWidget(self.repeat_spin, 2, 1)
 
+        # Traçage des performances
+        self.trace_check = QCheckBox("🔬 Tracer les performances")
+        self.trace_check.setStyleSheet("font-size: 13px;")
+        settings_layout.addWidget(self.trace_check, 3, 0)
+
+        self.export_trace_btn = ModernButton("📤 Exporter la trace", theme=self.current_theme)
+        self.export_trace_btn.setEnabled(False)
+        settings_layout.addWidget(self.export_trace_btn, 3, 1)
+
+        # Enregistreur de vol
+        self.flight_check = QCheckBox("✈️ Enregistreur de vol (F12)")
+        self.flight_check.setStyleSheet("font-size: 13px;")
+        settings_layout.addWidget(self.flight_check, 4, 0)
+
+        self.flight_seconds_spin = QSpinBox()
+        self.flight_seconds_spin.setRange(5, 3600)
+        self.flight_seconds_spin.setValue(120)
+        self.flight_seconds_spin.setSuffix(" s")
+        self.flight_seconds_spin.setToolTip("Durée capturée lors d'un instantané")
+        settings_layout.addWidget(self.flight_seconds_spin, 4, 1)
+
+        # Mode rapide (points de synchronisation)
+        self.fast_check = QCheckBox("⚡ Mode rapide (points de synchro)")
+        self.fast_check.setStyleSheet("font-size: 13px;")
+        self.fast_check.setToolTip("Supprime les pauses enregistrées et n'attend qu'aux points de synchronisation")
+        settings_layout.addWidget(self.fast_check, 5, 0)
+
+        self.sync_gap_spin = QDoubleSpinBox()
+        self.sync_gap_spin.setRange(0.1, 60.0)
+        self.sync_gap_spin.setValue(0.5)
+        self.sync_gap_spin.setSingleStep(0.1)
+        self.sync_gap_spin.setSuffix(" s")
+        self.sync_gap_spin.setToolTip("Pause minimale après un clic ou Entrée pour détecter un point de synchro")
+        settings_layout.addWidget(self.sync_gap_spin, 5, 1)
+
+        # Capture hors processus
+        self.capture_process_check = QCheckBox("🧵 Capture dans un processus séparé")
+        self.capture_process_check.setStyleSheet("font-size: 13px;")
+        self.capture_process_check.setToolTip("Les listeners tournent hors de l'interface : pas de latence quand l'UI est occupée")
+        settings_layout.addWidget(self.capture_process_check, 6, 0, 1, 2)
+
+        # Saisie de texte
+        self.group_text_check = QCheckBox("🔤 Regrouper la saisie en actions texte")
+        self.group_text_check.setStyleSheet("font-size: 13px;")
+        self.group_text_check.setToolTip("Les suites de frappes sont rejouées d'un bloc (XTest, presse-papiers ou cadence fixe)")
+        settings_layout.addWidget(self.group_text_check, 7, 0, 1, 2)
+
+        # Vignettes de contexte
+        self.thumbnails_check = QCheckBox("🖼️ Vignettes autour des clics et de la saisie")
+        self.thumbnails_check.setStyleSheet("font-size: 13px;")
+        self.thumbnails_check.setToolTip("Capturées en arrière-plan (budget CPU 5 %, 8 Mo), enregistrées dans <macro>.thumbs")
+        settings_layout.addWidget(self.thumbnails_check, 8, 0, 1, 2)
+
+        # Coordonnées relatives aux fenêtres
+        self.window_relative_check = QCheckBox("🪟 Coordonnées relatives aux fenêtres")
+        self.window_relative_check.setStyleSheet("font-size: 13px;")
+        self.window_relative_check.setToolTip("Clics rejoués dans la fenêtre d'origine même si elle a bougé (X11, python-xlib)")
+        settings_layout.addWidget(self.window_relative_check, 9, 0, 1, 2)
+
+        # Portée de l'enregistrement
+        self.scope_check = QCheckBox("🎯 Ignorer F9/F10/F12 et les fenêtres de l'enregistreur")
+        self.scope_check.setStyleSheet("font-size: 13px;")
+        self.scope_check.setChecked(True)
+        self.scope_check.setToolTip("Les événements hors portée sont abandonnés dès leur capture. Les clics sur les "
+                                    "fenêtres de l'enregistreur ne sont ignorés qu'avec les coordonnées relatives "
+                                    "aux fenêtres (suivi X11 de l'empilement)")
+        settings_layout.addWidget(self.scope_check, 10, 0, 1, 2)
+
+        self.scope_keys_edit = QLineEdit()
+        self.scope_keys_edit.setPlaceholderText("Touches exclues: <ctrl>+r, <f8>")
+        self.scope_keys_edit.setToolTip("Touches ou raccourcis jamais enregistrés (syntaxe pynput, séparés par des virgules)")
+        settings_layout.addWidget(self.scope_keys_edit, 11, 0)
+
+        self.scope_window_edit = QLineEdit()
+        self.scope_window_edit.setPlaceholderText("Fenêtre cible (classe)")
+        self.scope_window_edit.setToolTip("N'enregistre que la souris dans cette fenêtre (coordonnées relatives requises)")
+        settings_layout.addWidget(self.scope_window_edit, 11, 1)
+
+        # Humanisation des boucles
+        self.humanize_check = QCheckBox("🎲 Humaniser chaque boucle")
+        self.humanize_check.setStyleSheet("font-size: 13px;")
+        self.humanize_check.setToolTip("Délais, clics et trajectoires légèrement différents à chaque répétition (NumPy)")
+        self.humanize_check.setEnabled(NUMPY_AVAILABLE)
+        settings_layout.addWidget(self.humanize_check, 12, 0)
+
+        self.humanize_seed_spin = QSpinBox()
+        self.humanize_seed_spin.setRange(0, 2**31 - 1)
+        self.humanize_seed_spin.setSpecialValueText("Graine aléatoire")
+        self.humanize_seed_spin.setToolTip("Une même graine rejoue exactement les mêmes variations")
+        settings_layout.addWidget(self.humanize_seed_spin, 12, 1)
+
+        # Enregistrement multipiste
+        self.multitrack_check = QCheckBox("🎚️ Multipiste (marqueurs, autres écrans)")
+        self.multitrack_check.setStyleSheet("font-size: 13px;")
+        self.multitrack_check.setToolTip("Une piste bornée par source, fusionnées en une seule chronologie")
+        settings_layout.addWidget(self.multitrack_check, 13, 0)
+
+        self.displays_edit = QLineEdit()
+        self.displays_edit.setPlaceholderText("Autres écrans X: :1, :2")
+        self.displays_edit.setToolTip("Écrans X supplémentaires enregistrés (extension RECORD, python-xlib)")
+        settings_layout.addWidget(self.displays_edit, 13, 1)
+
         right_layout.addWidget(settings_group)
 
+        # Télémétrie en direct
+        metrics_group = ModernGroupBox("📈 Télémétrie", self.current_theme)
+        metrics_layout = QVBoxLayout(metrics_group)
+        self.metrics_labels = {}
+        for key in ("recorder", "player", "process"):
+            label = QLabel("-")
+            label.setStyleSheet("font-size: 12px;")
+            metrics_layout.addWidget(label)
+            self.metrics_labels[key] = label
+        right_layout.addWidget(metrics_group)
+
         # Informations et raccourcis
         info_group = ModernGroupBox("ℹ️ Informations", self.current_theme)
         info_layout = QVBoxLayout(info_group)
@@ -825,9 +6899,11 @@ class MacroRecorderUI(QMainWindow):
         <b>Raccourcis clavier:</b><br>
         • F9 - Démarrer/Arrêter l'enregistrement<br>
         • F10 - Jouer/Arrêter la macro<br>
+        • Maj+F10 - Jouer la sélection / à partir de l'action courante<br>
         • Ctrl+N - Nouvelle macro<br>
         • Ctrl+O - Ouvrir un fichier<br>
-        • Ctrl+S - Sauvegarder<br><br>
+        • Ctrl+S - Sauvegarder<br>
+        • F12 - Capturer les dernières secondes (enregistreur de vol)<br><br>
 
         <b>Fonctionnalités:</b><br>
         • Capture des clics et mouvements souris<br>
@@ -872,6 +6948,7 @@ class MacroRecorderUI(QMainWindow):
         # Boutons d'enregistrement
         self.record_btn.clicked.connect(self.start_recording)
         self.stop_record_btn.clicked.connect(self.stop_recording)
+        self.mark_btn.clicked.connect(self.add_marker)
 
         # Boutons de lecture
         self.play_btn.clicked.connect(self.play_macro)
@@ -881,13 +6958,49 @@ class MacroRecorderUI(QMainWindow):
         self.new_btn.clicked.connect(self.new_macro)
         self.open_btn.clicked.connect(self.open_macro)
         self.save_btn.clicked.connect(self.save_macro)
+        self.compile_btn.clicked.connect(self.export_script)
+        self.stream_btn.clicked.connect(self.play_from_disk)
 
         # Autres boutons
         self.clear_btn.clicked.connect(self.clear_actions)
+        self.analyze_btn.clicked.connect(self.show_analytics)
+        self.action_list.customContextMenuRequested.connect(self.show_action_menu)
+
+        # Panneau de télémétrie rafraîchi à fréquence fixe
+        self._metrics_previous = None
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(self.METRICS_REFRESH_MS)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.metrics_timer.start()
+        self.refresh_metrics()
+
+        # Rafraîchissement différé de la timeline après édition
+        self.timeline_timer = QTimer(self)
+        self.timeline_timer.setSingleShot(True)
+        self.timeline_timer.setInterval(300)
+        self.timeline_timer.timeout.connect(self.refresh_timeline)
+
+        # Synchronisation liste <-> timeline
+        if self.timeline:
+            self.action_list.currentRowChanged.connect(self.timeline.set_cursor)
+            self.timeline.action_selected.connect(self.action_list.setCurrentRow)
 
         # Slider de vitesse
         self.speed_slider.valueChanged.connect(self.update_speed_display)
 
+        # Traçage
+        self.trace_check.toggled.connect(self.toggle_tracing)
+        self.export_trace_btn.clicked.connect(self.export_trace)
+
+        # Enregistreur de vol
+        self.flight_check.toggled.connect(self.toggle_flight_recording)
+        self.capture_process_check.toggled.connect(self.toggle_capture_process)
+        self.group_text_check.toggled.connect(lambda enabled: setattr(self.recorder, "group_text", enabled))
+        self.thumbnails_check.toggled.connect(self.toggle_thumbnails)
+        self.window_relative_check.toggled.connect(self.toggle_window_relative)
+        self.action_list.currentRowChanged.connect(self.show_thumbnail)
+        self.recorder.flight_snapshot_requested.connect(self.capture_flight_snapshot)
+
         # Signaux du recorder
         self.recorder.action_recorded.connect(self.on_action_recorded)
         self.recorder.recording_stopped.connect(self.on_recording_stopped)
@@ -903,9 +7016,15 @@ class MacroRecorderUI(QMainWindow):
         """Configure les raccourcis clavier"""
         QShortcut(QKeySequence("F9"), self, self.toggle_recording)
         QShortcut(QKeySequence("F10"), self, self.toggle_playback)
+        QShortcut(QKeySequence("Shift+F10"), self, self.play_selection)
         QShortcut(QKeySequence("Ctrl+N"), self, self.new_macro)
         QShortcut(QKeySequence("Ctrl+O"), self, self.open_macro)
         QShortcut(QKeySequence("Ctrl+S"), self, self.save_macro)
+        QShortcut(QKeySequence("F12"), self, self.capture_flight_snapshot)
+        QShortcut(QKeySequence("Ctrl+Z"), self, self.undo_edit)
+        QShortcut(QKeySequence("Ctrl+Y"), self, self.redo_edit)
+        QShortcut(QKeySequence("Ctrl+Shift+Z"), self, self.redo_edit)
+        QShortcut(QKeySequence("Del"), self.action_list, self.delete_selection)
 
     def toggle_theme(self):
         """Bascule entre thème clair et sombre"""
@@ -929,6 +7048,8 @@ class MacroRecorderUI(QMainWindow):
 
         # Mise à jour de la liste
         self.action_list.set_theme(self.current_theme)
+        if self.timeline:
+            self.timeline.set_theme(self.current_theme)
 
         # Mise à jour du status
         self.status_label.set_theme(self.current_theme)
@@ -979,10 +7100,36 @@ class MacroRecorderUI(QMainWindow):
         """)
 
     # Méthodes d'enregistrement
+    def capture_scope(self) -> Optional[CaptureScope]:
+        """Portée de l'enregistrement d'après les réglages (None : tout le bureau)"""
+        keys = {key.strip() for key in self.scope_keys_edit.text().split(",") if key.strip()}
+        target = self.scope_window_edit.text().strip() or None
+        if target and self.recorder.window_cache is None:
+            self.statusBar().showMessage("Fenêtre cible ignorée : activez les coordonnées relatives aux fenêtres")
+            target = None
+        if not (self.scope_check.isChecked() or keys or target):
+            return None
+        exclude_pid = None
+        if self.scope_check.isChecked():
+            keys |= {"<f9>", "<f10>", "<f12>"}
+            # Par identité (processus propriétaire de la fenêtre sous le pointeur), pas par zone :
+            # sans cache de fenêtres, l'empilement est inconnu et seules les touches sont exclues
+            if self.recorder.window_cache is not None:
+                exclude_pid = os.getpid()
+        return CaptureScope(window_class=target, excluded_keys=frozenset(keys), exclude_pid=exclude_pid,
+                            window_cache=self.recorder.window_cache)
+
     def start_recording(self):
+        self.recorder.set_scope(self.capture_scope())
+        displays = tuple(name.strip() for name in self.displays_edit.text().split(",") if name.strip())
+        if not self.recorder.set_multitrack(self.multitrack_check.isChecked(), displays):
+            return
         if self.recorder.start_recording():
+            self._actions_dirty = False
+            self._marker_count = 0
             self.record_btn.setEnabled(False)
             self.stop_record_btn.setEnabled(True)
+            self.mark_btn.setEnabled(True)
             self.play_btn.setEnabled(False)
             self.status_label.set_recording()
             self.statusBar().showMessage("Enregistrement en cours - F9 pour arrêter")
@@ -990,6 +7137,10 @@ class MacroRecorderUI(QMainWindow):
     def stop_recording(self):
         self.recorder.stop_recording()
 
+    def add_marker(self):
+        self._marker_count += 1
+        self.recorder.mark(f"Marqueur {self._marker_count}")
+
     def toggle_recording(self):
         if self.recorder.is_recording:
             self.stop_recording()
@@ -998,18 +7149,195 @@ class MacroRecorderUI(QMainWindow):
 
     # Méthodes de lecture
     def play_macro(self):
-        if not self.recorder.actions:
+        self.start_playback()
+
+    def play_selection(self):
+        """Joue la plage sélectionnée, ou à partir de l'action courante si une seule est sélectionnée"""
+        rows = sorted(self.action_list.row(item) for item in self.action_list.selectedItems())
+        if not rows:
+            rows = [max(self.action_list.currentRow(), 0)]
+
+        if len(rows) > 1:
+            self.start_playback(rows[0], rows[-1] + 1)
+        else:
+            self.start_playback(rows[0])
+
+    def start_playback(self, start_index: int = 0, end_index: Optional[int] = None):
+        if not self.sync_actions():
             QMessageBox.information(self, "Information", "Aucune action à jouer.\nEnregistrez d'abord une macro.")
             return
 
         self.player.set_actions(self.recorder.actions)
+        self.player.set_range(start_index, end_index)
         self.player.set_speed(self.speed_slider.value() / 10.0)
         self.player.set_loop_count(self.repeat_spin.value())
+        self.player.set_fast_mode(self.fast_check.isChecked(), self.sync_gap_spin.value())
+        self.player.set_humanizer(self.playback_humanizer())
         self.player.play_macro()
 
+    def playback_humanizer(self) -> Optional[Humanizer]:
+        """Humaniseur des réglages (graine 0 : tirée au hasard), None si désactivé"""
+        if not (NUMPY_AVAILABLE and self.humanize_check.isChecked()):
+            return None
+        return Humanizer(seed=self.humanize_seed_spin.value() or None)
+
+    def show_action_menu(self, position):
+        if not self.can_edit():
+            return
+
+        menu = QMenu(self)
+        selected = len(self.action_list.selectedItems())
+        label = f"▶️ Jouer la sélection ({selected} actions)" if selected > 1 else "⏩ Jouer à partir d'ici"
+        menu.addAction(label, self.play_selection)
+        menu.addSeparator()
+        menu.addAction("🗑️ Supprimer", self.delete_selection)
+        menu.addAction("📑 Dupliquer", self.duplicate_selection)
+        menu.addAction("⏸️ Insérer une pause avant...", self.insert_pause)
+        menu.addAction("⏱️ Décaler la sélection...", self.shift_selection)
+        menu.addAction("🔗 Point de synchro après cette action", self.toggle_sync_point)
+        menu.addAction("🔤 Regrouper la saisie en texte", self.group_typing)
+        menu.addSeparator()
+        menu.addAction("↩️ Annuler (Ctrl+Z)", self.undo_edit).setEnabled(self.editor.can_undo())
+        menu.addAction("↪️ Rétablir (Ctrl+Y)", self.redo_edit).setEnabled(self.editor.can_redo())
+        menu.exec(self.action_list.mapToGlobal(position))
+
+    # Méthodes d'édition
+    def can_edit(self) -> bool:
+        return len(self.editor) > 0 and not self.recorder.is_recording and not self.player.is_playing
+
+    def selected_ranges(self) -> List[tuple]:
+        """Plages contiguës [début, fin) des lignes sélectionnées"""
+        rows = sorted(self.action_list.row(item) for item in self.action_list.selectedItems())
+        if not rows and self.action_list.currentRow() >= 0:
+            rows = [self.action_list.currentRow()]
+
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row:
+                ranges[-1][1] = row + 1
+            else:
+                ranges.append([row, row + 1])
+        return [tuple(r) for r in ranges]
+
+    def sync_actions(self) -> List[MacroAction]:
+        """Matérialise la corde de l'éditeur dans recorder.actions si elle a été modifiée"""
+        if self._actions_dirty:
+            self.recorder.actions = self.editor.to_list()
+            self._actions_dirty = False
+        return self.recorder.actions
+
+    def apply_edit_changes(self, changes: Optional[List[tuple]], message: str = ""):
+        """Répercute une édition sur la liste en n'invalidant que les lignes concernées"""
+        if changes is None:
+            return
+        for kind, start, end in changes:
+            if kind == "insert":
+                self.action_list.insert_actions(start, self.editor.rope.slice(start, end))
+            elif kind == "delete":
+                self.action_list.remove_rows(start, end)
+            else:
+                self.action_list.update_rows(start, self.editor.rope.slice(start, end))
+
+        self._actions_dirty = True
+        self.update_actions_info()
+        self.play_btn.setEnabled(len(self.editor) > 0)
+        self.timeline_timer.start()
+        if message:
+            self.statusBar().showMessage(message)
+
+    def delete_selection(self):
+        ranges = self.selected_ranges()
+        if not self.can_edit() or not ranges:
+            return
+        count = sum(end - start for start, end in ranges)
+        self.apply_edit_changes(self.editor.delete_ranges(ranges), f"{count} actions supprimées")
+
+    def duplicate_selection(self):
+        ranges = self.selected_ranges()
+        if not self.can_edit() or not ranges:
+            return
+        start, end = ranges[0][0], ranges[-1][1]
+        self.apply_edit_changes(self.editor.duplicate(start, end), f"{end - start} actions dupliquées")
+
+    def insert_pause(self):
+        ranges = self.selected_ranges()
+        if not self.can_edit() or not ranges:
+            return
+        seconds, ok = QInputDialog.getDouble(self, "Insérer une pause", "Durée (secondes):", 1.0, 0.01, 3600.0, 2)
+        if ok:
+            start = ranges[0][0]
+            self.apply_edit_changes(self.editor.shift(start, len(self.editor), seconds, "Pause"),
+                                    f"Pause de {seconds:.2f}s insérée")
+
+    def shift_selection(self):
+        ranges = self.selected_ranges()
+        if not self.can_edit() or not ranges:
+            return
+        seconds, ok = QInputDialog.getDouble(self, "Décaler la sélection", "Décalage (secondes):", 0.5, -3600.0, 3600.0, 2)
+        if ok:
+            start, end = ranges[0][0], ranges[-1][1]
+            self.apply_edit_changes(self.editor.shift(start, end, seconds), f"Sélection décalée de {seconds:+.2f}s")
+
+    def toggle_sync_point(self):
+        """Marque (ou démarque) l'action courante comme point de synchronisation du mode rapide"""
+        row = self.action_list.currentRow()
+        if not self.can_edit() or row < 0:
+            return
+        action = self.editor.rope[row]
+        data = dict(action.data)
+        if data.pop("sync", None) is None:
+            data["sync"] = {"check": "auto", "timeout": ReadinessProbe.DEFAULT_TIMEOUT}
+        marked = "sync" in data
+        self.apply_edit_changes(self.editor.update(row, MacroAction(action.action_type, action.timestamp, data)),
+                                "Point de synchro ajouté" if marked else "Point de synchro retiré")
+
+    def group_typing(self):
+        """Remplace les suites de frappes de toute la macro par des actions texte (annulable)"""
+        if not self.can_edit():
+            return
+        actions = self.editor.to_list()
+        grouped = group_text_runs(actions)
+        if len(grouped) == len(actions):
+            self.statusBar().showMessage("Aucune suite de frappes à regrouper")
+            return
+        self.apply_edit_changes(self.editor.replace_all(grouped, "Regroupement"),
+                                f"{len(actions) - len(grouped)} frappes regroupées en texte")
+
+    def undo_edit(self):
+        if self.recorder.is_recording or self.player.is_playing:
+            return
+        self.apply_edit_changes(self.editor.undo(), "Modification annulée")
+
+    def redo_edit(self):
+        if self.recorder.is_recording or self.player.is_playing:
+            return
+        self.apply_edit_changes(self.editor.redo(), "Modification rétablie")
+
     def stop_playback(self):
         self.player.stop_playback()
 
+    def play_from_disk(self):
+        """Lecture en continu d'un gros fichier, sans le charger dans la liste"""
+        if self.player.is_playing or self.recorder.is_recording:
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Lire une macro depuis le disque",
+            "", "Macros en continu (*.jsonl *.mseg);;Tous les fichiers (*)"
+        )
+        if not file_path:
+            return
+        try:
+            source = ActionStream(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur", f"Impossible de lire le fichier:\n{str(e)}")
+            return
+        self.player.set_source(source)
+        self.player.set_speed(self.speed_slider.value() / 10.0)
+        self.player.set_loop_count(self.repeat_spin.value())
+        self.player.set_fast_mode(self.fast_check.isChecked(), self.sync_gap_spin.value())
+        self.player.play_macro()
+        self.statusBar().showMessage(f"Lecture en continu: {Path(file_path).name} ({len(source)} actions)")
+
     def toggle_playback(self):
         if self.player.is_playing:
             self.stop_playback()
@@ -1018,7 +7346,7 @@ class MacroRecorderUI(QMainWindow):
 
     # Méthodes de fichiers
     def new_macro(self):
-        if self.recorder.actions:
+        if self.sync_actions():
             reply = QMessageBox.question(
                 self, "Nouvelle macro",
                 "Sauvegarder la macro actuelle avant de créer une nouvelle ?",
@@ -1030,32 +7358,46 @@ class MacroRecorderUI(QMainWindow):
             elif reply == QMessageBox.StandardButton.Cancel:
                 return
 
-        self.recorder.actions.clear()
+        self.recorder.store.clear()
+        self.editor.reset([])
         self.action_list.clear()
         self.current_macro_file = None
         self.update_actions_info()
+        self.refresh_timeline()
         self.statusBar().showMessage("Nouvelle macro créée")
 
+    def load_actions(self, actions: List[MacroAction]):
+        """Remplace la macro courante par une liste d'actions et rafraîchit la liste"""
+        self.recorder.actions = actions
+        self.editor.reset(actions)
+        self._actions_dirty = False
+        if self.thumb_store:
+            self.thumb_store.close()
+            self.thumb_store = None
+
+        self.action_list.clear()
+        for action in actions:
+            self.action_list.add_action(action)
+
+        self.update_actions_info()
+        self.refresh_timeline()
+        self.play_btn.setEnabled(len(self.recorder.actions) > 0)
+
+    def refresh_timeline(self):
+        if self.timeline:
+            self.timeline.set_actions(self.sync_actions())
+
     def open_macro(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Ouvrir une macro",
-            "", "Fichiers macro (*.json);;Tous les fichiers (*)"
+            "", "Fichiers macro (*.json *.jsonl *.mseg);;Tous les fichiers (*)"
         )
 
         if file_path:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                self.recorder.actions = [MacroAction.from_dict(action_data) for action_data in data['actions']]
+                self.load_actions(load_macro_file(file_path))
                 self.current_macro_file = file_path
-
-                self.action_list.clear()
-                for action in self.recorder.actions:
-                    self.action_list.add_action(action)
-
-                self.update_actions_info()
-                self.play_btn.setEnabled(len(self.recorder.actions) > 0)
+                self.thumb_store = ThumbnailStore.for_macro(file_path)
                 self.statusBar().showMessage(f"Macro chargée: {Path(file_path).name}")
 
             except Exception as e:
@@ -1065,25 +7407,19 @@ class MacroRecorderUI(QMainWindow):
         if not self.current_macro_file:
             file_path, _ = QFileDialog.getSaveFileName(
                 self, "Sauvegarder la macro",
-                "", "Fichiers macro (*.json);;Tous les fichiers (*)"
+                "", "Fichiers macro (*.json *.jsonl *.mseg);;Tous les fichiers (*)"
             )
             if not file_path:
                 return False
-            if not file_path.endswith('.json'):
+            if not file_path.endswith(('.json', '.jsonl', '.mseg')):
                 file_path += '.json'
             self.current_macro_file = file_path
 
         try:
-            data = {
-                'version': '2.1',
-                'created_at': time.time(),
-                'action_count': len(self.recorder.actions),
-                'theme': 'dark' if self.is_dark_mode else 'light',
-                'actions': [action.to_dict() for action in self.recorder.actions]
-            }
-
-            with open(self.current_macro_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            actions = self.sync_actions()
+            save_macro_file(self.current_macro_file, actions,
+                            theme='dark' if self.is_dark_mode else 'light')
+            self.save_thumbnails(actions)
 
             self.statusBar().showMessage(f"Macro sauvegardée: {Path(self.current_macro_file).name}")
             return True
@@ -1092,17 +7428,64 @@ class MacroRecorderUI(QMainWindow):
             QMessageBox.critical(self, "Erreur", f"Impossible de sauvegarder:\n{str(e)}")
             return False
 
+    def export_script(self):
+        actions = self.sync_actions()
+        if not actions:
+            QMessageBox.information(self, "Information", "Aucune action à compiler.")
+            return
+
+        file_path, selected = QFileDialog.getSaveFileName(
+            self, "Compiler la macro",
+            "", "Script Python (*.py);;Script xdotool (*.xdo)"
+        )
+        if not file_path:
+            return
+        target = "xdotool" if file_path.endswith(".xdo") or ("xdotool" in selected and not file_path.endswith(".py")) else "python"
+        if not file_path.endswith((".py", ".xdo")):
+            file_path += ".py" if target == "python" else ".xdo"
+
+        try:
+            speed = self.speed_slider.value() / 10.0
+            source = compile_macro(actions, target, speed, Path(file_path).name)
+            Path(file_path).write_text(source, encoding="utf-8")
+            Path(file_path).chmod(0o755)
+            check = verify_compiled(actions, source, target, speed)
+            if check["equivalent"]:
+                self.statusBar().showMessage(
+                    f"Script compilé: {Path(file_path).name} - équivalence vérifiée ({check['events']} événements)")
+            else:
+                QMessageBox.warning(self, "Compilation",
+                                    f"Le script diverge de la macro à l'événement {check['mismatch']}.")
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur", f"Impossible de compiler la macro:\n{str(e)}")
+
+    def show_analytics(self):
+        if not self.sync_actions():
+            QMessageBox.information(self, "Information", "Aucune action à analyser.")
+            return
+
+        screen = self.screen().geometry() if self.screen() else None
+        self.analyzer.screen_size = (screen.width(), screen.height()) if screen else None
+        start = time.perf_counter()
+        stats = self.analyzer.analyze(self.recorder.actions)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        self.statusBar().showMessage(f"Analyse de {stats['count']} actions en {elapsed:.0f} ms")
+
+        AnalyticsDialog(stats, self.current_theme, self).exec()
+
     def clear_actions(self):
-        if self.recorder.actions:
+        if self.sync_actions():
             reply = QMessageBox.question(
                 self, "Effacer les actions",
                 "Êtes-vous sûr de vouloir effacer toutes les actions ?",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if reply == QMessageBox.StandardButton.Yes:
-                self.recorder.actions.clear()
+                self.recorder.store.clear()
+                self.editor.reset([])
                 self.action_list.clear()
                 self.update_actions_info()
+                self.refresh_timeline()
                 self.play_btn.setEnabled(False)
                 self.statusBar().showMessage("Actions effacées")
 
@@ -1114,9 +7497,35 @@ class MacroRecorderUI(QMainWindow):
     def on_recording_stopped(self):
         self.record_btn.setEnabled(True)
         self.stop_record_btn.setEnabled(False)
-        self.play_btn.setEnabled(len(self.recorder.actions) > 0)
+        self.mark_btn.setEnabled(False)
+        actions = self.recorder.actions
+        self.play_btn.setEnabled(len(actions) > 0)
+        self.editor.reset(actions)
+        self._actions_dirty = False
+        if len(actions) != self.action_list.count():
+            # Frappes regroupées à l'arrêt : la liste affichée pendant l'enregistrement est périmée
+            self.action_list.clear()
+            for action in actions:
+                self.action_list.add_action(action)
+            self.update_actions_info()
+        self.refresh_timeline()
         self.status_label.set_stopped()
-        self.statusBar().showMessage("Enregistrement terminé")
+        parts = []
+        stats = self.recorder.thumbnail_stats if self.recorder.thumbnails else None
+        if stats:
+            parts.append(
+                f"vignettes: {stats['images']} images pour {stats['requested']} demandes "
+                f"({stats['deduplicated']} doublons, {stats['skipped_cpu'] + stats['skipped_memory'] + stats['dropped_queue']} "
+                f"ignorées), {stats['cpu_ms']:.0f} ms CPU, {stats['bytes'] / 1024:.0f} Ko, "
+                f"callback {stats['callback_us_mean']:.1f} µs")
+        tracks = self.recorder.track_stats if self.recorder.timeline else None
+        if tracks:
+            dropped = sum(track["dropped"] for track in tracks["tracks"].values())
+            parts.append(f"{len(tracks['tracks'])} pistes fusionnées ({tracks['merged']} actions, {dropped} perdues)")
+        scope = self.recorder.scope_stats
+        if scope.get("dropped"):
+            parts.append(f"portée: {scope['dropped']}/{scope['seen']} événements ignorés ({scope['ratio']:.0%})")
+        self.statusBar().showMessage(" - ".join(["Enregistrement terminé"] + parts))
 
     def on_playback_started(self):
         self.play_btn.setEnabled(False)
@@ -1128,12 +7537,183 @@ class MacroRecorderUI(QMainWindow):
         self.play_btn.setEnabled(True)
         self.stop_play_btn.setEnabled(False)
         self.status_label.set_stopped()
-        self.statusBar().showMessage("Lecture terminée")
+        run = self.player.last_run
+        if run.get("mode") == "rapide":
+            self.statusBar().showMessage(
+                f"Lecture rapide terminée en {run['elapsed']:.1f}s (chronométrée: {run['timed']:.1f}s, "
+                f"x{run['speedup'] or 0:.1f}) | {run['waits']} synchros, {run['timeouts']} délais dépassés")
+        elif "stream" in run:
+            stream = run["stream"]
+            self.statusBar().showMessage(
+                f"Lecture en continu terminée - {stream['actions']} actions lues, premier bloc en "
+                f"{stream['first_chunk_ms']:.1f} ms, {stream['underruns']} sous-débits ({stream['underrun_ms']:.0f} ms)")
+        elif "humanize" in run:
+            humanize = run["humanize"]
+            self.statusBar().showMessage(
+                f"Lecture humanisée terminée - graine {humanize['seed']}, {humanize['loops']} boucles variées, "
+                f"{humanize['paths']} trajectoires")
+        else:
+            self.statusBar().showMessage("Lecture terminée")
 
     def on_action_played(self, index):
-        if 0 <= index < self.action_list.count():
+        if self.player.source is None and 0 <= index < self.action_list.count():
             self.action_list.setCurrentRow(index)
 
+    # Méthodes de l'enregistreur de vol
+    def toggle_flight_recording(self, enabled):
+        if enabled:
+            if self.recorder.start_flight_recording():
+                self.statusBar().showMessage("Enregistreur de vol actif - F12 pour capturer les dernières secondes")
+            else:
+                self.flight_check.setChecked(False)
+        else:
+            self.recorder.stop_flight_recording()
+            self.statusBar().showMessage("Enregistreur de vol arrêté")
+
+    def capture_flight_snapshot(self):
+        if not self.recorder.is_flight_recording:
+            self.statusBar().showMessage("Enregistreur de vol inactif")
+            return
+        if self.recorder.is_recording or self.player.is_playing:
+            return
+
+        seconds = self.flight_seconds_spin.value()
+        actions = self.recorder.flight_snapshot(seconds)
+        if not actions:
+            self.statusBar().showMessage("Aucune action capturée par l'enregistreur de vol")
+            return
+
+        self.load_actions(actions)
+        self.current_macro_file = None
+        self.statusBar().showMessage(f"Instantané de vol: {len(actions)} actions sur les {seconds} dernières secondes")
+
+    def toggle_capture_process(self, enabled):
+        if not self.recorder.set_capture_process(enabled):
+            self.capture_process_check.blockSignals(True)
+            self.capture_process_check.setChecked(not enabled)
+            self.capture_process_check.blockSignals(False)
+            self.statusBar().showMessage("Impossible de changer le mode de capture pendant l'enregistrement")
+            return
+        self.statusBar().showMessage("Capture dans un processus séparé" if enabled else "Capture dans l'interface")
+
+    METRICS_REFRESH_MS = 500
+
+    def refresh_metrics(self):
+        """Met à jour le panneau de télémétrie (débits calculés sur l'intervalle écoulé)"""
+        now = time.perf_counter()
+        recorded = self.recorder.events_metric.total()
+        played = self.player.actions_metric.total()
+        previous = self._metrics_previous
+        self._metrics_previous = (now, recorded, played)
+        if previous is None or now <= previous[0]:
+            record_rate = play_rate = 0.0
+        else:
+            elapsed = now - previous[0]
+            record_rate = (recorded - previous[1]) / elapsed
+            play_rate = (played - previous[2]) / elapsed
+
+        metrics = self.metrics
+        p95 = self.player.lag_metric.quantile(0.95)
+        self.metrics_labels["recorder"].setText(
+            f"🎙️ {record_rate:.0f} év/s | file {metrics.get('macro_recorder_capture_backlog').get():.0f} | "
+            f"perdus {metrics.get('macro_recorder_capture_dropped').get():.0f}")
+        self.metrics_labels["player"].setText(
+            f"▶️ {play_rate:.0f} actions/s | retard {self.player.behind_metric.get() * 1000:.1f} ms"
+            + (f" (p95 {p95 * 1000:.1f} ms)" if p95 is not None else ""))
+        self.metrics_labels["process"].setText(
+            f"💾 {metrics.get('process_resident_memory_bytes').get() / 1e6:.0f} Mo | "
+            f"{recorded:.0f} enregistrées, {played:.0f} jouées")
+
+    def toggle_thumbnails(self, enabled):
+        if not self.recorder.set_thumbnails(enabled):
+            self.thumbnails_check.blockSignals(True)
+            self.thumbnails_check.setChecked(not enabled)
+            self.thumbnails_check.blockSignals(False)
+            return
+        self.statusBar().showMessage("Vignettes activées" if enabled else "Vignettes désactivées")
+
+    def toggle_window_relative(self, enabled):
+        previous = self.recorder.window_cache
+        if not self.recorder.set_window_relative(enabled):
+            self.window_relative_check.blockSignals(True)
+            self.window_relative_check.setChecked(not enabled)
+            self.window_relative_check.blockSignals(False)
+            return
+        if previous is not None and not enabled:
+            previous.stop()
+        cache = self.player.window_cache = self.recorder.window_cache
+        self.statusBar().showMessage(f"Coordonnées relatives activées - {len(cache.windows)} fenêtres suivies"
+                                     if cache else "Coordonnées relatives désactivées")
+
+    def thumbnail_bytes(self, thumb_id: str) -> Optional[bytes]:
+        """Vignette depuis l'enregistrement en cours, sinon depuis le fichier annexe de la macro"""
+        capturer = self.recorder.thumbnails
+        data = capturer.get(thumb_id) if capturer else None
+        if data is None and self.thumb_store:
+            data = self.thumb_store.get(thumb_id)
+        return data
+
+    def show_thumbnail(self, row: int):
+        if row < 0 or row >= len(self.editor) or self.recorder.is_recording:
+            self.thumb_preview.hide()
+            return
+        thumb_id = self.editor.rope[row].data.get("thumb")
+        data = self.thumbnail_bytes(thumb_id) if thumb_id else None
+        pixmap = QPixmap()
+        if data is None or not pixmap.loadFromData(data):
+            self.thumb_preview.hide()
+            return
+        self.thumb_preview.setPixmap(pixmap)
+        self.thumb_preview.show()
+
+    def save_thumbnails(self, actions):
+        """Écrit <macro>.thumbs avec les seules vignettes encore référencées par la macro"""
+        thumb_ids = sorted({action.data["thumb"] for action in actions if "thumb" in action.data})
+        sources = [source for source in (self.recorder.thumbnails, self.thumb_store) if source]
+        target = ThumbnailStore.for_macro(self.current_macro_file)
+        if not thumb_ids and not target.path.exists():
+            return
+        ThumbnailStore.write(target.path, thumb_ids, sources)
+        if self.thumb_store:
+            self.thumb_store.close()
+        self.thumb_store = target
+
+    def closeEvent(self, event):
+        if self.recorder.is_recording:
+            self.recorder.stop_recording()
+        self.recorder.set_capture_process(False)
+        if self.recorder.window_cache:
+            self.recorder.window_cache.stop()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        super().closeEvent(event)
+
+    # Méthodes de traçage
+    def toggle_tracing(self, enabled):
+        if enabled:
+            self.tracer.enable()
+            self.statusBar().showMessage("Traçage activé - les prochaines lectures/enregistrements seront tracés")
+        else:
+            self.tracer.disable()
+            self.statusBar().showMessage(f"Traçage désactivé - {len(self.tracer.events)} événements collectés")
+        self.export_trace_btn.setEnabled(enabled or bool(self.tracer.events))
+
+    def export_trace(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Exporter la trace",
+            "macro_trace.json", "Trace Chrome/Perfetto (*.json);;Tous les fichiers (*)"
+        )
+        if not file_path:
+            return
+
+        try:
+            self.tracer.export(file_path)
+            self.statusBar().showMessage(
+                f"Trace exportée: {Path(file_path).name} ({len(self.tracer.events)} événements) - "
+                "ouvrir dans ui.perfetto.dev ou chrome://tracing")
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur", f"Impossible d'exporter la trace:\n{str(e)}")
+
     def on_error(self, message):
         QMessageBox.warning(self, "Erreur", message)
         self.statusBar().showMessage(f"Erreur: {message}")
@@ -1143,12 +7723,16 @@ class MacroRecorderUI(QMainWindow):
         self.speed_display.setText(f"{speed:.1f}x")
 
     def update_actions_info(self):
-        count = len(self.recorder.actions)
-        if count == 0:
+        if self._actions_dirty:
+            count = len(self.editor)
+            self.actions_info.setText(f"{count} actions | {max(self.editor.rope.max_timestamp(), 0.0):.1f}s")
+            return
+
+        actions = self.recorder.actions
+        if not actions:
             self.actions_info.setText("0 actions | 0.0s")
         else:
-            total_time = max([action.timestamp for action in self.recorder.actions]) if self.recorder.actions else 0
-            self.actions_info.setText(f"{count} actions | {total_time:.1f}s")
+            self.actions_info.setText(f"{len(actions)} actions | {actions.max_timestamp:.1f}s")
 
 def run_regression_tests():
     """Tests de non-régression pour la nouvelle interface"""
@@ -1198,6 +7782,1064 @@ def run_regression_tests():
     except Exception as e:
         test_results.append(f"❌ Test sérialisation: {e}")
 
+    # Test 5: Traceur de performance
+    try:
+        tracer = PerfTracer()
+        with tracer.span("inactif", PerfTracer.CAT_INJECT):
+            pass
+        assert not tracer.events
+        tracer.enable()
+        start = tracer.now()
+        tracer.add_span("mouse_click", PerfTracer.CAT_INJECT, start, tracer.now(), {"index": 0})
+        tracer.add_instant("marque", PerfTracer.CAT_SCHEDULE)
+        trace = tracer.to_chrome_trace()
+        phases = [event["ph"] for event in trace["traceEvents"]]
+        assert "X" in phases and "i" in phases and "M" in phases
+        json.dumps(trace)
+
+        # Horloge injectée : lecture simulée tracée, instants et dérives exacts
+        macro = [MacroAction("mouse_click", 1.0, {"x": 1, "y": 1, "button": "left", "pressed": True}),
+                 MacroAction("mouse_click", 1.5, {"x": 1, "y": 1, "button": "left", "pressed": False}),
+                 MacroAction("key_press", 3.0, {"key": "'a'"})]
+        traced = simulate_playback(macro, speed=2.0, setup=lambda p, clock: p.tracer.enable())
+        waits = [(start_ns, dur_ns, args) for name, _, start_ns, dur_ns, _, args in traced.tracer.events
+                 if name == "attente"]
+        assert [(start_ns, dur_ns) for start_ns, dur_ns, _ in waits] == \
+            [(0, 0), (0, 250_000_000), (250_000_000, 750_000_000)], waits
+        assert all(args["derive_ms"] == 0.0 for _, _, args in waits), waits
+        loop_span = next(event for event in traced.tracer.events if event[0] == "boucle 1")
+        assert loop_span[2:4] == (0, 1_000_000_000), loop_span
+        test_results.append("✅ Test traceur: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test traceur: {e}")
+
+    # Test 6: Lecture sur backend d'enregistrement
+    try:
+        player = MacroPlayer()
+        player.backend = RecordingBackend()
+        player.actions = [
+            MacroAction("mouse_move", 0.0, {"x": 5, "y": 6}),
+            MacroAction("mouse_click", 0.0, {"x": 5, "y": 6, "button": "gauche", "pressed": True}),
+            MacroAction("key_press", 0.0, {"key": "'a'"}),
+        ]
+        player.is_playing = True
+        player._play_loop()
+        assert [event[1] for event in player.backend.events] == ["move_to", "click", "press"]
+        test_results.append("✅ Test backend d'enregistrement: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test backend d'enregistrement: {e}")
+
+    # Test 7: Tampon circulaire de l'enregistreur de vol
+    try:
+        ring = ActionRingBuffer(capacity=4)
+        for i in range(6):
+            ring.push(ActionRingBuffer.MOVE, 100.0 + i, i, i)
+        ring.push(ActionRingBuffer.KEY_PRESS, 106.0, key="'a'")
+        assert len(ring) == 4
+        snapshot = ring.snapshot()
+        assert [a.data.get("x") for a in snapshot[:3]] == [3, 4, 5]
+        assert snapshot[0].timestamp == 0.0 and snapshot[-1].action_type == "key_press"
+        assert len(ring.snapshot(seconds=1.5, now=106.0)) == 2
+        test_results.append("✅ Test enregistreur de vol: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test enregistreur de vol: {e}")
+
+    # Test 8: Validation et optimisation des macros
+    try:
+        document = {"actions": [
+            MacroAction("mouse_move", 0.0, {"x": 1, "y": 1}).to_dict(),
+            MacroAction("mouse_move", 0.01, {"x": 2, "y": 2}).to_dict(),
+            MacroAction("mouse_move", 0.02, {"x": 3, "y": 3}).to_dict(),
+            MacroAction("mouse_click", 0.5, {"x": 3, "y": 3, "button": "gauche", "pressed": True}).to_dict(),
+            MacroAction("mouse_move", 0.6, {"x": 3, "y": 3}).to_dict(),
+        ]}
+        assert validate_macro_data(document) == []
+        assert validate_macro_data({"actions": [{"action_type": "mouse_move", "timestamp": -1, "data": {}}]})
+        optimized = optimize_actions([MacroAction.from_dict(a) for a in document["actions"]])
+        assert [a.data["x"] for a in optimized] == [1, 3, 3] and optimized[-1].action_type == "mouse_click"
+        test_results.append("✅ Test validation/optimisation: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test validation/optimisation: {e}")
+
+    # Test 9: Analyse vectorisée
+    if NUMPY_AVAILABLE:
+        try:
+            analyzer = MacroAnalyzer(heatmap_bins=(4, 2), screen_size=(400, 200))
+            actions = [
+                MacroAction("mouse_click", 0.0, {"x": 10, "y": 10, "button": "gauche", "pressed": True}),
+                MacroAction("mouse_click", 0.1, {"x": 10, "y": 10, "button": "gauche", "pressed": False}),
+                MacroAction("key_press", 2.0, {"key": "'a'"}),
+                MacroAction("mouse_move", 2.5, {"x": 390, "y": 190}),
+            ]
+            stats = analyzer.analyze(actions)
+            assert stats["click_heatmap"][0, 0] == 1 and stats["click_heatmap"].sum() == 1
+            assert stats["move_heatmap"][1, 3] == 1
+            assert stats["per_type"]["mouse_click"]["count"] == 2 and stats["top_keys"] == [("a", 1)]
+            assert stats["idle_count"] == 1 and analyzer.analyze(list(actions)) is stats
+
+            # Instantanés : réanalyse sans relecture, colonnes complétées pour les seuls ajouts
+            store = ActionStore(list(actions))
+            snapshot = store.snapshot()
+            first = analyzer.analyze(snapshot)
+            assert analyzer.analyze(store.snapshot()) is first and first["hash"] == stats["hash"]
+            store.append(MacroAction("key_press", 3.0, {"key": "'b'"}))
+            store.append(MacroAction("key_press", 3.5, {"key": "'a'"}))
+            grown = analyzer.analyze(store.snapshot())
+            assert grown["hash"] == analyzer.analyze(list(store.snapshot()))["hash"]
+            assert grown["top_keys"] == [("a", 2), ("b", 1)] and analyzer.analyze(snapshot) is first
+
+            # Multi-écrans : écran secondaire à gauche et au-dessus du principal (coordonnées négatives)
+            wide = analyzer.analyze([
+                MacroAction("mouse_click", 0.0, {"x": -500, "y": -100, "button": "gauche", "pressed": True}),
+                MacroAction("mouse_move", 0.5, {"x": 0, "y": 0}),
+                MacroAction("mouse_click", 1.0, {"x": 10, "y": 190, "button": "gauche", "pressed": True}),
+                MacroAction("key_press", 1.5, {"key": "'a'"}),
+            ])
+            assert wide["origin"] == (-500, -100) and wide["screen"] == (900, 300)
+            assert wide["click_heatmap"].sum() == 2 and wide["click_heatmap"][0, 0] == 1
+            assert wide["move_heatmap"].sum() == 1  # la frappe (sans position) n'est pas comptée en (0, 0)
+            assert wide["regions"]["clicks"] == [[1, 0, 0], [0, 0, 0], [0, 1, 0]], wide["regions"]
+            test_results.append("✅ Test analyse: OK")
+        except Exception as e:
+            test_results.append(f"❌ Test analyse: {e}")
+
+    # Test 10: Résumés multi-résolution de la timeline
+    if NUMPY_AVAILABLE:
+        try:
+            actions = [MacroAction("mouse_move", i * 0.01, {"x": i, "y": i}) for i in range(5000)]
+            actions.append(MacroAction("key_press", 50.0, {"key": "'a'"}))
+            summary = TimelineSummary(actions)
+            for level in summary.levels:
+                assert int(level[0][0].sum()) == 5000 and int(level[2][0].sum()) == 1
+            assert len(summary.levels[-1][0][0]) == 1 and summary.levels[-1][2][1][0] == 5000
+            assert summary.index_at(25.0) == 2500
+            test_results.append("✅ Test timeline: OK")
+        except Exception as e:
+            test_results.append(f"❌ Test timeline: {e}")
+
+    # Test 11: Lecture à partir d'un point de la macro
+    try:
+        player = MacroPlayer()
+        player.backend = RecordingBackend()
+        player.set_actions([
+            MacroAction("key_press", 0.0, {"key": "Key.shift"}),
+            MacroAction("mouse_move", 1.0, {"x": 7, "y": 8}),
+            MacroAction("key_press", 2.0, {"key": "'a'"}),
+            MacroAction("key_release", 2.0, {"key": "Key.shift"}),
+        ])
+        assert player.index_at_time(1.5) == 2 and player.index_at_time(0.0) == 0
+        player.set_time_range(1.5)
+        player.is_playing = True
+        player._play_loop()
+        assert [event[1:] for event in player.backend.events] == [
+            ("move_to", (7, 8)), ("key_down", ("shift",)), ("press", ("a",)), ("key_up", ("shift",))]
+        test_results.append("✅ Test lecture partielle: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test lecture partielle: {e}")
+
+    # Test 12: Édition persistante avec annuler/rétablir
+    try:
+        ActionRope.LEAF_SIZE, leaf_size = 4, ActionRope.LEAF_SIZE
+        try:
+            actions = [MacroAction("mouse_move", float(i), {"x": i, "y": 0}) for i in range(50)]
+            editor = MacroEditor(actions)
+            editor.delete_ranges([(5, 10), (20, 22)])
+            editor.shift(10, len(editor), 2.5)
+            assert editor.duplicate(0, 3) == [("insert", 3, 6), ("update", 6, 46)]
+            edited = editor.to_list()
+            assert len(edited) == 46 and edited[3].data is actions[0].data
+            assert editor.rope[12].timestamp == 16.0 and editor.rope.max_timestamp() == 53.5
+            while editor.can_undo():
+                editor.undo()
+            assert [a.timestamp for a in editor.to_list()] == [a.timestamp for a in actions]
+            editor.redo(); editor.redo(); editor.redo()
+            assert [a.timestamp for a in editor.to_list()] == [a.timestamp for a in edited]
+        finally:
+            ActionRope.LEAF_SIZE = leaf_size
+        test_results.append("✅ Test édition annuler/rétablir: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test édition annuler/rétablir: {e}")
+
+    # Test 13: Vérification de fidélité en boucle fermée
+    try:
+        actions = [
+            MacroAction("mouse_move", 0.0, {"x": 10, "y": 10}),
+            MacroAction("mouse_click", 0.01, {"x": 10, "y": 10, "button": "gauche", "pressed": True}),
+            MacroAction("mouse_click", 0.02, {"x": 10, "y": 10, "button": "gauche", "pressed": False}),
+            MacroAction("key_press", 0.03, {"key": "'a'"}),
+            MacroAction("scroll", 0.04, {"x": 10, "y": 10, "dx": 0, "dy": -1}),
+        ]
+        report = verify_playback(actions, speed=10.0)
+        assert report.matched == 4 and report.missed == 0 and report.extra == 0
+        assert report.position_error_max == 0.0 and report.passed()
+
+        expected = fidelity_events(actions)
+        captured = [(t + 1.0, sig, x + 3 if x is not None else x, y) for t, sig, x, y in expected if sig != "key:a"]
+        report = align_event_streams(expected, captured + [(2.0, "move", 0, 0)])
+        assert report.missed_by_kind == {"key": 1} and report.first_missed == [2] and report.extra == 1
+        assert report.position_error_max == 3.0 and abs(report.timing_offset_ms - 1000.0) < 1e-6
+        assert not report.passed()
+
+        # Propriété : chaque événement attendu est apparié ou manqué, chaque capturé apparié ou en trop
+        rng = random.Random(7)
+        for trial in range(200):
+            expected = [(k * 0.01, rng.choice(("move", "click:left", "key:a")), rng.randrange(50), rng.randrange(50))
+                        for k in range(rng.randrange(1, 120))]
+            captured = []
+            for event in expected:
+                roll = rng.random()
+                if roll < 0.15:
+                    continue  # perdu
+                captured.append(event)
+                if roll > 0.93:
+                    captured.append((event[0], "move", 999, 999))  # parasite
+            report = align_event_streams(expected, captured, window=rng.choice((4, 8, 32)))
+            assert report.matched + report.missed == len(expected), (trial, report)
+            assert report.matched + report.extra == len(captured), (trial, report)
+        test_results.append("✅ Test fidélité: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test fidélité: {e}")
+
+    # Test 14: Mode rapide piloté par les points de synchronisation
+    try:
+        actions = [
+            MacroAction("mouse_click", 0.0, {"x": 1, "y": 1, "button": "gauche", "pressed": True}),
+            MacroAction("mouse_click", 0.1, {"x": 1, "y": 1, "button": "gauche", "pressed": False,
+                                             "sync": {"check": "image", "image": "ok.png", "timeout": 5}}),
+            MacroAction("key_press", 2.0, {"key": "Key.enter"}),
+            MacroAction("key_release", 2.1, {"key": "Key.enter"}),
+            MacroAction("key_press", 3.1, {"key": "'a'"}),
+        ]
+        points = detect_sync_points(actions, min_gap=0.5)
+        assert points[1]["check"] == "image" and points[3] == {"check": "auto", "timeout": 1.0}
+
+        player = MacroPlayer()
+        player.backend = RecordingBackend()
+        player.backend.images.add("ok.png")
+        player.set_actions(actions)
+        player.set_fast_mode(True)
+        player.is_playing = True
+        player._play_loop()
+        run = player.last_run
+        assert [event[1] for event in player.backend.events] == ["click", "press", "press"]
+        assert run["waits"] == 2 and run["timeouts"] == 0 and run["timed"] == 3.1
+        assert run["elapsed"] < 1.0 and run["speedup"] > 3
+        test_results.append("✅ Test mode rapide: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test mode rapide: {e}")
+
+    # Test 15: Transport d'événements en mémoire partagée
+    try:
+        ring = SharedEventRing(capacity=4)
+        try:
+            reader = SharedEventRing(capacity=4, name=ring.name)
+            for k in range(3):
+                ring.push(ActionRingBuffer.CLICK, float(k), k, k + 1, 3, 0)
+            ring.push(ActionRingBuffer.KEY_PRESS, 3.0, key="Key.shift")
+            assert reader.read_batch(2) == [(1, 0.0, 0, 1, 3, 0, None), (1, 1.0, 1, 2, 3, 0, None)]
+            for k in range(4, 8):
+                ring.push(ActionRingBuffer.MOVE, float(k), k, 0)
+            assert [event[1] for event in reader.read_batch()] == [4.0, 5.0, 6.0, 7.0] and reader.dropped == 2
+            # Écrivain interrompu au milieu de l'enregistrement 8 (emplacement de 4, séquence à 0) : perdu, pas déchiré
+            reader.read_index = 4
+            ring.SEQ.pack_into(ring.buf, ring.HEADER.size, 0)
+            struct.pack_into("<d", ring.buf, ring.HEADER.size + 12, 99.0)
+            assert [event[1] for event in reader.read_batch()] == [5.0, 6.0, 7.0] and reader.dropped == 3
+            reader.close()
+            action = ActionRingBuffer.to_action(ActionRingBuffer.CLICK, 1.5, 4, 5, 1, 0, None)
+            assert action.action_type == "mouse_click" and action.data["pressed"] and action.data["button"] == "gauche"
+        finally:
+            ring.close()
+
+        capture = CaptureProcess(capacity=64)
+        try:
+            capture.launch()
+            capture.command("synthetic", 20, 10_000.0, time.monotonic())
+            assert [event[2] for event in capture.read_batch()] == list(range(20))
+        finally:
+            capture.close()
+        test_results.append("✅ Test capture hors processus: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test capture hors processus: {e}")
+
+    # Test 16: Compilation en script autonome
+    try:
+        actions = [
+            MacroAction("mouse_move", 0.0, {"x": 1, "y": 2}),
+            MacroAction("mouse_move", 0.1, {"x": 3, "y": 4}),
+            MacroAction("mouse_click", 0.3, {"x": 3, "y": 4, "button": "droit", "pressed": True}),
+            MacroAction("mouse_click", 0.4, {"x": 3, "y": 4, "button": "droit", "pressed": False}),
+            MacroAction("key_press", 1.0, {"key": "'o'"}),
+            MacroAction("key_press", 1.1, {"key": "'k'"}),
+            MacroAction("key_press", 1.2, {"key": "Key.enter"}),
+            MacroAction("scroll", 2.0, {"x": 5, "y": 5, "dx": 0, "dy": -2}),
+        ]
+        assert [op for op, _ in batch_schedule(compile_schedule(actions))] == ["move_to", "click", "press", "scroll"]
+        for target in COMPILE_TARGETS:
+            source = compile_macro(actions, target, speed=2.0)
+            check = verify_compiled(actions, source, target, speed=2.0)
+            assert check["equivalent"] and check["events"] == 7, (target, check)
+        assert "key --delay 100 o k Return" in compile_macro(actions, "xdotool")
+        test_results.append("✅ Test compilation: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test compilation: {e}")
+
+    # Test 17: Instantanés copy-on-write sous ajouts concurrents
+    try:
+        store = ActionStore()
+        writers, per_writer = 4, 5000
+        errors = []
+        done = threading.Event()
+
+        def write(w):
+            for k in range(per_writer):
+                store.append(MacroAction("mouse_move", float(k), {"x": w, "y": k}))
+
+        def read():
+            last_version = 0
+            while not done.is_set():
+                snapshot = store.snapshot()
+                first = list(snapshot)
+                if len(first) != len(snapshot) or list(snapshot) != first or snapshot.version < last_version:
+                    errors.append("instantané modifié")
+                last_version = snapshot.version
+
+        threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for thread in readers + threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        frozen = store.snapshot()
+        assert not errors and len(frozen) == writers * per_writer and frozen.max_timestamp == per_writer - 1
+        for w in range(writers):
+            assert [a.data["y"] for a in frozen if a.data["x"] == w] == list(range(per_writer))
+
+        store.clear()
+        store.append(MacroAction("key_press", 0.0, {"key": "'a'"}))
+        assert len(frozen) == writers * per_writer and frozen[-1].action_type == "mouse_move"
+        assert len(store.snapshot()) == 1 and store.snapshot().generation == frozen.generation + 1
+
+        player = MacroPlayer()
+        player.set_actions(frozen)
+        assert player.actions is frozen
+        test_results.append("✅ Test instantanés concurrents: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test instantanés concurrents: {e}")
+
+    # Test 18: Regroupement de la saisie en actions texte
+    try:
+        typed = []
+        for k, key in enumerate(["Key.shift", "'B'", "'o'", "Key.space", "'j'", "'é'", "'!'"]):
+            typed.append(MacroAction("key_press", 1.0 + k * 0.1, {"key": key}))
+            typed.append(MacroAction("key_release", 1.05 + k * 0.1, {"key": key}))
+        actions = [MacroAction("mouse_click", 0.5, {"x": 10, "y": 20, "button": "gauche", "pressed": True})]
+        actions += typed
+        actions += [MacroAction("key_press", 2.0, {"key": "Key.enter"}), MacroAction("key_press", 5.0, {"key": "'x'"})]
+
+        grouped = group_text_runs(actions)
+        assert [a.action_type for a in grouped] == ["mouse_click", "text_input", "key_press", "key_press"]
+        assert grouped[1].data["text"] == "Bo jé!" and grouped[1].timestamp == 1.1
+        assert not validate_macro_data({"actions": [a.to_dict() for a in grouped]})
+        assert key_char("'\\''") == "'" and key_char("Key.enter") is None
+
+        # Raccourcis (Ctrl+A puis Ctrl+C) : jamais fusionnés en texte, relâchements compris
+        shortcut = [("key_press", "Key.ctrl_l"), ("key_press", "'a'"), ("key_release", "'a'"), ("key_press", "'c'"),
+                    ("key_release", "Key.ctrl_l"), ("key_release", "'c'"), ("key_press", "'o'"),
+                    ("key_release", "'o'"), ("key_press", "'k'"), ("key_release", "'k'")]
+        grouped = group_text_runs([MacroAction(kind, k * 0.1, {"key": key}) for k, (kind, key) in enumerate(shortcut)])
+        assert [(a.action_type, a.data.get("key", a.data.get("text"))) for a in grouped] == \
+            shortcut[:6] + [("text_input", "ok")], grouped
+        grouped = group_text_runs(actions)
+
+        backend = RecordingBackend()
+        player = MacroPlayer()
+        player.backend = backend
+        player._execute_action(MacroAction("text_input", 0.0, {"text": "abc", "rate": 40.0}))
+        assert [event[1:] for event in backend.events] == [("type_text", ("abc", 40.0))]
+
+        grouped.append(MacroAction("text_input", 6.0, {"text": "lent \"é\"", "rate": 20.0}))
+        grouped.append(MacroAction("text_input", 8.0, {"text": "l'a\n$HOME \\u00e9\n"}))
+        for target in COMPILE_TARGETS:
+            result = verify_compiled(grouped, compile_macro(grouped, target), target)
+            assert result["equivalent"], (target, result)
+        # xdotool : arguments tels que les reçoit le programme (quotes shell, Entrée en touche)
+        script = compile_macro(grouped, "xdotool").splitlines()
+        assert "type --delay 50 'lent \"é\"'" in script
+        at = script.index("type --delay 0 'l'\"'\"'a'")
+        assert script[at + 1:at + 4] == ["key Return", "type --delay 0 '$HOME \\u00e9'", "key Return"], script[at:]
+        assert [e[1] for e in fidelity_events(grouped)].count("key:é") == 2
+
+        if XLIB_AVAILABLE:
+            # Keycode de secours restauré après la saisie ; sans keycode libre, aucune touche n'est détournée
+            class FakeDisplay:
+                def __init__(self, mapping):
+                    self.mapping = mapping
+                    self.display = type("Conn", (), {"info": type("Info", (), {"min_keycode": 8, "max_keycode": 11})})
+
+                def get_keyboard_mapping(self, first, count):
+                    return [list(self.mapping[code]) for code in range(first, first + count)]
+
+                def keysym_to_keycode(self, keysym):
+                    return next((code for code, keysyms in self.mapping.items() if keysym in keysyms), 0)
+
+                def keycode_to_keysym(self, keycode, index):
+                    return self.mapping[keycode][index]
+
+                def change_keyboard_mapping(self, first, keysyms):
+                    self.mapping[first] = tuple(keysyms[0])
+
+                def sync(self):
+                    pass
+
+            class FakeTyper(XTestTyper):
+                REMAP_DELAY = 0.0
+
+                def _fake(self, kind, keycode):
+                    self.events.append((kind, keycode, self.display.mapping[keycode][0]))
+
+            keyboard = {8: (XK.XK_a, XK.XK_A), 9: (XK.XK_1, XK.XK_exclam), 10: (0, 0), 11: (XK.XK_Shift_L, 0)}
+            typer = FakeTyper(FakeDisplay(keyboard))
+            typer.events = []
+            typer.type("a€!")
+            assert typer.scratch == 10 and keyboard[10] == (0, 0)
+            assert [event[1:] for event in typer.events if event[0] == X.KeyPress] == \
+                [(8, XK.XK_a), (10, 0x01000000 | ord("€")), (11, XK.XK_Shift_L), (9, XK.XK_1)]
+
+            keyboard[10] = (XK.XK_b, XK.XK_B)
+            full = FakeTyper(FakeDisplay(keyboard))
+            assert full.scratch is None and full.can_type("ab!") and not full.can_type("a€")
+            try:
+                full.type("€")
+                raise AssertionError("keycode détourné")
+            except LookupError:
+                pass
+            assert keyboard[10] == (XK.XK_b, XK.XK_B)
+        test_results.append("✅ Test saisie de texte: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test saisie de texte: {e}")
+
+    # Test 19: Magasin de segments dédupliqués
+    try:
+        def stretch(seed, count, t0):
+            return [MacroAction("mouse_move", round(t0 + k * 0.01, 2), {"x": (seed * 37 + k * 11) % 1920, "y": k % 1080})
+                    for k in range(count)]
+
+        login = stretch(1, 600, 0.0)
+        first = login + stretch(2, 200, 6.0)
+        second = login + stretch(3, 300, 6.0)
+        # Même séquence décalée dans le temps et précédée d'une action supplémentaire
+        shifted = [MacroAction("key_press", 0.0, {"key": "'a'"})] + [
+            MacroAction(a.action_type, round(a.timestamp + 2.5, 2), a.data) for a in login]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [Path(tmp) / "sous" / f"m{k}.mseg" for k in range(3)]
+            (Path(tmp) / SEGMENT_STORE_DIR).mkdir()
+            paths[0].parent.mkdir()
+            save_macro_file(paths[0], first)
+            before = SegmentStore.for_file(paths[0]).usage()["segments"]
+            store = SegmentStore(Path(tmp) / SEGMENT_STORE_DIR)
+            assert store.put(second)["written"] <= 3 and store.put(shifted)["written"] <= 3
+            save_macro_file(paths[1], second)
+            assert SegmentStore.for_file(paths[1]).root == store.root and before >= 10
+
+            SegmentStore.clear_cache()
+            loaded = load_macro_file(paths[0])
+            assert len(loaded) == len(first) and SegmentStore.cache_stats["hits"] == 0
+            assert all(a.action_type == b.action_type and a.data == b.data and abs(a.timestamp - b.timestamp) < 1e-9
+                       for a, b in zip(loaded, first))
+            reloaded = load_macro_file(paths[1])
+            assert SegmentStore.cache_stats["hits"] >= 5 and [a.data for a in reloaded] == [a.data for a in second]
+            # Les données chargées sont des copies : les modifier ne touche pas le cache partagé
+            reloaded[0].data["x"] = -1
+            assert load_macro_file(paths[1])[0].data == second[0].data
+            assert not validate_macro_data(read_macro_document(paths[1]))
+            assert find_macro_files(tmp) == sorted(str(p) for p in paths[:2])
+        test_results.append("✅ Test segments dédupliqués: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test segments dédupliqués: {e}")
+
+    # Test 20: Registre de métriques et export Prometheus
+    try:
+        registry = MetricsRegistry()
+        player = MacroPlayer(metrics=registry)
+        player.backend = RecordingBackend()
+        recorder = MacroRecorder(metrics=registry)
+        assert MacroPlayer(metrics=registry).lag_metric is player.lag_metric
+
+        actions = [MacroAction("mouse_move", k * 0.002, {"x": k, "y": k}) for k in range(20)]
+        actions.append(MacroAction("key_press", 0.05, {"key": "'a'"}))
+        player.set_actions(actions)
+        player.is_playing = True
+        player._play_loop()
+        recorder._store_action(MacroAction("mouse_click", 0.0, {"x": 1, "y": 2, "button": "gauche", "pressed": True}))
+
+        assert player.actions_metric.total() == 21 and player.lag_metric.count == 21
+        assert player.runs_metric.value == 1 and player.playing_metric.get() == 0
+        text = registry.render()
+        assert 'macro_player_actions_total{player="principal",type="mouse_move"} 20' in text
+        assert 'macro_recorder_events_total{type="mouse_click"} 1' in text
+        assert 'macro_player_schedule_lag_seconds_bucket{player="principal",le="+Inf"} 21' in text
+        assert "# TYPE macro_player_schedule_lag_seconds histogram" in text
+        assert "macro_recorder_actions 1" in text and "process_resident_memory_bytes " in text
+
+        # Players concurrents sur un même registre : séries distinctes, fin de l'un sans effet sur l'autre
+        other = MacroPlayer(metrics=registry, player_id="planifié-1")
+        other.backend = RecordingBackend()
+        other.set_actions(actions[:5])
+        other.playing_metric.set(1)
+        other.actions_metric.labels("mouse_move").inc(5)
+        assert other.lag_metric is not player.lag_metric and player.actions_metric.total() == 21
+        assert registry.get("macro_player_actions_total").total() == 26
+        text = registry.render()
+        assert 'macro_player_playing{player="planifié-1"} 1' in text and 'macro_player_playing{player="principal"} 0' in text
+
+        # Export pendant qu'un enfant apparaît (comme un labels() depuis un autre thread)
+        growing = registry.gauge("macro_test_growing", "test", ("k",))
+        growing.labels("a").function = lambda: growing.labels("b").get()
+        assert 'macro_test_growing{k="a"} 0' in registry.render() and 'k="b"' in registry.render()
+
+        histogram = Histogram("h", "test", buckets=(1.0, 2.0, 4.0))
+        for value in (0.5, 1.5, 1.5, 3.0):
+            histogram.observe(value)
+        assert histogram.quantile(0.5) == 1.5 and histogram.quantile(1.0) == 4.0
+
+        with tempfile.TemporaryDirectory() as tmp:
+            exporter = MetricsExporter(registry, os.path.join(tmp, "macro.prom"), port=0).start()
+            try:
+                from urllib.request import urlopen
+                with urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+                    assert 'macro_player_runs_total{player="principal"} 1' in response.read().decode("utf-8")
+            finally:
+                exporter.stop()
+            assert 'macro_player_runs_total{player="principal"} 1' in Path(tmp, "macro.prom").read_text(encoding="utf-8")
+
+        # Une erreur quelconque à l'écriture n'arrête ni le thread d'export ni stop()
+        class BrokenRegistry(MetricsRegistry):
+            def write_textfile(self, path):
+                raise ValueError("rendu impossible")
+
+        exporter = MetricsExporter(BrokenRegistry(), "inutilisé.prom", interval=0.01).start()
+        time.sleep(0.05)
+        assert exporter._threads[0].is_alive()
+        exporter.stop()
+        assert not exporter._threads
+        test_results.append("✅ Test métriques: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test métriques: {e}")
+
+    # Test 21: Planificateur (cron, intervalle, chevauchement, rattrapage)
+    try:
+        monday = datetime(2026, 10, 19, 10, 7, 30).timestamp()
+        assert datetime.fromtimestamp(CronExpression("*/15 * * * *").next_after(monday)) == datetime(2026, 10, 19, 10, 15)
+        assert datetime.fromtimestamp(CronExpression("30 9 * * mon-fri").next_after(monday)) == datetime(2026, 10, 20, 9, 30)
+        assert datetime.fromtimestamp(CronExpression("0 12 13 * fri").next_after(monday)) == datetime(2026, 10, 23, 12, 0)
+        assert datetime.fromtimestamp(CronExpression("0 0 29 2 *").next_after(monday)) == datetime(2028, 2, 29)
+
+        now = [1000.0]
+        macros = {"court": [MacroAction("mouse_move", 0.0, {"x": 1, "y": 1})],
+                  "long": [MacroAction("mouse_move", 0.0, {"x": 2, "y": 2}), MacroAction("mouse_move", 0.3, {"x": 3, "y": 3})]}
+        backend = RecordingBackend()
+        scheduler = MacroScheduler(macros.__getitem__, backend, clock=lambda: now[0])
+        scheduler.add(Schedule("a", "court", "interval", 10))
+        assert scheduler.next_due() == (1010.0, "a")
+        assert scheduler.run_pending(1005.0) == 0 and scheduler.run_pending(1010.5) == 1
+        assert scheduler.next_due() == (1020.5, "a") and scheduler.wait_idle(5)
+        assert scheduler.remove("a") and scheduler.next_due() is None
+
+        # 9 occurrences manquées pendant l'arrêt : rattrapées toutes, une seule, ou aucune
+        for policy, expected in (("all", 9), ("once", 1), ("skip", 1)):
+            scheduler.add(Schedule("b", "court", "interval", 60, overlap="queue", catch_up=policy, last_run=1000.0))
+            done = len(scheduler.history)
+            assert scheduler.run_pending(1600.0) == expected, policy
+            assert scheduler.wait_idle(5)
+            assert [h["result"] for h in scheduler.history[done:]].count("terminé") == expected, policy
+            scheduler.remove("b")
+
+        for overlap, finished in (("skip", 1), ("queue", 2), ("parallel", 2)):
+            scheduler.add(Schedule(overlap, "long", "hotkey", "<ctrl>+<alt>+m", overlap=overlap))
+            done = len(scheduler.history)
+            scheduler.trigger(overlap)
+            scheduler.trigger(overlap)
+            assert scheduler.wait_idle(5)
+            results = [h["result"] for h in scheduler.history[done:]]
+            assert results.count("terminé") == finished, (overlap, results)
+        assert scheduler.status()["players"] == 2
+        test_results.append("✅ Test planificateur: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test planificateur: {e}")
+
+    # Test 22: Vignettes de contexte (capture asynchrone, dédoublonnage, fichier annexe)
+    try:
+        if not PIL_AVAILABLE:
+            raise RuntimeError("Pillow non installé")
+
+        def grab(left, top, width, height):
+            # Deux « écrans » distincts selon la zone ; le second varie d'un pixel (bruit)
+            image = Image.linear_gradient("L").rotate(270 if left >= 500 else 90).resize((width, height))
+            if left >= 1000:
+                image.putpixel((3, 3), 0)
+            return image
+
+        recorder = MacroRecorder()
+        assert recorder.set_thumbnails(True, size=64, grabber=grab)
+        recorder.thumbnails.start()
+        clicks = [(100, 100), (700, 100), (1100, 100), (120, 110)]
+        for k, (x, y) in enumerate(clicks):
+            recorder._store_action(MacroAction("mouse_click", k * 0.5, {"x": x, "y": y, "button": "gauche", "pressed": True}))
+            recorder._store_action(MacroAction("mouse_click", k * 0.5 + 0.1, {"x": x, "y": y, "button": "gauche", "pressed": False}))
+        recorder._store_action(MacroAction("key_press", 3.0, {"key": "'a'"}))
+        recorder._store_action(MacroAction("key_press", 3.1, {"key": "'b'"}))
+        recorder.thumbnails.stop()
+        actions = list(recorder.actions)
+        thumbs = [a.data.get("thumb") for a in actions]
+        assert all(thumbs[0:8:2]) and not any(thumbs[1:8:2]) and thumbs[8] and not thumbs[9]
+
+        stats = recorder.thumbnails.summary()
+        assert stats["requested"] == 5 and stats["captured"] == 2 and stats["deduplicated"] == 3, stats
+        assert stats["callback_us_max"] > 0 and stats["bytes"] == sum(map(len, recorder.thumbnails.images.values()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ThumbnailStore.for_macro(os.path.join(tmp, "macro.json"))
+            assert ThumbnailStore.write(store.path, [t for t in thumbs if t], [recorder.thumbnails]) == 2
+            assert store._zip is None and store.get(thumbs[2]) == recorder.thumbnails.get(thumbs[4])
+            assert store.get(thumbs[0]) != store.get(thumbs[2]) and store.get("inconnue") is None
+            store.close()
+
+        budgeted = ThumbnailCapturer(size=32, cpu_budget=0.0, grabber=grab)
+        budgeted.start()
+        for x in (100, 700, 1100):
+            budgeted.request(x, 0)
+        budgeted.stop()
+        assert budgeted.stats["captured"] == 1 and budgeted.stats["skipped_cpu"] == 2
+        test_results.append("✅ Test vignettes: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test vignettes: {e}")
+
+    # Test 23: Coordonnées relatives aux fenêtres (cache de géométrie)
+    try:
+        cache = WindowGeometryCache()
+        cache.update(1, 0, 0, 1920, 1080, "Desktop", "bureau")
+        cache.update(2, 100, 100, 800, 600, "Gedit", "notes.txt")
+        cache.update(3, 500, 300, 400, 300, "Firefox", "Accueil")
+        assert cache.window_at(550, 350) == 3 and cache.window_at(150, 150) == 2 and cache.window_at(5, 5) == 1
+        cache.restack(2, 3)  # la fenêtre 2 passe au premier plan
+        assert cache.window_at(550, 350) == 2
+
+        recorder = MacroRecorder()
+        assert recorder.set_window_relative(True, cache)
+        recorder._store_action(MacroAction("mouse_click", 0.0, {"x": 550, "y": 350, "button": "gauche", "pressed": True}))
+        recorder._store_action(MacroAction("scroll", 0.5, {"x": 5, "y": 5, "dx": 0, "dy": -1}))
+        recorder._store_action(MacroAction("key_press", 1.0, {"key": "'a'"}))
+        actions = list(recorder.actions)
+        assert actions[0].data["window"] == {"class": "Gedit", "title": "notes.txt", "ox": 450, "oy": 250}
+        assert actions[1].data["window"]["class"] == "Desktop" and "window" not in actions[2].data
+
+        # La fenêtre bouge (ConfigureNotify) puis change de titre : résolution par classe
+        cache.update(2, 300, 200, 800, 600)
+        cache.set_title(2, "autre.txt")
+        player = MacroPlayer()
+        player.backend = RecordingBackend()
+        player.window_cache = cache
+        player.actions = actions
+        player.is_playing = True
+        player._play_loop()
+        assert player.backend.events[0][2][:2] == (750, 450) and player.backend.events[1][2][1:] == (5, 5)
+
+        cache.remove(2)
+        player.backend = RecordingBackend()
+        player.is_playing = True
+        player._play_loop()
+        assert player.backend.events[0][2][:2] == (550, 350) and player.last_run["window_misses"] == 1
+        assert cache.stacking == [1, 3] and cache.resolve({"class": "Gedit"}) is None
+        test_results.append("✅ Test fenêtres relatives: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test fenêtres relatives: {e}")
+
+    # Test 24: Lecture en temps simulé (horloge virtuelle)
+    try:
+        actions = [
+            MacroAction("mouse_move", 0.0, {"x": 1, "y": 1}),
+            MacroAction("mouse_click", 1800.0, {"x": 2, "y": 2, "button": "gauche", "pressed": True}),
+            MacroAction("key_press", 5400.0, {"key": "'a'"}),
+            MacroAction("scroll", 10800.0, {"x": 3, "y": 3, "dx": 0, "dy": -1}),
+        ]
+        start = time.perf_counter()
+        player = simulate_playback(actions, speed=2.0, loop_count=999)
+        assert time.perf_counter() - start < 1.0
+        expected = [loop * 5400.0 + offset for loop in range(999) for offset in (0.0, 900.0, 2700.0, 5400.0)]
+        assert [event[0] for event in player.backend.events] == expected
+        assert [event[1] for event in player.backend.events[:4]] == ["move_to", "click", "press", "scroll"]
+        assert player.last_run["elapsed"] == player.last_run["timed"] == 999 * 5400.0
+
+        # Arrêt pendant la lecture au bout de 2 h simulées
+        player = simulate_playback(actions, loop_count=999, setup=lambda p, clock: clock.call_at(7200.0, p.stop_playback))
+        assert len(player.backend.events) == 3 and player.backend.events[-1][0] == 5400.0
+
+        # Point de synchro : l'écran change 3 s (simulées) après le clic
+        sync_actions = [MacroAction("mouse_click", 0.0, {"x": 5, "y": 5, "button": "gauche", "pressed": True,
+                                                         "sync": {"check": "title", "timeout": 10.0}}),
+                        MacroAction("key_press", 2.0, {"key": "'b'"})]
+        change_title = lambda p, clock: clock.call_at(3.0, lambda: setattr(p.backend, "title", "Suivant"))
+        player = simulate_playback(sync_actions, fast=True, setup=change_title)
+        assert player.last_run["waits"] == 1 and player.last_run["timeouts"] == 0
+        assert 3.0 <= player.backend.events[1][0] < 3.0 + ReadinessProbe.POLL_INTERVAL * 1.5
+        test_results.append("✅ Test temps simulé: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test temps simulé: {e}")
+
+    # Test 25: Portée de l'enregistrement (filtrage dans les callbacks)
+    try:
+        scope = CaptureScope(event_types=frozenset({"mouse_move", "scroll", "key_press", "key_release"}),
+                             region=(0, 0, 1000, 1000), exclude_regions=[(800, 800, 200, 200)],
+                             excluded_keys=frozenset({"<f9>", "<ctrl>+r"}))
+        recorder = MacroRecorder()
+        assert recorder.set_scope(scope)
+        emitted = []
+        recorder.action_recorded.connect(emitted.append)
+        recorder.move_threshold = 0.0
+        recorder.is_recording = True
+        for x, y in [(10, 10), (1500, 10), (900, 900), (500, 500)]:
+            recorder._on_mouse_move(x, y)
+        recorder._on_mouse_scroll(1200, 5, 0, -1)
+        for key, pressed in [("Key.f9", True), ("Key.f9", False), ("Key.ctrl_l", True), ("'r'", True),
+                             ("'r'", False), ("Key.ctrl_l", False), ("'r'", True), ("'r'", False)]:
+            (recorder._on_key_press if pressed else recorder._on_key_release)(key)
+        recorder.stop_recording()
+        recorded = [(a.action_type, a.data.get("key") or (a.data["x"], a.data["y"])) for a in recorder.actions]
+        assert recorded == [("mouse_move", (10, 10)), ("mouse_move", (500, 500)), ("key_press", "Key.ctrl_l"),
+                            ("key_release", "Key.ctrl_l"), ("key_press", "'r'"), ("key_release", "'r'")], recorded
+        assert len(emitted) == 6
+        assert recorder.scope_stats == {"seen": 13, "kept": 6, "dropped": 7, "ratio": 0.538,
+                                        "by_reason": {"type": 0, "region": 3, "window": 0, "key": 4}}
+
+        cache = WindowGeometryCache()
+        cache.update(1, 0, 0, 400, 400, "Gedit", "notes", pid=4242)
+        cache.update(2, 300, 300, 400, 400, "Firefox", "Accueil", pid=99)
+        target = CaptureScope(window_class="Gedit", window_cache=cache)
+        assert target.allows("mouse_click", 100, 100) and not target.allows("mouse_click", 350, 350)
+        assert not target.allows("mouse_click", 900, 900) and target.allows_key("key_press", "'a'")
+        assert CaptureScope(pid=99, window_cache=cache).allows("scroll", 350, 350)
+        # Fenêtres de l'enregistreur (pid 4242) ignorées sauf là où une autre fenêtre les recouvre
+        own = CaptureScope(exclude_pid=4242, window_cache=cache)
+        assert not own.allows("mouse_click", 100, 100) and own.allows("mouse_click", 350, 350)
+        assert own.allows("mouse_click", 900, 900) and own.dropped["window"] == 1
+        cache.remove(2)
+        assert not own.allows("mouse_click", 350, 350)
+        assert not CaptureScope(event_types=frozenset({"mouse_click"})).allows_key("key_press", "'a'")
+        # Maj maintenue : pynput signale 'R' ; relâché après Maj, 'r'
+        shortcut = CaptureScope(excluded_keys=frozenset({"<ctrl>+<shift>+r", "Q"}))
+        sequence = [("key_press", "Key.ctrl_l"), ("key_press", "Key.shift"), ("key_press", "'R'"),
+                    ("key_release", "Key.shift"), ("key_release", "'r'"), ("key_release", "Key.ctrl_l"),
+                    ("key_press", "'R'"), ("key_press", "'q'")]
+        assert [shortcut.allows_key(kind, key) for kind, key in sequence] == \
+            [True, True, False, True, False, True, True, False]
+        test_results.append("✅ Test portée d'enregistrement: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test portée d'enregistrement: {e}")
+
+    # Test 26: Lecture en continu depuis le disque (préchargement borné)
+    try:
+        actions = [MacroAction("mouse_move", k * 0.01, {"x": k % 800, "y": k % 600}) if k % 3 else
+                   MacroAction("key_press", k * 0.01, {"key": f"'{chr(97 + k % 26)}'"}) for k in range(2000)]
+        SegmentStore.clear_cache()
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt in ("jsonl", "mseg"):
+                path = os.path.join(tmp, f"macro.{fmt}")
+                save_macro_file(path, actions)
+                reference = simulate_playback(load_macro_file(path), loop_count=2).backend.events
+                SegmentStore.clear_cache()
+                stream = ActionStream(path, read_ahead=2)
+                assert len(stream) == 2000
+                player = simulate_playback(stream, loop_count=2)
+                assert player.backend.events == reference, fmt
+                stats = player.last_run["stream"]
+                assert stats["actions"] == 4000 and stats["max_buffered"] <= 2, stats
+                assert player.last_run["timed"] == player.last_run["elapsed"]
+
+            assert SegmentStore.cache_size == 0  # segments lus en continu, pas mis en cache
+            # Arrêt en cours de parcours : le thread de préchargement se termine
+            stream = iter(ActionStream(os.path.join(tmp, "macro.jsonl"), read_ahead=1))
+            assert next(stream).action_type == "key_press"
+            stream.close()
+            assert not any(thread.name == "macro-prefetch" for thread in threading.enumerate())
+
+            save_macro_file(os.path.join(tmp, "macro.json"), actions)
+            try:
+                ActionStream(os.path.join(tmp, "macro.json"))
+                raise AssertionError("format json accepté")
+            except ValueError:
+                pass
+        test_results.append("✅ Test lecture en continu: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test lecture en continu: {e}")
+
+    # Test 27: Humanisation des boucles (variations bornées, reproductibles par graine)
+    if NUMPY_AVAILABLE:
+        try:
+            actions = []
+            for k in range(30):
+                actions.append(MacroAction("mouse_move", k * 1.0, {"x": 100 + k * 40, "y": 200}))
+                actions.append(MacroAction("mouse_click", k * 1.0 + 0.5, {"x": 900, "y": 100 + k * 20,
+                                                                         "button": "gauche", "pressed": True}))
+                actions.append(MacroAction("key_press", k * 1.0 + 0.7, {"key": "'a'"}))
+
+            def humanized(seed, loops=20, setup=None):
+                def configure(player, clock):
+                    player.set_humanizer(Humanizer(seed=seed, timing_jitter=0.2, click_radius=3))
+                    if setup:
+                        setup(player, clock)
+                return simulate_playback(actions, loop_count=loops, setup=configure)
+
+            plain = simulate_playback(actions, loop_count=20)
+            first, again, other = humanized(7), humanized(7), humanized(8)
+            assert first.backend.events == again.backend.events
+            assert first.backend.events != other.backend.events
+
+            clicks = [args for _, name, args in first.backend.events if name == "click"]
+            assert len(clicks) == 600
+            assert all(abs(x - 900) <= 3 and abs(y - (100 + k % 30 * 20)) <= 3 for k, (x, y, _) in enumerate(clicks))
+            assert clicks[:30] != clicks[30:60]  # chaque boucle a ses propres variations
+
+            presses = [t for t, name, _ in first.backend.events if name == "press"]
+            planned = [t for t, name, _ in plain.backend.events if name == "press"]
+            gaps = [(b - a) / (d - c) for a, b, c, d in zip(presses, presses[1:], planned, planned[1:]) if d - c > 0.5]
+            assert all(0.8 - 1e-9 <= gap <= 1.2 + 1e-9 for gap in gaps) and len(set(gaps)) > 1
+
+            moves = sum(1 for _, name, _ in first.backend.events if name == "move_to")
+            assert moves > sum(1 for _, name, _ in plain.backend.events if name == "move_to")
+            summary = first.last_run["humanize"]
+            assert summary["seed"] == 7 and summary["loops"] == 20 and summary["paths"] > 0
+
+            # Lots bornés en actions, file bornée en boucles ; path() refait la même courbe
+            small = Humanizer(seed=3)
+            small.BATCH_ACTIONS = 100
+            generated = list(small.variations(actions, 0, len(actions), 5))
+            assert len(generated) == 5 and small.stats["batches"] == 5
+            assert small.stats["max_buffered"] <= small.read_ahead
+            _, _, _, offsets, paths = generated[0]
+            j = next(k for k, path in enumerate(paths) if path is not None)
+            bend, points = paths[j]
+            prev = max(k for k in range(j) if "x" in actions[k].data)
+            origin = (actions[prev].data["x"] + offsets[prev][0], actions[prev].data["y"] + offsets[prev][1])
+            target = (actions[j].data["x"] + offsets[j][0], actions[j].data["y"] + offsets[j][1])
+            assert [tuple(point) for point in points] == small.path(origin, target, bend)
+
+            # Coordonnées relatives : trajectoire vers la position résolue, pas vers celle enregistrée
+            cache = WindowGeometryCache()
+            cache.update(1, 1000, 500, 800, 600, "Gedit", "notes")
+            window = {"class": "Gedit", "title": "notes"}
+            relative = [MacroAction("mouse_move", 0.0, {"x": 10, "y": 10, "window": dict(window, ox=10, oy=10)}),
+                        MacroAction("mouse_move", 1.0, {"x": 300, "y": 10, "window": dict(window, ox=300, oy=10)})]
+            player = simulate_playback(relative, setup=lambda p, clock: (
+                p.set_humanizer(Humanizer(seed=5, timing_jitter=0.0, click_radius=0)),
+                setattr(p, "window_cache", cache)))
+            moves = [args for _, name, args in player.backend.events if name == "move_to"]
+            assert moves[0] == (1010, 510) and moves[-1] == (1300, 510) and len(moves) == Humanizer.PATH_POINTS + 2
+            assert all(1010 < x < 1300 for x, _ in moves[1:-1]), moves
+
+            # Traçage actif : la boucle humanisée produit ses spans, sans changer le flux injecté
+            traced = humanized(7, setup=lambda p, clock: p.tracer.enable())
+            assert traced.backend.events == first.backend.events
+            names = {event[0] for event in traced.tracer.events}
+            assert {"attente", "trajectoire", "mouse_click", "action_played", "boucle 1 (humanisée)"} <= names
+
+            # Arrêt en cours de lecture : le thread de précalcul se termine
+            stopped = humanized(7, loops=500, setup=lambda p, clock: clock.call_at(40.0, p.stop_playback))
+            assert stopped.last_run["humanize"]["loops"] < 500
+            assert not any(thread.name == "macro-humanize" for thread in threading.enumerate())
+            test_results.append("✅ Test humanisation: OK")
+        except Exception as e:
+            test_results.append(f"❌ Test humanisation: {e}")
+
+    # Test 28: Enregistrement multipiste (pistes bornées fusionnées en une chronologie)
+    try:
+        now = [100.0]
+        timeline = TrackTimeline(capacity=4, clock=lambda: now[0])
+        timeline.start()
+        for k in range(6):
+            now[0] += 0.001
+            timeline.push("a" if k % 2 else "b", MacroAction("mouse_move", timeline.now(), {"x": k, "y": k}))
+        timeline.inject("marqueurs", "marker", {"label": "m"})
+        assert timeline.drain() == []  # tout est plus récent que le filigrane
+        now[0] += 1.0
+        merged = timeline.drain()
+        assert [a.data.get("x", "m") for a in merged] == [0, 1, 2, 3, 4, 5, "m"]
+        try:
+            timeline.inject("marqueurs", "marker", {"label": "tard"}, timestamp=0.0)
+            raise AssertionError("horodatage décroissant accepté")
+        except ValueError:
+            pass
+        for k in range(6):
+            timeline.push("b", MacroAction("mouse_move", 2.0, {"x": k, "y": k}))
+        assert len(timeline.drain(final=True)) == 4
+        summary = timeline.summary()
+        assert summary["tracks"]["b"] == {"events": 7, "dropped": 2, "high_water": 4}, summary
+
+        recorder = MacroRecorder()
+        assert recorder.set_multitrack(True)
+        recorder.move_threshold = 0.0
+        recorder.start_time = time.monotonic()
+        recorder._start_tracks()
+        recorder.is_recording = True
+
+        def mouse():
+            for k in range(300):
+                recorder._on_mouse_move(k, k)
+
+        def keyboard():
+            for k in range(300):
+                recorder._on_key_press(f"'{k}'")
+
+        def script():
+            for k in range(30):
+                recorder.mark(f"étape {k}")
+                time.sleep(0.001)
+
+        threads = [threading.Thread(target=target) for target in (mouse, keyboard, script)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert recorder.inject("key_press", {"key": "'z'"}, track="script")
+        recorder.stop_recording()
+        actions = list(recorder.actions)
+        timestamps = [a.timestamp for a in actions]
+        assert len(actions) == 631 and timestamps == sorted(timestamps)
+        assert [a.data["x"] for a in actions if a.action_type == "mouse_move"] == list(range(300))
+        assert [a.data["label"] for a in actions if a.action_type == "marker"] == [f"étape {k}" for k in range(30)]
+        assert actions[-1].data == {"key": "'z'", "track": "script"}
+        assert set(recorder.track_stats["tracks"]) == {"souris", "clavier", "marqueurs", "script"}
+        assert not any(thread.name == "macro-tracks" for thread in threading.enumerate())
+        assert validate_macro_data({"actions": [a.to_dict() for a in actions]}) == []
+
+        if XLIB_AVAILABLE:
+            source = XRecordSource(":1", TrackTimeline())
+            event = lambda kind, detail, x=0, y=0, state=0: type("Event", (), {"type": kind, "detail": detail,
+                                                                                "root_x": x, "root_y": y, "state": state})
+            assert source._to_action(event(X.ButtonPress, 1, 5, 6), 1.0).data == \
+                {"x": 5, "y": 6, "button": "gauche", "pressed": True}
+            assert source._to_action(event(X.ButtonPress, 5, 5, 6), 1.0).data["dy"] == -1
+            assert source._to_action(event(X.ButtonRelease, 5), 1.0) is None
+            assert source._to_action(event(X.MotionNotify, 0), 1.0) is not None
+            assert source._to_action(event(X.MotionNotify, 0), 1.05) is None  # move_threshold
+            assert [source._key_name(keysym) for keysym in (XK.XK_Return, XK.XK_a, XK.XK_F11, XK.XK_Control_L)] == \
+                ["Key.enter", "'a'", "Key.f11", "Key.ctrl"]
+            # Caractères majuscules : colonne de la table selon Maj (keycode 10 = touche 1 / !)
+            keymap = {(10, 0): XK.XK_1, (10, 1): XK.XK_exclam, (38, 0): XK.XK_a, (38, 1): XK.XK_A,
+                      (36, 0): XK.XK_Return}
+            source._control = type("Keyboard", (), {
+                "keycode_to_keysym": lambda self, code, index: keymap.get((code, index), 0)})()
+            typed = [source._to_action(event(X.KeyPress, code, state=state), 2.0).data["key"]
+                     for code, state in ((10, 0), (10, X.ShiftMask), (38, X.ShiftMask), (36, X.ShiftMask))]
+            assert typed == ["'1'", "'!'", "'A'", "Key.enter"], typed
+        test_results.append("✅ Test enregistrement multipiste: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test enregistrement multipiste: {e}")
+
+    # Test 29: Démon - jobs en file joués l'un après l'autre sur le même player
+    try:
+        async def daemon_scenario():
+            daemon = MacroDaemon(port=0, backend=RecordingBackend())
+            await daemon.start()
+            try:
+                clicks = [MacroAction("mouse_click", k * 0.01, {"x": k, "y": 1, "button": "gauche", "pressed": True})
+                          .to_dict() for k in range(5)]
+                first, second = await asyncio.gather(
+                    daemon_request({"cmd": "play", "actions": clicks, "wait": True}, port=daemon.port),
+                    daemon_request({"cmd": "play", "actions": clicks[:2], "loops": 2, "wait": True}, port=daemon.port))
+                refused = await daemon_request({"cmd": "play", "actions": clicks, "start_index": 5, "wait": True},
+                                               port=daemon.port)
+                events = list(daemon.player.backend.events)
+
+                # Requête mal formée refusée, job qui échoue dans le worker : les jobs suivants sont servis
+                malformed = await daemon_request({"cmd": "play", "actions": clicks, "end_index": "1", "wait": True},
+                                                 port=daemon.port)
+                broken = {"job": 99, "actions": [MacroAction.from_dict(c) for c in clicks], "total": 5,
+                          "speed": 1.0, "loops": 1, "fast": False, "humanizer": None, "start_index": 0,
+                          "end_index": "1", "start_time": None, "end_time": None, "received_at": time.perf_counter()}
+                daemon._job_waiters[99] = crashed = daemon.loop.create_future()
+                await daemon.jobs.put(broken)
+                crashed = await asyncio.wait_for(crashed, 5)
+                after = await asyncio.wait_for(daemon_request({"cmd": "play", "actions": clicks[:1], "wait": True},
+                                                              port=daemon.port), 5)
+
+                # Lecture planifiée déclenchée pendant un job : mise en file derrière lui, pas en parallèle
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, "planifiee.json")
+                    save_macro_file(path, [MacroAction.from_dict(c) for c in clicks])
+                    daemon.scheduler.add(Schedule("p", path, "hotkey", "<f8>", overlap="parallel"))
+                    daemon.player.backend.events.clear()
+                    playing = asyncio.ensure_future(daemon_request({"cmd": "play", "actions": clicks, "wait": True},
+                                                                   port=daemon.port))
+                    await asyncio.sleep(0.01)
+                    await daemon_request({"cmd": "schedule_run", "schedule_id": "p"}, port=daemon.port)
+                    await playing
+                    loop = asyncio.get_running_loop()
+                    assert await loop.run_in_executor(None, daemon.scheduler.wait_idle, 5)
+                scheduled = ([args[0] for _, _, args in daemon.player.backend.events], daemon.scheduler.status())
+                return first, second, refused, events, (malformed, crashed, after), scheduled, daemon.completed_jobs
+            finally:
+                await daemon.close()
+
+        first, second, refused, events, (malformed, crashed, after), scheduled, completed = \
+            asyncio.run(daemon_scenario())
+        assert first["ok"] and second["ok"] and first["job"] != second["job"], (first, second)
+        assert [name for _, name, _ in events] == ["click"] * 9, events
+        assert [args[0] for _, _, args in events] == [0, 1, 2, 3, 4, 0, 1, 0, 1]
+        assert second["run"]["timed"] == 0.02 and first["run"]["timed"] == 0.04  # chaque job son propre bilan
+        assert not refused["ok"] and refused["error"] == "Aucune action à jouer", refused
+        assert not malformed["ok"] and "end_index" in malformed["error"] and "job" not in malformed, malformed
+        assert crashed["error"].startswith("TypeError") and crashed["run"] == {}, crashed
+        assert after["ok"] and after["run"]["timed"] == 0.0, after
+        xs, status = scheduled
+        assert xs == [0, 1, 2, 3, 4] * 2, xs
+        assert status["players"] == 0 and status["recent"][-1]["result"] == "terminé", status
+        assert completed == 7
+        test_results.append("✅ Test démon (jobs en file): OK")
+    except Exception as e:
+        test_results.append(f"❌ Test démon (jobs en file): {e}")
+
+    # Test 30: Traitement par lots (pool de processus, échecs, reprise par journal)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            actions = [MacroAction("mouse_move", k * 0.01, {"x": k, "y": k}) for k in range(20)]
+            good = []
+            for name in ("a/un.json", "a/deux.json", "b/trois.jsonl"):
+                path = Path(root) / name
+                path.parent.mkdir(exist_ok=True)
+                save_macro_file(path, actions)
+                good.append(str(path.resolve()))
+            broken = Path(root) / "b" / "casse.json"
+            broken.write_text("{pas du json", encoding="utf-8")
+
+            summary = run_batch(root, "validate", workers=2)
+            assert summary["total"] == 4 and summary["processed"] == 4 and summary["failed"] == 1, summary
+            assert summary["failures"][0]["path"] == str(broken.resolve()) and summary["failures"][0]["errors"]
+            assert not (Path(root) / ".macro_batch_validate.journal").exists()  # exécution complète
+
+            output = os.path.join(root, "sortie")
+            summary = run_batch(root, "convert", workers=2, fmt="jsonl", output=output)
+            assert summary["processed"] == 3 and summary["failed"] == 1, summary
+            assert len(load_macro_file(os.path.join(output, "a", "un.jsonl"))) == 20
+
+            # Exécution interrompue : le journal liste les fichiers déjà traités
+            journal = Path(root) / ".macro_batch_validate.journal"
+            journal.write_text("\n".join(good[:2]) + "\n", encoding="utf-8")
+            processed = []
+            summary = run_batch(root, "validate", workers=2, resume=True,
+                                on_progress=lambda done, total, elapsed, result: processed.append(result["path"]))
+            assert summary["skipped"] == 2 and summary["total"] == len(find_macro_files(root)) - 2, summary
+            assert not set(good[:2]) & set(processed) and good[2] in processed
+            assert not journal.exists()
+        test_results.append("✅ Test traitement par lots: OK")
+    except Exception as e:
+        test_results.append(f"❌ Test traitement par lots: {e}")
+
     # Affichage des résultats
     for result in test_results:
         print(result)
@@ -1210,16 +8852,652 @@ def run_regression_tests():
 
     return success_count == total_count
 
+def bench_daemon_latency(iterations: int = 50, concurrent_clients: int = 200):
+    """Latence requête -> première action injectée via le démon, et tenue en charge multi-clients"""
+    async def scenario():
+        daemon = MacroDaemon(port=0, backend=RecordingBackend())
+        await daemon.start()
+        actions = [MacroAction("mouse_click", 0.0, {"x": 10, "y": 10, "button": "gauche", "pressed": True}).to_dict()]
+
+        client_latencies = []
+        server_latencies = []
+        for _ in range(iterations):
+            first_event = {}
+
+            def on_event(event):
+                if event.get("event") == "first_action" and not first_event:
+                    first_event["at"] = time.perf_counter()
+                    first_event["latency_ms"] = event["latency_ms"]
+
+            start = time.perf_counter()
+            await daemon_request({"cmd": "play", "actions": actions, "wait": True},
+                                 port=daemon.port, on_event=on_event)
+            if first_event:
+                client_latencies.append((first_event["at"] - start) * 1000.0)
+                server_latencies.append(first_event["latency_ms"])
+
+        start = time.perf_counter()
+        replies = await asyncio.gather(*[
+            daemon_request({"cmd": "status"}, port=daemon.port) for _ in range(concurrent_clients)
+        ])
+        concurrent_time = time.perf_counter() - start
+        await daemon.close()
+        return client_latencies, server_latencies, concurrent_time, sum(1 for r in replies if r.get("ok"))
+
+    client_latencies, server_latencies, concurrent_time, ok_count = asyncio.run(scenario())
+    client_latencies.sort()
+    server_latencies.sort()
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "from PyQt6.QtWidgets import QApplication"], check=False)
+    cold_import_ms = (time.perf_counter() - start) * 1000.0
+
+    print(f"🛰️ Démon - latence requête → 1ère action ({len(client_latencies)} lectures, backend d'enregistrement):")
+    print(f"   client  médiane {client_latencies[len(client_latencies) // 2]:.2f} ms | "
+          f"p95 {client_latencies[int(len(client_latencies) * 0.95)]:.2f} ms")
+    print(f"   serveur médiane {server_latencies[len(server_latencies) // 2]:.2f} ms")
+    print(f"   {ok_count}/{concurrent_clients} clients simultanés servis en {concurrent_time * 1000.0:.1f} ms")
+    print(f"   à comparer: nouveau processus + import PyQt6 = {cold_import_ms:.0f} ms")
+
+def bench_batch_scaling(file_count: int = 2000, actions_per_file: int = 200):
+    """Débit du traitement par lots (validation) selon le nombre de processus"""
+    actions = [MacroAction("mouse_move", i * 0.01, {"x": i % 1920, "y": i % 1080}) for i in range(actions_per_file)]
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(file_count):
+            directory = Path(root) / f"lot_{i % 20:02d}"
+            directory.mkdir(exist_ok=True)
+            save_macro_file(directory / f"macro_{i:05d}.json", actions)
+
+        print(f"📦 Lots - validation de {file_count} macros de {actions_per_file} actions:")
+        baseline = None
+        for workers, rate, _ in measure_batch_scaling(root, "validate"):
+            baseline = baseline or rate
+            print(f"   {workers:3d} processus: {rate:8.0f} fichiers/s (x{rate / baseline:.2f})")
+
+def bench_fidelity_alignment(event_count: int = 100_000):
+    """Temps d'alignement d'un flux capturé bruité (1% d'événements perdus, doublons, gigue)"""
+    rng = __import__("random").Random(42)
+    actions = []
+    for i in range(event_count):
+        if i % 50 == 49:
+            actions.append(MacroAction("key_press", i * 0.01, {"key": f"'{chr(97 + i % 26)}'"}))
+        else:
+            actions.append(MacroAction("mouse_move", i * 0.01, {"x": (i * 7) % 1920, "y": (i * 3) % 1080}))
+
+    expected = fidelity_events(actions)
+    captured = []
+    for t, signature, x, y in expected:
+        if rng.random() < 0.01:
+            continue
+        jitter = rng.gauss(0.0, 0.002)
+        if x is not None:
+            x, y = x + rng.choice((-1, 0, 0, 0, 1)), y
+        captured.append((5.0 + t + jitter, signature, x, y))
+        if rng.random() < 0.002:
+            captured.append((5.0 + t + jitter, signature, x, y))
+
+    report = align_event_streams(expected, captured)
+    print(f"🎯 Fidélité - alignement de {event_count} événements: {report.align_ms:.0f} ms")
+    print(f"   {report.summary()}")
+
+def bench_capture_latency(count: int = 1000, rate: float = 500.0, busy_chunk: float = 0.05):
+    """Retard d'horodatage des événements capturés pendant que l'interface est occupée
+
+    Un flux cadencé d'événements est produit par un thread du processus courant (comme les
+    listeners pynput actuels) puis par le processus de capture, pendant que le thread
+    principal exécute du code Python par tranches de `busy_chunk` secondes (rendu de la
+    liste, changement de thème...). Le retard est l'écart entre l'instant prévu de
+    l'événement et l'instant où il est horodaté.
+    """
+    def busy_until(deadline, drain=None):
+        while time.monotonic() < deadline:
+            chunk_end = min(deadline, time.monotonic() + busy_chunk)
+            while time.monotonic() < chunk_end:
+                sum(i * i for i in range(2000))
+            if drain:
+                drain()
+
+    def describe(label, delays_ms):
+        delays_ms.sort()
+        p50 = delays_ms[len(delays_ms) // 2]
+        p99 = delays_ms[min(len(delays_ms) - 1, int(len(delays_ms) * 0.99))]
+        print(f"   {label}: retard p50 {p50:.2f} ms | p99 {p99:.2f} ms | max {delays_ms[-1]:.2f} ms")
+
+    print(f"🧵 Capture - {count} événements à {rate:.0f}/s, interface occupée par tranches de {busy_chunk * 1000:.0f} ms:")
+
+    # Listeners dans le processus de l'interface
+    ring = ActionRingBuffer(count)
+    t0 = time.monotonic() + 0.05
+
+    def produce():
+        for k in range(count):
+            delay = t0 + k / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            ring.push(ActionRingBuffer.MOVE, time.monotonic(), k, 0)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    busy_until(t0 + count / rate + 0.05)
+    producer.join()
+    describe("dans le processus", [(ring.times[k] - (t0 + ring.xs[k] / rate)) * 1000.0 for k in range(len(ring))])
+
+    # Processus de capture + mémoire partagée
+    capture = CaptureProcess(capacity=count * 2)
+    capture.launch()
+    try:
+        capture.command("stop")  # attend que le processus soit prêt
+        t0 = time.monotonic() + 0.05
+        delays, delivery = [], []
+
+        def drain():
+            now = time.monotonic()
+            for code, t, x, y, a, b, key in capture.read_batch():
+                delays.append((t - (t0 + x / rate)) * 1000.0)
+                delivery.append((now - t) * 1000.0)
+
+        capture.send("synthetic", count, rate, t0)
+        busy_until(t0 + count / rate + 0.05, drain)
+        capture.reply()
+        drain()
+        describe("processus séparé", delays)
+        delivery.sort()
+        print(f"   processus séparé: {len(delays)}/{count} reçus, livraison à l'interface p50 "
+              f"{delivery[len(delivery) // 2]:.1f} ms (lecture par lots), {capture.ring.dropped} perdus")
+    finally:
+        capture.close()
+
+def bench_text_injection(length: int = 2000, key_interval: float = 0.12, sample: int = 200):
+    """Débit de saisie (caractères/s) : frappe par frappe au rythme enregistré vs action texte
+
+    Les méthodes réelles (XTest, presse-papiers, cadence) tapent dans la fenêtre active :
+    elles ne sont mesurées que si MACRO_BENCH_TEXT=1 est défini.
+    """
+    alphabet = "abcdefghij klmnopqrstuvwxyzé,."
+    text = "".join(alphabet[(k * 7) % len(alphabet)] for k in range(length))
+    actions = []
+    for k, char in enumerate(text):
+        key = "Key.space" if char == " " else repr(char)
+        actions.append(MacroAction("key_press", k * key_interval, {"key": key}))
+        actions.append(MacroAction("key_release", k * key_interval + key_interval / 2, {"key": key}))
+
+    print(f"🔤 Saisie - {length} caractères enregistrés à {1 / key_interval:.1f} frappes/s:")
+    start = time.perf_counter()
+    grouped = group_text_runs(actions)
+    group_ms = (time.perf_counter() - start) * 1000.0
+    per_key = compile_schedule(actions)[-1][0]
+    print(f"   regroupement: {len(actions)} actions → {len(grouped)} en {group_ms:.1f} ms")
+    print(f"   frappe par frappe: {per_key:.1f} s de lecture ({length / per_key:.1f} car/s)")
+
+    if os.environ.get("MACRO_BENCH_TEXT") != "1" or not MODULES_AVAILABLE:
+        print("   méthodes réelles: non mesurées (MACRO_BENCH_TEXT=1 et un affichage sont requis)")
+        return
+    for method in TEXT_METHODS[1:]:
+        backend = PyAutoGuiBackend(method)
+        if method == "xtest" and not (XLIB_AVAILABLE and os.environ.get("DISPLAY")):
+            print(f"   {method}: indisponible")
+            continue
+        if method == "clipboard" and not clipboard_tool():
+            print(f"   {method}: indisponible (aucun outil de presse-papiers)")
+            continue
+        start = time.perf_counter()
+        backend.type_text(text[:sample])
+        elapsed = time.perf_counter() - start
+        print(f"   {method}: {sample / elapsed:.0f} car/s")
+
+def bench_segment_store(file_count: int = 300):
+    """Stockage et chargement d'une bibliothèque de macros partageant de longues séquences
+
+    Chaque macro = connexion commune + une navigation parmi 5 + partie propre + fermeture commune.
+    """
+    def stretch(seed, count):
+        return [("mouse_move", {"x": (seed * 7919 + k * 131) % 1920, "y": (seed * 31 + k * 17) % 1080})
+                for k in range(count)]
+
+    login, teardown = stretch(1, 400), stretch(2, 150)
+    navigations = [stretch(10 + k, 200) for k in range(5)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, deduplicated = Path(tmp) / "jsonl", Path(tmp) / "mseg"
+        plain.mkdir()
+        deduplicated.mkdir()
+        for i in range(file_count):
+            events = login + navigations[i % 5] + stretch(100 + i, 100) + teardown
+            actions = [MacroAction(kind, k * 0.02, data) for k, (kind, data) in enumerate(events)]
+            save_macro_file(plain / f"m{i}.jsonl", actions)
+            save_macro_file(deduplicated / f"m{i}.mseg", actions)
+
+        def size(root):
+            return sum(path.stat().st_size for path in Path(root).rglob("*") if path.is_file())
+
+        def load_all(root, suffix):
+            start = time.perf_counter()
+            for i in range(file_count):
+                load_macro_file(Path(root) / f"m{i}.{suffix}")
+            return (time.perf_counter() - start) * 1000.0
+
+        plain_size, dedup_size = size(plain), size(deduplicated)
+        usage = SegmentStore(deduplicated / SEGMENT_STORE_DIR).usage()
+        print(f"🧩 Segments - {file_count} macros de {len(actions)} actions:")
+        print(f"   stockage: jsonl {plain_size / 1e6:.1f} Mo | segments {dedup_size / 1e6:.2f} Mo "
+              f"(x{plain_size / dedup_size:.1f}, {usage['segments']} segments uniques)")
+        plain_ms = load_all(plain, "jsonl")
+        SegmentStore.clear_cache()
+        cold_ms = load_all(deduplicated, "mseg")
+        warm_ms = load_all(deduplicated, "mseg")
+        stats = SegmentStore.cache_stats
+        print(f"   chargement: jsonl {plain_ms:.0f} ms | segments à froid {cold_ms:.0f} ms | "
+              f"cache chaud {warm_ms:.0f} ms ({stats['hits']} succès / {stats['misses']} échecs)")
+
+def bench_metrics_overhead(iterations: int = 200_000):
+    """Coût par mise à jour des métriques dans les boucles chaudes, et coût d'un export"""
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "bench", ("type",))
+    histogram = registry.histogram("bench_seconds", "bench")
+    gauge = registry.gauge("bench_gauge", "bench")
+
+    def per_call_ns(update):
+        start = time.perf_counter_ns()
+        for k in range(iterations):
+            update(k)
+        return (time.perf_counter_ns() - start) / iterations
+
+    baseline = per_call_ns(lambda k: None)
+    print(f"📈 Métriques - {iterations} mises à jour:")
+    print(f"   compteur étiqueté: {per_call_ns(lambda k: counter.labels('mouse_move').inc()) - baseline:.0f} ns | "
+          f"histogramme: {per_call_ns(lambda k: histogram.observe(k * 1e-6)) - baseline:.0f} ns | "
+          f"jauge: {per_call_ns(lambda k: gauge.set(k)) - baseline:.0f} ns")
+    for k in range(50):
+        counter.labels(f"type{k}").inc()
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"   export Prometheus: {(time.perf_counter() - start) * 1000:.2f} ms ({len(text)} octets)")
+
+def bench_scheduler_idle(schedule_count: int = 10_000, idle_seconds: float = 2.0):
+    """Coût au repos du planificateur avec des milliers de planifications cron/intervalle"""
+    actions = [MacroAction("mouse_move", 0.0, {"x": 0, "y": 0})]
+    scheduler = MacroScheduler(lambda path: actions, RecordingBackend())
+
+    start = time.perf_counter()
+    for k in range(schedule_count):
+        if k % 2:
+            scheduler.add(Schedule(f"i{k}", "bench", "interval", 300 + k))
+        else:
+            scheduler.add(Schedule(f"c{k}", "bench", "cron", f"{k % 60} {k % 24} * * {k % 7}"))
+    add_ms = (time.perf_counter() - start) * 1000.0
+
+    scheduler.start()
+    cpu_start, wakeups = time.process_time(), scheduler.wakeups
+    time.sleep(idle_seconds)
+    idle_cpu_ms = (time.process_time() - cpu_start) * 1000.0
+    scheduler.stop()
+
+    print(f"⏰ Planificateur - {schedule_count} planifications:")
+    print(f"   ajout: {add_ms:.0f} ms ({add_ms * 1000 / schedule_count:.1f} µs/planification, cron compris)")
+    print(f"   repos {idle_seconds:.0f} s: {scheduler.wakeups - wakeups} réveils, {idle_cpu_ms:.1f} ms CPU "
+          f"(processus entier) | prochaine échéance dans {scheduler.next_due()[0] - time.time():.0f} s")
+
+def bench_thumbnails(clicks: int = 300, rate: float = 20.0, size: int = 160):
+    """Coût des vignettes pendant un enregistrement simulé (écran synthétique 1920x1080)
+
+    Les clics reviennent souvent aux mêmes endroits (menus, boutons) : les vignettes
+    identiques sont dédoublonnées.
+    """
+    if not PIL_AVAILABLE:
+        print("🖼️ Vignettes: Pillow non installé")
+        return
+    screen = Image.effect_noise((1920, 1080), 64).convert("RGB")
+
+    def grab(left, top, width, height):
+        return screen.crop((left, top, left + width, top + height))
+
+    spots = [(200 + 150 * (k % 10), 150 + 200 * (k // 10)) for k in range(40)]
+    for cpu_budget in (0.05, 1.0):
+        capturer = ThumbnailCapturer(size=size, cpu_budget=cpu_budget, grabber=grab)
+        capturer.start()
+        for k in range(clicks):
+            capturer.request(*spots[(k * 7) % len(spots)])
+            time.sleep(1.0 / rate)
+        capturer.stop()
+        stats = capturer.summary()
+        elapsed = clicks / rate
+        print(f"🖼️ Vignettes {size}px - {clicks} clics à {rate:.0f}/s, budget CPU {cpu_budget:.0%}:")
+        print(f"   callback {stats['callback_us_mean']:.1f} µs (max {stats['callback_us_max']:.0f} µs) | "
+              f"{stats['captured']} images + {stats['deduplicated']} doublons, {stats['skipped_cpu']} hors budget | "
+              f"CPU {stats['cpu_ms']:.0f} ms ({stats['cpu_ms'] / 10 / elapsed:.1f} % d'un cœur) | "
+              f"{stats['bytes'] / 1024:.0f} Ko")
+
+def bench_window_lookup(window_count: int = 40, lookups: int = 200_000):
+    """Coût par action des recherches de fenêtre (cache en mémoire) contre une requête X par action"""
+    cache = WindowGeometryCache()
+    for wid in range(1, window_count + 1):
+        cache.update(wid, (wid * 37) % 1600, (wid * 23) % 900, 320, 240, f"App{wid % 12}", f"Document {wid}")
+    points = [((k * 131) % 1920, (k * 71) % 1080) for k in range(1024)]
+    targets = [cache.locate(x, y) or {"class": "App3", "title": "?"} for x, y in points]
+
+    start = time.perf_counter()
+    for k in range(lookups):
+        cache.locate(*points[k & 1023])
+    locate_us = (time.perf_counter() - start) / lookups * 1e6
+    start = time.perf_counter()
+    for k in range(lookups):
+        cache.resolve(targets[k & 1023])
+    resolve_us = (time.perf_counter() - start) / lookups * 1e6
+    start = time.perf_counter()
+    for k in range(lookups // 10):
+        cache.update(1 + k % window_count, k % 1600, k % 900, 320, 240)
+    update_us = (time.perf_counter() - start) / (lookups // 10) * 1e6
+    print(f"🪟 Cache de fenêtres ({window_count} fenêtres): enregistrement {locate_us:.2f} µs/action | "
+          f"lecture {resolve_us:.2f} µs/action | ConfigureNotify {update_us:.2f} µs")
+
+    if WindowGeometryCache.available():
+        display = xdisplay.Display()
+        root = display.screen().root
+        count = 200
+        start = time.perf_counter()
+        for _ in range(count):
+            for child in reversed(root.query_tree().children):
+                child.get_geometry()
+                break
+        print(f"   requête X par action (query_tree + get_geometry): {(time.perf_counter() - start) / count * 1e6:.0f} µs")
+        display.close()
+
+def bench_simulation(action_count: int = 500, duration: float = 7200.0, loops: int = 999):
+    """Lecture complète d'une macro de plusieurs heures en temps simulé (horloge virtuelle)"""
+    kinds = ("mouse_move", "mouse_click", "key_press", "scroll")
+    actions = []
+    for k in range(action_count):
+        kind = kinds[k % len(kinds)]
+        data = {"key": "'a'"} if kind == "key_press" else {"x": k % 1920, "y": k % 1080, "dx": 0, "dy": -1}
+        if kind == "mouse_click":
+            data.update(button="gauche", pressed=True)
+        actions.append(MacroAction(kind, duration * k / (action_count - 1), data))
+
+    start = time.perf_counter()
+    player = simulate_playback(actions, loop_count=loops)
+    elapsed = time.perf_counter() - start
+    played = len(player.backend.events)
+    print(f"🕰️ Temps simulé - macro de {duration / 3600:.0f} h ({action_count} actions) x {loops} boucles: "
+          f"{played} événements en {elapsed:.2f} s ({played / elapsed:,.0f} actions/s) | "
+          f"{player.last_run['elapsed'] / 3600:,.0f} h simulées, accélération x{player.last_run['elapsed'] / elapsed:,.0f}")
+
+def bench_capture_scope(events: int = 20_000):
+    """Volume enregistré et coût des callbacks d'une session type, avec et sans portée
+
+    Session simulée sur un écran 2560x1440 : l'application cible occupe la moitié gauche,
+    l'enregistreur une zone à droite ; 90 % de mouvements, des clics de défilement et des
+    frappes dont les raccourcis de l'enregistreur.
+    """
+    session = []
+    for k in range(events):
+        x, y = (k * 733) % 2560, (k * 389) % 1440
+        if k % 10 < 9:
+            session.append(("move", x, y))
+        elif k % 20 == 9:
+            session.append(("scroll", x, y))
+        else:
+            session.append(("key", "Key.f9" if k % 200 == 19 else "'a'"))
+
+    def run(scope):
+        recorder = MacroRecorder()
+        recorder.set_scope(scope)
+        recorder.move_threshold = 0.0
+        recorder.is_recording = True
+        on_move, on_scroll, on_press = recorder._on_mouse_move, recorder._on_mouse_scroll, recorder._on_key_press
+        start = time.perf_counter()
+        for event in session:
+            if event[0] == "move":
+                on_move(event[1], event[2])
+            elif event[0] == "scroll":
+                on_scroll(event[1], event[2], 0, -1)
+            else:
+                on_press(event[1])
+        elapsed = time.perf_counter() - start
+        recorder.is_recording = False
+        return len(recorder.actions), elapsed / len(session) * 1e6
+
+    kept_all, cost_all = run(None)
+    scope = CaptureScope(region=(0, 0, 1280, 1440), exclude_regions=[(1800, 200, 700, 900)],
+                         excluded_keys=frozenset({"<f9>", "<f10>", "<f12>"}))
+    kept, cost = run(scope)
+    summary = scope.summary()
+    print(f"🎯 Portée - {events} événements: sans portée {kept_all} actions ({cost_all:.2f} µs/callback) | "
+          f"avec portée {kept} actions ({cost:.2f} µs/callback), {summary['dropped']} ignorés "
+          f"({summary['ratio']:.0%}: {summary['by_reason']})")
+
+def bench_streaming_playback(action_count: int = 300_000):
+    """Chargement complet contre lecture en continu : délai avant la première action et mémoire"""
+    import tracemalloc
+
+    actions = [MacroAction("mouse_move", k * 0.001, {"x": k % 1920, "y": k % 1080}) for k in range(action_count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "longue.jsonl")
+        save_macro_file(path, actions)
+        del actions
+        size_mb = os.path.getsize(path) / 1e6
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        loaded = load_macro_file(path)
+        first_loaded = time.perf_counter() - start
+        loaded_peak = tracemalloc.get_traced_memory()[1]
+        del loaded
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        stream = ActionStream(path)
+        start = time.perf_counter()
+        iterator = iter(stream)
+        next(iterator)
+        first_streamed = time.perf_counter() - start
+        iterator.close()
+        # Flux injecté non conservé : seule la mémoire de la lecture est mesurée
+        player = simulate_playback(ActionStream(path), setup=lambda p, clock: setattr(p.backend, "events", deque(maxlen=1)))
+        streamed_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stats = player.last_run["stream"]
+    print(f"📼 Lecture en continu - {action_count} actions ({size_mb:.0f} Mo jsonl): première action après "
+          f"{first_loaded * 1000:.0f} ms (chargement complet) / {first_streamed * 1000:.1f} ms (continu) | "
+          f"mémoire max {loaded_peak / 1e6:.0f} Mo / {streamed_peak / 1e6:.1f} Mo | "
+          f"lecture simulée à vitesse max: {stats['underruns']} sous-débits ({stats['underrun_ms']:.0f} ms)")
+
+def bench_humanize(action_count: int = 1000, loops: int = 200):
+    """Précalcul vectorisé des variations par boucle et coût de distribution dans la boucle de lecture"""
+    actions = []
+    for k in range(action_count):
+        if k % 4 == 3:
+            data = {"x": (k * 97) % 1920, "y": (k * 53) % 1080, "button": "gauche", "pressed": True}
+            actions.append(MacroAction("mouse_click", k * 0.05, data))
+        else:
+            actions.append(MacroAction("mouse_move", k * 0.05, {"x": (k * 97) % 1920, "y": (k * 53) % 1080}))
+
+    humanizer = Humanizer(seed=1)
+    start = time.perf_counter()
+    with closing(humanizer.variations(actions, 0, action_count, loops)) as variations:
+        for _ in variations:
+            pass
+    precompute = time.perf_counter() - start
+    stats = humanizer.summary()
+
+    start = time.perf_counter()
+    plain = simulate_playback(actions, loop_count=loops)
+    plain_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    player = simulate_playback(actions, loop_count=loops, setup=lambda p, clock: p.set_humanizer(Humanizer(seed=1)))
+    humanized_elapsed = time.perf_counter() - start
+    plain_events, humanized_events = len(plain.backend.events), len(player.backend.events)
+    print(f"🎲 Humanisation - {action_count} actions x {loops} boucles: précalcul {precompute * 1000:.0f} ms "
+          f"({loops / precompute:,.0f} boucles/s, {stats['paths']} trajectoires) | lecture simulée "
+          f"{plain_elapsed / plain_events * 1e6:.2f} µs/événement à l'identique, "
+          f"{humanized_elapsed / humanized_events * 1e6:.2f} µs/événement humanisée "
+          f"({humanized_events - plain_events} mouvements de trajectoire), "
+          f"{player.last_run['humanize']['underruns']} sous-débits")
+
+def bench_track_merge(tracks: int = 8, events_per_track: int = 250_000, poll: float = 0.02):
+    """Débit de la fusion k voies des pistes (drain périodique au filigrane) contre un tri global
+
+    Chaque piste reçoit un événement toutes les `tracks` ms environ, décalé d'une piste à
+    l'autre ; la chronologie est vidée tous les `poll` secondes de temps simulé.
+    """
+    step = 0.001 * tracks
+    streams = [[MacroAction("mouse_move", k * step + track * 0.001 + 1e-6 * (k % 7), {"x": k, "y": track})
+                for k in range(events_per_track)] for track in range(tracks)]
+    total = tracks * events_per_track
+    duration = events_per_track * step
+
+    now = [0.0]
+    timeline = TrackTimeline(capacity=int(poll / step) * 2 + 16, clock=lambda: now[0])
+    timeline.start(0.0)
+    positions = [0] * tracks
+    merged = 0
+    merge_time = 0.0
+    while now[0] < duration + poll:
+        now[0] += poll
+        for track, stream in enumerate(streams):
+            position = positions[track]
+            while position < events_per_track and stream[position].timestamp <= now[0]:
+                timeline.push(f"piste {track}", stream[position])
+                position += 1
+            positions[track] = position
+        start = time.perf_counter()
+        merged += len(timeline.drain())
+        merge_time += time.perf_counter() - start
+    start = time.perf_counter()
+    merged += len(timeline.drain(final=True))
+    merge_time += time.perf_counter() - start
+
+    start = time.perf_counter()
+    sorted([action for stream in streams for action in stream], key=lambda action: action.timestamp)
+    sort_time = time.perf_counter() - start
+    summary = timeline.summary()
+    high_water = max(track["high_water"] for track in summary["tracks"].values())
+    dropped = sum(track["dropped"] for track in summary["tracks"].values())
+    print(f"🎚️ Fusion multipiste - {tracks} pistes x {events_per_track:,} événements: {merged:,} fusionnés en "
+          f"{merge_time:.2f} s ({merged / merge_time:,.0f} évén./s, drain toutes les {poll * 1000:.0f} ms) | "
+          f"tri global de {total:,} événements: {sort_time:.2f} s | tampon max {high_water} événements/piste, "
+          f"{dropped} perdus")
+
+def run_benchmarks():
+    """Benchmarks de performance des sous-systèmes"""
+    print("⏱️ Benchmarks de performance")
+    print("=" * 60)
+
+    app = QApplication.instance() or QApplication([])
+    for bench in (bench_daemon_latency, bench_batch_scaling, bench_fidelity_alignment, bench_capture_latency,
+                  bench_text_injection, bench_segment_store, bench_metrics_overhead,
+                  bench_scheduler_idle, bench_thumbnails, bench_window_lookup, bench_simulation,
+                  bench_capture_scope, bench_streaming_playback, bench_humanize,
+                  bench_track_merge):
+        try:
+            bench()
+        except Exception as e:
+            print(f"❌ {bench.__name__}: {e}")
+
+def parse_args(argv):
+    """Analyse les options de ligne de commande (les options inconnues sont laissées à Qt)"""
+    parser = argparse.ArgumentParser(description="Macro Recorder Pro - Clone Jitbit")
+    parser.add_argument("--test", action="store_true", help="Exécute les tests de non-régression et quitte")
+    parser.add_argument("--bench", action="store_true", help="Exécute les benchmarks de performance et quitte")
+
+    daemon_group = parser.add_argument_group("Démon d'automatisation")
+    daemon_group.add_argument("--daemon", action="store_true", help="Lance le démon local sans interface")
+    daemon_group.add_argument("--send", metavar="JSON", help="Envoie une requête JSON au démon et affiche les réponses")
+    daemon_group.add_argument("--host", default=DAEMON_HOST, help="Adresse d'écoute du démon (localhost par défaut)")
+    daemon_group.add_argument("--port", type=int, default=DAEMON_PORT, help="Port TCP du démon")
+    daemon_group.add_argument("--socket", metavar="CHEMIN", help="Socket Unix à utiliser à la place de TCP")
+    daemon_group.add_argument("--schedule", metavar="FICHIER",
+                              help="Planifications (JSON) chargées au démarrage du démon ; implique --daemon")
+
+    batch_group = parser.add_argument_group("Traitement par lots")
+    batch_group.add_argument("--batch", metavar="DOSSIER", help="Traite toutes les macros d'une arborescence")
+    batch_group.add_argument("--batch-op", choices=BATCH_OPERATIONS, default="validate",
+                             help="Opération à appliquer (validate par défaut)")
+    batch_group.add_argument("--workers", type=int, help="Nombre de processus (nombre de cœurs par défaut)")
+    batch_group.add_argument("--format", choices=MACRO_FORMATS, default="jsonl", help="Format cible de convert")
+    batch_group.add_argument("--output", metavar="DOSSIER", help="Écrit les résultats dans une arborescence séparée")
+    batch_group.add_argument("--resume", action="store_true", help="Reprend un traitement interrompu")
+    batch_group.add_argument("--batch-scaling", action="store_true",
+                             help="Mesure le débit en fonction du nombre de processus")
+
+    verify_group = parser.add_argument_group("Vérification de fidélité")
+    verify_group.add_argument("--verify", metavar="CHEMIN",
+                              help="Rejoue une macro (ou un dossier) et compare le flux injecté à la source")
+    verify_group.add_argument("--verify-capture", choices=FIDELITY_CAPTURES, default="backend",
+                              help="backend: injection simulée (défaut) ; listeners: injection réelle capturée ; "
+                                   "simulated: injection simulée en temps virtuel (instantané)")
+    verify_group.add_argument("--speed", type=float, default=1.0, help="Vitesse de lecture pendant la vérification")
+    verify_group.add_argument("--tolerance-px", type=float, default=2.0, help="Erreur de position maximale (pixels)")
+    verify_group.add_argument("--tolerance-ms", type=float, default=50.0, help="Erreur de timing p95 maximale (ms)")
+    verify_group.add_argument("--report", metavar="FICHIER", help="Écrit le rapport détaillé en JSON")
+
+    compile_group = parser.add_argument_group("Compilation")
+    compile_group.add_argument("--compile", metavar="FICHIER", help="Compile une macro en script autonome")
+    compile_group.add_argument("--target", choices=COMPILE_TARGETS, default="python",
+                               help="python (pyautogui seul) ou xdotool")
+    compile_group.add_argument("--compile-to", metavar="FICHIER", help="Script à écrire (.py/.xdo à côté de la macro par défaut)")
+
+    metrics_group = parser.add_argument_group("Télémétrie (interface et démon)")
+    metrics_group.add_argument("--metrics-port", type=int, metavar="PORT",
+                               help="Expose les métriques Prometheus sur http://127.0.0.1:PORT/metrics")
+    metrics_group.add_argument("--metrics-file", metavar="FICHIER",
+                               help="Réécrit périodiquement les métriques dans un fichier .prom (collecteur textfile)")
+    metrics_group.add_argument("--metrics-interval", type=float, default=5.0,
+                               help="Période d'écriture du fichier de métriques (secondes)")
+
+    return parser.parse_known_args(argv)
+
+def metrics_exporter_for(args, registry: MetricsRegistry) -> Optional[MetricsExporter]:
+    """Exportateur demandé par les options --metrics-* (None si aucun)"""
+    if args.metrics_port is None and not args.metrics_file:
+        return None
+    return MetricsExporter(registry, args.metrics_file, args.metrics_port, interval=args.metrics_interval)
+
 def main():
     """Fonction principale"""
+    args, qt_args = parse_args(sys.argv[1:])
+
+    if args.test:
+        sys.exit(0 if run_regression_tests() else 1)
+
+    if args.bench:
+        run_benchmarks()
+        return
+
+    if args.daemon or args.schedule:
+        run_daemon(args.host, args.port, args.socket, metrics_exporter_for(args, MetricsRegistry()), args.schedule)
+        return
+
+    if args.batch:
+        sys.exit(0 if run_batch_cli(args) else 1)
+
+    if args.verify:
+        sys.exit(0 if run_verify_cli(args) else 1)
+
+    if args.compile:
+        result = compile_macro_file(args.compile, args.target, args.compile_to, args.speed)
+        status = "✅ équivalent" if result["equivalent"] else f"❌ divergence à l'événement {result['mismatch']}"
+        print(f"📦 {result['output']}: {result['size']} octets compilés en {result['compile_ms']:.1f} ms | "
+              f"{status} ({result['events']} événements, écart max {result['max_timing_error_ms']:.1f} ms)")
+        sys.exit(0 if result["equivalent"] else 1)
+
+    if args.send:
+        print_event = lambda event: print(json.dumps(event, ensure_ascii=False))
+        reply = asyncio.run(daemon_request(json.loads(args.send), args.host, args.port, args.socket, print_event))
+        print(json.dumps(reply, ensure_ascii=False))
+        sys.exit(0 if reply.get("ok") else 1)
+
     # Tests de régression
     run_regression_tests()
 
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle('Fusion')
 
     # Création et affichage de la fenêtre
     window = MacroRecorderUI()
+    window.metrics_exporter = metrics_exporter_for(args, window.metrics)
+    if window.metrics_exporter:
+        window.metrics_exporter.start()
     window.show()
 
     sys.exit(app.exec())